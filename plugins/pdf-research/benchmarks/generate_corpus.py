@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Synthetic PDF Corpus Generator
+Writes reproducible PDFs with PyMuPDF for the offline benchmarks.
+
+Every page carries a running header and a page-number footer (like real
+reports) around body text drawn from a fixed vocabulary, so the corpus
+exercises chunking, entity extraction and lexical search the same way on
+every run with the same seed.
+
+Usage:
+    python generate_corpus.py <out_dir> [--docs <n>] [--pages <n>] [--words <n>] [--seed <n>]
+"""
+
+import argparse
+import random
+from pathlib import Path
+
+VOCABULARY = (
+    "analysis architecture baseline benchmark cache chunk cluster compiler "
+    "dataset deployment embedding encoder entity evaluation experiment feature "
+    "gradient graph hardware index inference kernel latency layer memory metric "
+    "model network optimizer parameter pipeline precision protocol query recall "
+    "regression retrieval runtime sampling scheduler schema search sensor shard "
+    "signal storage stream system tensor throughput token training transformer "
+    "vector workload"
+).split()
+
+ENTITIES = (
+    "Aurora Borealis Cobalt Delphi Everest Falcon Granite Helios Ionia Juniper "
+    "Kestrel Lumen Meridian Nimbus Orion Pegasus Quasar Raptor Sierra Titan"
+).split()
+
+
+def generate_pdf(path: Path, doc_num: int, pages: int, words: int, rng: random.Random):
+    """Write one synthetic PDF."""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    title = f"Technical Report {doc_num:05d}: {rng.choice(ENTITIES)} {rng.choice(VOCABULARY).title()} Study"
+    for page_num in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((72, 40), title, fontsize=8)
+
+        sentences = []
+        remaining = words
+        while remaining > 0:
+            length = min(remaining, rng.randint(8, 20))
+            sentence = [rng.choice(VOCABULARY) for _ in range(length)]
+            sentence.insert(rng.randrange(len(sentence)), rng.choice(ENTITIES))
+            if rng.random() < 0.1:
+                sentence.append(f"ERR-{rng.randint(1000, 9999)}")
+            text = " ".join(sentence)
+            sentences.append(text[0].upper() + text[1:] + ".")
+            remaining -= length
+        page.insert_textbox(fitz.Rect(72, 60, 540, 760), " ".join(sentences), fontsize=9)
+
+        page.insert_text((290, 810), f"Page {page_num} of {pages}", fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def generate_corpus(out_dir: Path, docs: int = 20, pages: int = 5, words: int = 300,
+                    seed: int = 0) -> list:
+    """Generate `docs` PDFs into out_dir and return their paths."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for doc_num in range(docs):
+        path = out_dir / f"report_{doc_num:05d}.pdf"
+        generate_pdf(path, doc_num, pages, words, rng)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic PDF corpus")
+    parser.add_argument("out_dir", help="Directory to write the PDFs to")
+    parser.add_argument("--docs", type=int, default=20, help="Number of PDFs (default: 20)")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per PDF (default: 5)")
+    parser.add_argument("--words", type=int, default=300, help="Words per page (default: 300)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    paths = generate_corpus(Path(args.out_dir), args.docs, args.pages, args.words, args.seed)
+    print(f"Wrote {len(paths)} PDFs to {Path(args.out_dir).resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+Offline PDF Research Benchmarks
+Measures indexing and query performance on a synthetic corpus with stub
+model providers, so results are free, reproducible and comparable across
+commits.
+
+Each scenario runs in its own subprocess so its peak RSS (including the
+extraction pool) is measured in isolation:
+
+- extract:       PDF text extraction only (docs/s, pages/s)
+- extract_cached: the same extraction served from a warm extraction cache,
+                 as a rebuild of an already parsed corpus reads it
+- extract_large: extraction of one long PDF, segmented and as a single
+                 document, to show peak memory tracks the segment size
+- index_cold:    full index into an empty store with empty caches
+- index_fast:    the same with --fast (chunk and embed only), i.e. the time
+                 until every PDF is searchable with naive search
+- index_throttled: index_cold through the real OpenAI client against a local
+                 stand-in server that answers excess requests with 429s, to
+                 show the rate limiter keeps every document from failing
+- index_noop:    re-run on the unchanged corpus (manifest fast path)
+- index_rebuild: full index into a new store with warm model caches
+- startup:       storage statistics in-process, and the wall time and heavy
+                 imports of the pre-flight CLI commands (status, config, --help)
+- query:         per-mode latency loading storages per query (cold) and
+                 against one loaded instance (warm), including the BM25
+                 lexical mode
+- index_sharded: the corpus indexed round-robin into four shards
+- query_sharded: naive searches fanned out over 1, 2 and all 4 shards, to
+                 show storage load time and peak memory follow the shards a
+                 search touches rather than the whole corpus
+
+Usage:
+    python run_benchmarks.py [--docs <n>] [--pages <n>] [--corpus <dir>] [--output <file>]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCH_DIR.parent / "skills" / "pdf-research" / "scripts"
+
+SCENARIOS = ["extract", "extract_cached", "extract_large", "index_cold", "index_fast", "index_throttled", "index_noop", "index_rebuild", "startup", "query", "index_sharded", "query_sharded"]
+QUERY_MODES = ["naive", "local", "global", "hybrid"]
+# Imports the pre-flight commands (status, config, --help) should never pay for
+HEAVY_MODULES = ["asyncio", "fitz", "lightrag", "numpy", "openai", "pymupdf"]
+SHARDS = 4
+QUERIES = [
+    "What does the Aurora study report about retrieval latency?",
+    "How is the embedding pipeline evaluated?",
+    "Which reports mention error code ERR-4242?",
+    "Summarize the findings about cache throughput.",
+    "What relationship exists between Falcon and Meridian?",
+]
+
+
+def peak_rss_mb(children: bool = True) -> float:
+    """Peak RSS of this process (and its waited-for children), in MB."""
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak * scale / 1024 / 1024, 1)
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def latency_summary(seconds: list) -> dict:
+    ms = [s * 1000 for s in seconds]
+    return {
+        "p50_ms": round(statistics.median(ms), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "count": len(ms),
+    }
+
+
+def count_pages(pdf_files: list) -> int:
+    import fitz  # PyMuPDF
+
+    pages = 0
+    for pdf_path in pdf_files:
+        with fitz.open(pdf_path) as doc:
+            pages += len(doc)
+    return pages
+
+
+def run_index(pdf_dir: Path, storage_dir: Path, args) -> dict:
+    from index_pdfs import get_storage_stats, index_pdfs
+    from storage_meta import get_storage_size
+    from stub_models import STUB_CALLS
+
+    pdf_files = sorted(pdf_dir.glob("*.pdf"))
+    pages = count_pages(pdf_files)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(index_pdfs(
+            pdf_dir, storage_dir,
+            workers=args.workers, concurrency=args.concurrency, batch_size=args.batch_size,
+            segment_size=args.segment_size, fast=args.scenario == "index_fast",
+        ))
+    elapsed = time.perf_counter() - start
+
+    stats = get_storage_stats(storage_dir)
+    result = {
+        "seconds": round(elapsed, 3),
+        "docs_per_s": round(len(pdf_files) / elapsed, 2),
+        "pages_per_s": round(pages / elapsed, 2),
+        "documents": stats["total_docs"],
+        "chunks": stats["total_chunks"],
+        "entities": stats["total_entities"],
+        "store_size_mb": round(get_storage_size(storage_dir) / 1024 / 1024, 2),
+        **STUB_CALLS,
+    }
+    if args.scenario == "index_throttled":
+        from manifest import Manifest
+        from metrics import get_metrics
+        from throttle_server import THROTTLE_STATS
+
+        counters = get_metrics().counters
+        result["throttled_responses"] = THROTTLE_STATS["throttled"]
+        result["retries"] = counters.get("llm_retries", 0) + counters.get("embed_retries", 0)
+        result["failed_pdfs"] = len(pdf_files) - len(Manifest.load(storage_dir).files)
+    return result
+
+
+def use_throttled_provider(rpm: int, dim: int = 256):
+    """Point the OpenAI functions at a local server that throttles above `rpm`."""
+    sys.path.insert(0, str(BENCH_DIR))
+    from functools import partial
+
+    from lightrag.llm.openai import openai_complete_if_cache, openai_embed
+    from lightrag.utils import EmbeddingFunc
+
+    import models
+    from stub_models import stub_tokenizer
+    from throttle_server import start_throttle_server
+
+    server = start_throttle_server(rpm, dim)
+    client = {"base_url": server.base_url, "api_key": "stub-key"}
+    complete = partial(models._without_retries(openai_complete_if_cache), "stub-llm", **client)
+
+    async def llm_func(prompt, system_prompt=None, history_messages=None, **kwargs):
+        return await complete(prompt, system_prompt=system_prompt,
+                              history_messages=history_messages or [], **kwargs)
+
+    models.set_model_overrides(
+        # max_token_size=None: truncation would need a tiktoken download
+        embedding_func=EmbeddingFunc(embedding_dim=dim, func=partial(
+            models._without_retries(openai_embed.func), model="stub-embedding", **client
+        )),
+        llm_func=llm_func,
+        tokenizer=stub_tokenizer(),
+        embedding_model=f"stub-embedding-{dim}",
+        llm_model="stub-llm",
+    )
+
+
+def scenario_extract(args) -> dict:
+    from extract_cache import CACHE_FILE
+    from index_pdfs import iter_extracted_batches
+    from models import get_cache_dir
+
+    pdf_files = sorted(args.corpus.glob("*.pdf"))
+    pages = count_pages(pdf_files)
+    cache_path = get_cache_dir() / CACHE_FILE if args.scenario == "extract_cached" else None
+
+    async def extract_all():
+        chars = segments = 0
+        async for batch in iter_extracted_batches(
+            pdf_files, args.workers, args.batch_size, args.segment_size, cache_path=cache_path
+        ):
+            texts = [text for _, _, _, text, _, _ in batch if text]
+            chars += sum(len(text) for text in texts)
+            segments += len(texts)
+        return chars, segments
+
+    if cache_path:
+        # Warm the cache first, so only cached reads are timed
+        asyncio.run(extract_all())
+    start = time.perf_counter()
+    chars, segments = asyncio.run(extract_all())
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": round(elapsed, 3),
+        "docs_per_s": round(len(pdf_files) / elapsed, 2),
+        "pages_per_s": round(pages / elapsed, 2),
+        "chars": chars,
+        "segments": segments,
+        "segment_size": args.segment_size,
+        # The parent holds the queued segments; workers hold one page window each
+        "parent_rss_mb": peak_rss_mb(children=False),
+    }
+
+
+def scenario_startup(args) -> dict:
+    from storage_meta import read_storage_meta
+
+    start = time.perf_counter()
+    read_storage_meta(args.storage)
+    in_process = time.perf_counter() - start
+
+    # Fresh interpreters, as the plugin runs these commands as pre-flight checks
+    commands = {
+        "status": ["pdf_research.py", "status", "--storage", str(args.storage)],
+        "config": ["pdf_research.py", "config"],
+        "search_help": ["search.py", "--help"],
+        "index_help": ["index_pdfs.py", "--help"],
+    }
+    results = {"read_meta_ms": round(in_process * 1000, 2)}
+    for name, (script, *cli_args) in commands.items():
+        command = [sys.executable, str(SCRIPTS_DIR / script), *cli_args]
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+
+        imports = subprocess.run(
+            [sys.executable, "-X", "importtime", *command[1:]],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        ).stderr
+        loaded = {line.rsplit("|", 1)[-1].strip().split(".")[0] for line in imports.splitlines()}
+        heavy = sorted(loaded.intersection(HEAVY_MODULES))
+        results[name] = {"ms": round(statistics.median(timings) * 1000, 1), "heavy_imports": heavy}
+    return results
+
+
+def scenario_query(args) -> dict:
+    from lightrag import LightRAG, QueryParam
+
+    from lexical_index import LexicalIndex
+    from lightrag_compat import store_location
+    from models import get_embedding_func, get_llm_func, get_tokenizer
+    from search import search
+    from vector_store import get_vector_storage
+
+    async def measure():
+        results = {}
+        for mode in QUERY_MODES:
+            cold = []
+            for query in QUERIES:
+                start = time.perf_counter()
+                await search(query, args.storage, mode, use_server=False, use_cache=False)
+                cold.append(time.perf_counter() - start)
+            results[mode] = {"cold": latency_summary(cold)}
+
+        rag = LightRAG(
+            **store_location(args.storage),
+            embedding_func=get_embedding_func(),
+            llm_model_func=get_llm_func(),
+            tokenizer=get_tokenizer(),
+            vector_storage=get_vector_storage(args.storage),
+        )
+        await rag.initialize_storages()
+        for mode in QUERY_MODES:
+            warm = []
+            for _ in range(args.repeat):
+                for query in QUERIES:
+                    start = time.perf_counter()
+                    await rag.aquery(query, param=QueryParam(mode=mode))
+                    warm.append(time.perf_counter() - start)
+            results[mode]["warm"] = latency_summary(warm)
+        await rag.finalize_storages()
+
+        cold = []
+        for query in QUERIES:
+            start = time.perf_counter()
+            await search(query, args.storage, "lexical", use_server=False, use_cache=False)
+            cold.append(time.perf_counter() - start)
+        index = LexicalIndex(args.storage)
+        warm = []
+        for _ in range(args.repeat):
+            for query in QUERIES:
+                start = time.perf_counter()
+                index.search(query)
+                warm.append(time.perf_counter() - start)
+        results["lexical"] = {"cold": latency_summary(cold), "warm": latency_summary(warm)}
+        return results
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(measure())
+
+
+def scenario_index_sharded(args) -> dict:
+    from index_pdfs import index_pdfs
+
+    pdf_files = sorted(args.corpus.glob("*.pdf"))
+    pages = count_pages(pdf_files)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for shard in range(SHARDS):
+            asyncio.run(index_pdfs(
+                args.corpus, args.storage / f"shard{shard}",
+                workers=args.workers, concurrency=args.concurrency, batch_size=args.batch_size,
+                segment_size=args.segment_size, pdf_files=pdf_files[shard::SHARDS],
+            ))
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": round(elapsed, 3),
+        "docs_per_s": round(len(pdf_files) / elapsed, 2),
+        "pages_per_s": round(pages / elapsed, 2),
+        "shards": SHARDS,
+    }
+
+
+def scenario_query_sharded(args) -> dict:
+    from metrics import get_metrics
+    from search import search_shards
+
+    shard_dirs = {f"shard{shard}": args.storage / f"shard{shard}" for shard in range(args.touch)}
+
+    async def measure():
+        latencies = []
+        for query in QUERIES:
+            start = time.perf_counter()
+            await search_shards(query, shard_dirs, args.storage, "naive", use_cache=False)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        latencies = asyncio.run(measure())
+    load = get_metrics().stage_seconds("storage_load") / len(QUERIES)
+    return {"shards": args.touch, "load_ms": round(load * 1000, 1), **latency_summary(latencies)}
+
+
+def run_scenario(args) -> dict:
+    """Body of the `--scenario` subprocess."""
+    sys.path.insert(0, str(SCRIPTS_DIR))
+    from stub_models import use_stub_models
+
+    use_stub_models(args.embed_latency, args.llm_latency)
+    if args.scenario == "index_throttled":
+        use_throttled_provider(args.throttle_rpm)
+
+    if args.scenario in ("extract", "extract_cached", "extract_large"):
+        result = scenario_extract(args)
+    elif args.scenario in ("index_cold", "index_fast", "index_throttled", "index_noop", "index_rebuild"):
+        result = run_index(args.corpus, args.storage, args)
+    elif args.scenario == "startup":
+        result = scenario_startup(args)
+    elif args.scenario == "index_sharded":
+        result = scenario_index_sharded(args)
+    elif args.scenario == "query_sharded":
+        result = scenario_query_sharded(args)
+    else:
+        result = scenario_query(args)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def spawn_scenario(name: str, args, storage: Path, cache_dir: Path,
+                   corpus: Path = None, segment_size: int = None, touch: int = SHARDS) -> dict:
+    """Run one scenario in a fresh interpreter and parse its JSON result."""
+    command = [
+        sys.executable, str(Path(__file__).resolve()), "--scenario", name,
+        "--corpus", str(corpus or args.corpus), "--storage", str(storage),
+        "--segment-size", str(args.segment_size if segment_size is None else segment_size),
+        "--workers", str(args.workers), "--concurrency", str(args.concurrency),
+        "--batch-size", str(args.batch_size), "--repeat", str(args.repeat),
+        "--embed-latency", str(args.embed_latency), "--llm-latency", str(args.llm_latency),
+        "--throttle-rpm", str(args.throttle_rpm), "--touch", str(touch),
+    ]
+    env = dict(os.environ, PDF_RESEARCH_CACHE_DIR=str(cache_dir))
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1:] or ["failed"]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_summary(results: dict):
+    print("-" * 60)
+    for name, result in results["scenarios"].items():
+        if "error" in result:
+            print(f"{name:<14} ERROR {result['error']}")
+        elif name == "query":
+            print(f"{name:<14} peak RSS {result['peak_rss_mb']} MB")
+            for mode in QUERY_MODES + ["lexical"]:
+                cold, warm = result[mode]["cold"], result[mode]["warm"]
+                print(f"  {mode:<12} cold p50 {cold['p50_ms']} ms  warm p50 {warm['p50_ms']} ms"
+                      f"  warm p99 {warm['p99_ms']} ms")
+        elif name.startswith("query_sharded"):
+            print(f"{name:<14} {result['shards']} shards  load {result['load_ms']} ms"
+                  f"  p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms"
+                  f"  peak RSS {result['peak_rss_mb']} MB")
+        elif name == "startup":
+            print(f"{name:<14} read meta {result['read_meta_ms']} ms")
+            for command in ("status", "config", "search_help", "index_help"):
+                timing = result[command]
+                heavy = ", ".join(timing["heavy_imports"]) or "none"
+                print(f"  {command:<12} {timing['ms']:>7} ms  heavy imports: {heavy}")
+        elif name.startswith("extract_large"):
+            print(f"{name:<14} {result['seconds']:>8} s  {result['pages_per_s']} pages/s"
+                  f"  {result['segments']} segments  parent RSS {result['parent_rss_mb']} MB"
+                  f"  peak RSS {result['peak_rss_mb']} MB")
+        else:
+            line = f"{name:<14} {result['seconds']:>8} s  {result['docs_per_s']} docs/s"
+            line += f"  {result['pages_per_s']} pages/s  peak RSS {result['peak_rss_mb']} MB"
+            if "llm_calls" in result:
+                line += f"  llm {result['llm_calls']}  embed {result['embed_texts']}"
+            if "throttled_responses" in result:
+                line += (f"  429s {result['throttled_responses']}  retries {result['retries']}"
+                         f"  failed PDFs {result['failed_pdfs']}")
+            print(line)
+    print("-" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline PDF research benchmarks")
+    parser.add_argument("--corpus", type=Path, help="Existing PDF directory (default: generate one)")
+    parser.add_argument("--docs", type=int, default=20, help="Generated PDFs (default: 20)")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per generated PDF (default: 5)")
+    parser.add_argument("--words", type=int, default=300, help="Words per generated page (default: 300)")
+    parser.add_argument("--workdir", type=Path, help="Scratch directory (default: a temp dir)")
+    parser.add_argument("--large-pages", type=int, default=1000,
+                        help="Pages of the long PDF for extract_large (default: 1000)")
+    parser.add_argument("--segment-size", type=int, default=200_000,
+                        help="Indexer segment size in characters (default: 200000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction workers")
+    parser.add_argument("--concurrency", type=int, default=4, help="Insert concurrency")
+    parser.add_argument("--batch-size", type=int, default=8, help="Insert batch size")
+    parser.add_argument("--repeat", type=int, default=5, help="Warm query repetitions (default: 5)")
+    parser.add_argument("--embed-latency", type=float, default=0.0,
+                        help="Simulated seconds per embedding call (default: 0)")
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="Simulated seconds per LLM call (default: 0)")
+    parser.add_argument("--throttle-rpm", type=int, default=1200,
+                        help="Requests per minute the index_throttled server admits (default: 1200)")
+    parser.add_argument("--only", nargs="+", choices=SCENARIOS, help="Run a subset of scenarios")
+    parser.add_argument("--output", type=Path, help="Write the JSON results to this file")
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--storage", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--touch", type=int, default=SHARDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = run_scenario(args)
+        print(json.dumps(result))
+        return
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="pdf-research-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    if args.corpus is None:
+        sys.path.insert(0, str(BENCH_DIR))
+        from generate_corpus import generate_corpus
+
+        args.corpus = workdir / "corpus"
+        if not any(args.corpus.glob("*.pdf")):
+            generate_corpus(args.corpus, args.docs, args.pages, args.words)
+
+    storage, rebuilt = workdir / "storage", workdir / "storage_rebuild"
+    cache_dir = workdir / "cache"
+    selected = args.only or SCENARIOS
+    # Later scenarios reuse the store and caches built by index_cold
+    if "index_cold" in selected:
+        shutil.rmtree(storage, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    if "index_rebuild" in selected:
+        shutil.rmtree(rebuilt, ignore_errors=True)
+    # Fast indexing gets its own store and empty caches, like index_cold
+    fast, fast_cache = workdir / "storage_fast", workdir / "cache_fast"
+    if "index_fast" in selected:
+        shutil.rmtree(fast, ignore_errors=True)
+        shutil.rmtree(fast_cache, ignore_errors=True)
+    throttled, throttled_cache = workdir / "storage_throttled", workdir / "cache_throttled"
+    if "index_throttled" in selected:
+        shutil.rmtree(throttled, ignore_errors=True)
+        shutil.rmtree(throttled_cache, ignore_errors=True)
+
+    sharded = workdir / "storage_sharded"
+    if "index_sharded" in selected:
+        shutil.rmtree(sharded, ignore_errors=True)
+
+    print(f"Corpus: {args.corpus} ({len(list(args.corpus.glob('*.pdf')))} PDFs)")
+    print(f"Work Directory: {workdir}")
+
+    large_dir = workdir / "large"
+    if "extract_large" in selected and not any(large_dir.glob("*.pdf")):
+        sys.path.insert(0, str(BENCH_DIR))
+        from generate_corpus import generate_corpus
+
+        generate_corpus(large_dir, docs=1, pages=args.large_pages, words=args.words)
+
+    # (result name, scenario, storage, extra spawn_scenario options)
+    plan = [
+        ("extract", "extract", storage, {}),
+        ("extract_cached", "extract_cached", storage, {}),
+        ("extract_large", "extract_large", storage, {"corpus": large_dir}),
+        ("extract_large_whole", "extract_large", storage, {"corpus": large_dir, "segment_size": 0}),
+        ("index_cold", "index_cold", storage, {}),
+        ("index_fast", "index_fast", fast, {"cache_dir": fast_cache}),
+        ("index_throttled", "index_throttled", throttled, {"cache_dir": throttled_cache}),
+        ("index_noop", "index_noop", storage, {}),
+        ("index_rebuild", "index_rebuild", rebuilt, {}),
+        ("startup", "startup", storage, {}),
+        ("query", "query", storage, {}),
+        ("index_sharded", "index_sharded", sharded, {}),
+        ("query_sharded_1", "query_sharded", sharded, {"touch": 1}),
+        ("query_sharded_2", "query_sharded", sharded, {"touch": 2}),
+        (f"query_sharded_{SHARDS}", "query_sharded", sharded, {"touch": SHARDS}),
+    ]
+    results = {
+        "config": {
+            "corpus": str(args.corpus), "workers": args.workers,
+            "concurrency": args.concurrency, "batch_size": args.batch_size,
+            "embed_latency": args.embed_latency, "llm_latency": args.llm_latency,
+            "throttle_rpm": args.throttle_rpm, "python": sys.version.split()[0],
+        },
+        "scenarios": {},
+    }
+    for name, scenario, scenario_storage, options in plan:
+        if scenario not in selected:
+            continue
+        print(f"Running {name}...", flush=True)
+        options = dict(options)
+        results["scenarios"][name] = spawn_scenario(
+            scenario, args, scenario_storage, options.pop("cache_dir", cache_dir), **options
+        )
+
+    print_summary(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Deterministic Stub Model Providers
+Local stand-ins for the OpenAI embedding and completion functions so the
+benchmarks run offline, for free, and give the same index on every run.
+
+- stub_embedding_func(): hashed bag-of-words vectors, L2-normalized
+- stub_llm_func(): answers keyword extraction with JSON, entity extraction
+  with records in LightRAG's delimiter format (built from the capitalized
+  words of the input text), description summaries and queries with plain text
+- stub_tokenizer(): reversible word-piece tokenizer, so no tiktoken download
+
+Both functions sleep for a configurable latency per call to model the
+round trip of a real provider, and count their calls in STUB_CALLS.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+STUB_CALLS = {"embed_calls": 0, "embed_texts": 0, "llm_calls": 0, "llm_prompt_chars": 0}
+
+_WORD = re.compile(r"\w+")
+
+
+def _bucket(word: str, dim: int) -> int:
+    return int.from_bytes(hashlib.md5(word.encode()).digest()[:4], "little") % dim
+
+
+def stub_embedding_func(dim: int = 256, latency: float = 0.0):
+    """Deterministic hashed bag-of-words embeddings as a LightRAG EmbeddingFunc."""
+    from lightrag.utils import EmbeddingFunc
+
+    async def embed(texts: list, **kwargs) -> np.ndarray:
+        STUB_CALLS["embed_calls"] += 1
+        STUB_CALLS["embed_texts"] += len(texts)
+        if latency:
+            await asyncio.sleep(latency)
+        vectors = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                vectors[row, _bucket(word, dim)] += 1.0
+            norm = np.linalg.norm(vectors[row])
+            if norm:
+                vectors[row] /= norm
+        return vectors
+
+    return EmbeddingFunc(embedding_dim=dim, max_token_size=8192, func=embed)
+
+
+def _extraction_response(text: str) -> str:
+    from lightrag.prompt import PROMPTS
+
+    tuple_delimiter = PROMPTS.get("DEFAULT_TUPLE_DELIMITER", "<|#|>")
+    completion_delimiter = PROMPTS.get("DEFAULT_COMPLETION_DELIMITER", "<|COMPLETE|>")
+
+    names = sorted(set(re.findall(r"\b[A-Z][a-z]{3,}\b", text)))[:6] or ["Document"]
+    rows = [
+        f"entity{tuple_delimiter}{name}{tuple_delimiter}concept"
+        f"{tuple_delimiter}{name} is mentioned in the input text."
+        for name in names
+    ]
+    for source, target in zip(names, names[1:]):
+        rows.append(
+            f"relation{tuple_delimiter}{source}{tuple_delimiter}{target}"
+            f"{tuple_delimiter}co-occurrence{tuple_delimiter}{source} appears with {target}."
+        )
+    rows.append(completion_delimiter)
+    return "\n".join(rows)
+
+
+def stub_llm_func(latency: float = 0.0):
+    """Deterministic completion function shaped like gpt_4o_mini_complete."""
+
+    async def complete(prompt, system_prompt=None, history_messages=None,
+                       keyword_extraction=False, **kwargs) -> str:
+        STUB_CALLS["llm_calls"] += 1
+        STUB_CALLS["llm_prompt_chars"] += len(prompt) + len(system_prompt or "")
+        if latency:
+            await asyncio.sleep(latency)
+
+        full_prompt = f"{system_prompt or ''}\n{prompt}"
+        if keyword_extraction or "keyword extractor" in full_prompt:
+            words = _WORD.findall(prompt)
+            return json.dumps({
+                "high_level_keywords": words[-3:],
+                "low_level_keywords": [w for w in words if w[:1].isupper()][-5:],
+            })
+        if "---Input Text---" in full_prompt:
+            return _extraction_response(full_prompt.rsplit("---Input Text---", 1)[-1])
+        if "descriptions" in full_prompt and "summary" in full_prompt:
+            return "Synthesized description of the entity from the stub model."
+        return "Stub answer based on the retrieved context."
+
+    return complete
+
+
+class _WordPieces:
+    """Reversible tokenizer: roughly one token per short word piece."""
+
+    _PIECE = re.compile(r"\s*\S{1,6}|\s+")
+
+    def __init__(self):
+        self.ids = {}
+        self.pieces = []
+
+    def encode(self, text: str, **kwargs) -> list:
+        tokens = []
+        for piece in self._PIECE.findall(text):
+            token = self.ids.get(piece)
+            if token is None:
+                token = self.ids[piece] = len(self.pieces)
+                self.pieces.append(piece)
+            tokens.append(token)
+        return tokens
+
+    def decode(self, tokens: list, **kwargs) -> str:
+        return "".join(self.pieces[token] for token in tokens)
+
+
+def stub_tokenizer():
+    """LightRAG Tokenizer that needs no tiktoken download."""
+    from lightrag.utils import Tokenizer
+
+    return Tokenizer(model_name="stub-word-pieces", tokenizer=_WordPieces())
+
+
+def use_stub_models(embed_latency: float = 0.0, llm_latency: float = 0.0, dim: int = 256):
+    """Route the plugin's model functions (models.py) to the stubs."""
+    import models
+
+    # The indexer and search refuse to start without a key; the stubs never use it
+    os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+    models.set_model_overrides(
+        embedding_func=stub_embedding_func(dim, embed_latency),
+        llm_func=stub_llm_func(llm_latency),
+        tokenizer=stub_tokenizer(),
+        embedding_model=f"stub-embedding-{dim}",
+        llm_model="stub-llm",
+    )
@@ -0,0 +1,126 @@
+"""
+Throttling Stand-In Provider
+Local OpenAI-compatible HTTP server that enforces a rate limit, so the
+indexer's real OpenAI client path and its rate limiter (rate_limit.py) can be
+benchmarked offline.
+
+- POST /v1/embeddings: stub_embedding_func() vectors, as floats or base64
+- POST /v1/chat/completions: stub_llm_func() answers
+
+Each endpoint admits `rpm` requests per minute from a token bucket holding
+one second's worth, like a provider's limiter; requests beyond that get a 429
+with a Retry-After header. THROTTLE_STATS counts both.
+"""
+
+import asyncio
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from stub_models import stub_embedding_func, stub_llm_func
+
+THROTTLE_STATS = {"served": 0, "throttled": 0}
+
+
+class _Bucket:
+    """rpm / 60 requests per second, refilled continuously, bursting one second's worth."""
+
+    def __init__(self, rpm: int):
+        self.rate = rpm / 60
+        self.level = self.capacity = max(1.0, self.rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def admit(self) -> float:
+        """0 if the request may proceed, else the seconds until it would."""
+        with self.lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.level >= 1:
+                self.level -= 1
+                return 0.0
+            return (1 - self.level) / self.rate
+
+
+def _handler(rpm: int, dim: int, latency: float):
+    buckets = {"/v1/embeddings": _Bucket(rpm), "/v1/chat/completions": _Bucket(rpm)}
+    embed = stub_embedding_func(dim, latency)
+    complete = stub_llm_func(latency)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            bucket = buckets.get(self.path)
+            if bucket is None:
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            wait = bucket.admit()
+            if wait:
+                THROTTLE_STATS["throttled"] += 1
+                self._send(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                           "code": "rate_limit_exceeded"}},
+                           {"retry-after-ms": str(int(wait * 1000) + 1)})
+                return
+            THROTTLE_STATS["served"] += 1
+            if self.path == "/v1/embeddings":
+                self._send(200, self._embeddings(request))
+            else:
+                self._send(200, self._completion(request))
+
+        def _embeddings(self, request: dict) -> dict:
+            texts = request["input"]
+            vectors = asyncio.run(embed.func(texts if isinstance(texts, list) else [texts]))
+            as_base64 = request.get("encoding_format") == "base64"
+            data = [
+                {"object": "embedding", "index": i,
+                 "embedding": base64.b64encode(vector.astype(np.float32).tobytes()).decode()
+                 if as_base64 else vector.tolist()}
+                for i, vector in enumerate(vectors)
+            ]
+            return {"object": "list", "data": data, "model": request["model"],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+        def _completion(self, request: dict) -> dict:
+            messages = request["messages"]
+            system = "\n".join(m["content"] for m in messages if m["role"] == "system")
+            prompt = messages[-1]["content"]
+            answer = asyncio.run(complete(
+                prompt, system_prompt=system,
+                keyword_extraction=request.get("response_format") is not None,
+            ))
+            return {
+                "id": "stub", "object": "chat.completion", "created": int(time.time()),
+                "model": request["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": answer}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+
+    return Handler
+
+
+def start_throttle_server(rpm: int, dim: int = 256, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Serve on a free localhost port in a daemon thread; the base URL ends in /v1."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(rpm, dim, latency))
+    server.daemon_threads = True
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,242 @@
+"""
+Approximate Nearest-Neighbour Index
+Inverted-file (IVF) partitioning of vector matrices, trained with spherical k-means.
+
+An exact search scores every stored vector, so query time grows linearly with
+the corpus. The IVF index clusters the vectors around `nlist` centroids and a
+query scores only the rows of the `nprobe` lists whose centroids are closest
+to it. MmapVectorStorage writes each list's rows contiguously, so a probe
+reads a few short runs of the memory-mapped matrix instead of all of it.
+
+Indexing maintains the partition incrementally: new vectors join the list of
+their nearest centroid, and the centroids are retrained only once the store
+has grown RETRAIN_GROWTH times past the size they were trained on. Stores
+smaller than IVF_MIN_ROWS are always searched exactly.
+
+ann_report() measures recall against exact search and the latency of both
+for a range of nprobe values, using stored vectors as sample queries.
+"""
+
+import json
+import math
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+VECTOR_INDEXES = ("exact", "ivf")
+DEFAULT_NPROBE = 16
+REPORT_NPROBES = (1, 2, 4, 8, 16, 32, 64)
+
+# Below this many vectors a full scan is already fast
+IVF_MIN_ROWS = 20000
+# Retrain the centroids once the store outgrows their training size this much
+RETRAIN_GROWTH = 4
+TRAIN_ROWS_PER_LIST = 64
+KMEANS_ITERATIONS = 10
+ASSIGN_BLOCK = 16384
+
+
+def list_count(rows: int) -> int:
+    """Number of IVF lists for a store of `rows` vectors."""
+    return int(min(4096, max(8, round(2 * math.sqrt(rows)))))
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid for each normalized vector."""
+    lists = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK], dtype=np.float32)
+        lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return lists
+
+
+def train_centroids(sample: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-length centroids maximizing cosine similarity."""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        lists = assign_lists(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, lists, sample)
+        counts = np.bincount(lists, minlength=nlist)
+        # Re-seed empty lists with random sample rows
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms == 0, 1, norms)
+    return centroids.astype(np.float32)
+
+
+def partition(read_rows: Callable[[np.ndarray], np.ndarray], rows: int, nprobe: int,
+              previous: Optional[dict] = None,
+              known_lists: Optional[np.ndarray] = None) -> tuple:
+    """
+    Group `rows` vectors into IVF lists.
+
+    `read_rows(indices)` returns the normalized vectors at those indices.
+    `previous` is an existing index ({"centroids", "trained_rows"}) to reuse,
+    with `known_lists` the list of each row already assigned under it (-1 for
+    new rows). Returns (order, ivf): the row permutation that makes every
+    list contiguous, and {"centroids", "offsets", "nprobe", "trained_rows"}.
+    """
+    if previous is not None and rows <= RETRAIN_GROWTH * previous["trained_rows"]:
+        centroids = previous["centroids"]
+        trained_rows = previous["trained_rows"]
+        lists = (np.full(rows, -1, dtype=np.int32) if known_lists is None
+                 else np.asarray(known_lists, dtype=np.int32))
+    else:
+        nlist = list_count(rows)
+        rng = np.random.default_rng(rows)
+        sample_size = min(rows, nlist * TRAIN_ROWS_PER_LIST)
+        sample = np.sort(rng.choice(rows, sample_size, replace=False))
+        centroids = train_centroids(read_rows(sample), nlist)
+        trained_rows = rows
+        lists = np.full(rows, -1, dtype=np.int32)
+
+    unknown = np.flatnonzero(lists < 0)
+    for start in range(0, len(unknown), ASSIGN_BLOCK):
+        block = unknown[start:start + ASSIGN_BLOCK]
+        lists[block] = assign_lists(read_rows(block), centroids)
+
+    order = np.argsort(lists, kind="stable")
+    offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(lists, minlength=len(centroids)), out=offsets[1:])
+    return order, {
+        "centroids": centroids,
+        "offsets": offsets.tolist(),
+        "nprobe": nprobe,
+        "trained_rows": trained_rows,
+    }
+
+
+class IVFIndex:
+    """Centroids and list boundaries over a matrix whose lists are contiguous."""
+
+    def __init__(self, centroids: np.ndarray, offsets: list, nprobe: int = DEFAULT_NPROBE,
+                 trained_rows: int = 0, order: Optional[np.ndarray] = None):
+        self.centroids = centroids
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.nprobe = nprobe
+        self.trained_rows = trained_rows
+        # Row permutation for an index over a matrix that was not reordered
+        self.order = order
+
+    def list_of(self, rows: np.ndarray) -> np.ndarray:
+        """List each (reordered) row belongs to."""
+        return (np.searchsorted(self.offsets, rows, side="right") - 1).astype(np.int32)
+
+    def candidates(self, query_vector: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Sorted rows of the lists closest to the query."""
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        scores = self.centroids @ query_vector
+        probed = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        rows = np.concatenate([
+            np.arange(self.offsets[c], self.offsets[c + 1]) for c in probed
+        ])
+        if self.order is not None:
+            rows = self.order[rows]
+        return np.sort(rows)
+
+
+def _top(scores: np.ndarray, rows: np.ndarray, k: int, exclude: int) -> set:
+    keep = rows != exclude
+    scores, rows = scores[keep], rows[keep]
+    if len(scores) > k:
+        best = np.argpartition(-scores, k)[:k]
+        return set(rows[best].tolist())
+    return set(rows.tolist())
+
+
+def ann_report(storage_dir: Path, namespace: str = "chunks", queries: int = 200,
+               top_k: int = 10, nprobes: tuple = REPORT_NPROBES,
+               as_json: bool = False) -> int:
+    """
+    Print recall@top_k and latency of IVF search against exact search.
+
+    Uses the store's index when it has one, otherwise trains a temporary
+    one in memory, so settings can be evaluated before enabling them.
+    Returns 1 if the namespace holds no vectors.
+    """
+    from vector_store import SCORE_BLOCK, load_vector_matrix
+
+    _, matrix, index = load_vector_matrix(storage_dir, namespace)
+    rows = len(matrix)
+    if rows <= top_k:
+        print(f"Not enough {namespace} vectors in {storage_dir} for a report ({rows}).")
+        return 1
+
+    start = time.perf_counter()
+    if index is not None:
+        source = f"stored index, nprobe {index.nprobe}"
+    else:
+        order, ivf = partition(lambda r: np.asarray(matrix[r]), rows, DEFAULT_NPROBE)
+        index = IVFIndex(ivf["centroids"], ivf["offsets"], order=order)
+        source = f"temporary index, built in {time.perf_counter() - start:.1f} s"
+
+    rng = np.random.default_rng(0)
+    sample = np.sort(rng.choice(rows, min(queries, rows), replace=False))
+    query_vectors = np.asarray(matrix[sample])
+
+    truth, exact_ms = [], []
+    for row, vector in zip(sample, query_vectors):
+        start = time.perf_counter()
+        best_rows, best_scores = [], []
+        for first in range(0, rows, SCORE_BLOCK):
+            scores = matrix[first:first + SCORE_BLOCK] @ vector
+            keep = min(top_k + 1, len(scores))
+            best = np.argpartition(-scores, keep - 1)[:keep]
+            best_rows.append(best + first)
+            best_scores.append(scores[best])
+        truth.append(_top(np.concatenate(best_scores), np.concatenate(best_rows), top_k, row))
+        exact_ms.append((time.perf_counter() - start) * 1000)
+
+    results = []
+    for nprobe in sorted(n for n in nprobes if n <= len(index.centroids)):
+        hits, latencies, scanned = 0, [], 0
+        for row, vector, expected in zip(sample, query_vectors, truth):
+            start = time.perf_counter()
+            candidates = index.candidates(vector, nprobe)
+            found = _top(matrix[candidates] @ vector, candidates, top_k, row)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(found & expected)
+            scanned += len(candidates)
+        results.append({
+            "nprobe": nprobe,
+            "recall": round(hits / sum(len(t) for t in truth), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "scanned": round(scanned / len(sample) / rows, 4),
+        })
+
+    report = {
+        "namespace": namespace,
+        "vectors": rows,
+        "lists": len(index.centroids),
+        "queries": len(sample),
+        "top_k": top_k,
+        "index": source,
+        "exact_p50_ms": round(float(np.percentile(exact_ms, 50)), 3),
+        "exact_p99_ms": round(float(np.percentile(exact_ms, 99)), 3),
+        "ivf": results,
+    }
+    if as_json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print("=" * 60)
+    print(f"ANN Report: {namespace} ({rows:,} vectors, {len(index.centroids)} lists)")
+    print(f"Index: {source}")
+    print(f"Queries: {len(sample)} stored vectors, recall@{top_k} against exact search")
+    print("=" * 60)
+    print(f"{'nprobe':>8} {'recall':>8} {'p50 ms':>9} {'p99 ms':>9} {'scanned':>9}")
+    print(f"{'exact':>8} {1.0:>8.3f} {report['exact_p50_ms']:>9.2f} "
+          f"{report['exact_p99_ms']:>9.2f} {1.0:>9.1%}")
+    for r in results:
+        print(f"{r['nprobe']:>8} {r['recall']:>8.3f} {r['p50_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['scanned']:>9.1%}")
+    print("-" * 60)
+    print("Apply with: python pdf_research.py config --vector-index ivf --ann-nprobe <n>")
+    return 0
@@ -0,0 +1,266 @@
+"""
+Near-Duplicate Page Detection
+MinHash signatures and LSH buckets for the pages of indexed PDFs.
+
+PDF folders tend to hold revisions of the same report and repeat cover
+pages, legal boilerplate and appendices across files. Before a segment is
+inserted, each page is compared with every page indexed so far: pages whose
+estimated Jaccard similarity (over word shingles) reaches the threshold are
+left out of the inserted text, with a one-line note pointing at the page they
+repeat, and the PDF's manifest entry links the document that holds the
+original. A PDF whose pages are all duplicates inserts nothing. When a
+document fails to insert, the pages registered under it are dropped and the
+PDFs that link to it fail too, to be retried on the next run.
+
+Signatures are stored in the storage directory, so later runs detect
+duplicates of earlier ones:
+
+- dedup_signatures.npy: one row of NUM_PERM uint32 minimums per page
+- dedup_pages.json: the PDF (manifest key), name, page number and LightRAG
+  document id of each row
+
+Candidates come from LSH banding, with bands sized so that pairs somewhat
+below the threshold still collide; each candidate is then checked against
+the threshold by comparing full signatures.
+"""
+
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+# numpy is imported where pages are hashed or signatures loaded, so that
+# index_pdfs.py --help does not pay for it
+if TYPE_CHECKING:
+    import numpy as np
+
+SIGNATURES_FILE = "dedup_signatures.npy"
+PAGES_FILE = "dedup_pages.json"
+
+DEFAULT_THRESHOLD = 0.85
+NUM_PERM = 128
+SHINGLE_WORDS = 5
+# Pages shorter than this (titles, section dividers) are always kept
+MIN_PAGE_WORDS = 30
+
+_permutations = None
+
+_WORD = re.compile(r"\w+")
+_PAGE = re.compile(r"(?:^|(?<=\n\n))\[Page (\d+)\]\n")
+
+
+def lsh_bands(threshold: float) -> tuple:
+    """
+    (bands, rows) whose collision curve rises a little below the threshold.
+
+    Two pages with similarity s share a band with probability
+    1 - (1 - s**rows)**bands, which crosses 1/2 near (1/bands)**(1/rows).
+    """
+    target = max(0.05, threshold - 0.1)
+    options = [(NUM_PERM // rows, rows) for rows in range(1, 33)]
+    return min(options, key=lambda o: abs((1 / o[0]) ** (1 / o[1]) - target))
+
+
+def _get_permutations() -> tuple:
+    """(multipliers, increments) of the NUM_PERM hash functions, made once."""
+    global _permutations
+    if _permutations is None:
+        import numpy as np
+
+        rng = np.random.default_rng(0x5EED)
+        # Multiply-shift hashing: odd 64-bit multipliers, top 32 bits of the product
+        multipliers = rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        increments = rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+        _permutations = (multipliers, increments)
+    return _permutations
+
+
+def minhash(text: str) -> Optional["np.ndarray"]:
+    """MinHash signature of a page's word shingles, or None for a short page."""
+    words = _WORD.findall(text.lower())
+    if len(words) < MIN_PAGE_WORDS:
+        return None
+    import numpy as np
+
+    multipliers, increments = _get_permutations()
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS])
+                for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles),
+                         dtype=np.uint64, count=len(shingles))
+    with np.errstate(over="ignore"):
+        permuted = (multipliers[:, None] * hashes[None, :] + increments[:, None]) >> np.uint64(32)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def split_pages(text: str) -> tuple:
+    """Split segment text into its header and a list of (page_num, page_text)."""
+    parts = _PAGE.split(text)
+    header, rest = parts[0], parts[1:]
+    # Each page but the last keeps the blank line that separates it from the next
+    return header, [(int(rest[i]), rest[i + 1].removesuffix("\n\n"))
+                    for i in range(0, len(rest), 2)]
+
+
+class PageDedup:
+    """Persistent MinHash/LSH index of the pages of indexed PDFs."""
+
+    def __init__(self, storage_dir: Path, threshold: float = DEFAULT_THRESHOLD):
+        import numpy as np
+
+        self.storage_dir = storage_dir
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold)
+        self.signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self.pages = []
+        self._new = []
+        self._buckets = [{} for _ in range(self.bands)]
+        self._dirty = False
+
+    @classmethod
+    def load(cls, storage_dir: Path, threshold: float = DEFAULT_THRESHOLD) -> "PageDedup":
+        """Load the stored signatures, or start empty."""
+        import numpy as np
+
+        dedup = cls(storage_dir, threshold)
+        signatures_path = storage_dir / SIGNATURES_FILE
+        pages_path = storage_dir / PAGES_FILE
+        if signatures_path.exists() and pages_path.exists():
+            try:
+                signatures = np.load(signatures_path)
+                with open(pages_path) as f:
+                    pages = json.load(f)
+                if len(signatures) == len(pages) and signatures.shape[1:] == (NUM_PERM,):
+                    dedup.signatures, dedup.pages = signatures, pages
+            except (OSError, ValueError):
+                pass
+        for row in range(len(dedup.pages)):
+            dedup._bucket(row, dedup.signatures[row])
+        return dedup
+
+    def _band_keys(self, signature: "np.ndarray"):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _bucket(self, row: int, signature: "np.ndarray"):
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(row)
+
+    def _signature(self, row: int) -> "np.ndarray":
+        if row < len(self.signatures):
+            return self.signatures[row]
+        return self._new[row - len(self.signatures)]
+
+    def match(self, signature: "np.ndarray") -> Optional[dict]:
+        """The most similar indexed page at or above the threshold, if any."""
+        import numpy as np
+
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+        best, best_score = None, self.threshold
+        # Earlier rows win ties, so matches point at the first indexed copy
+        for row in sorted(candidates):
+            if self.pages[row] is None:
+                continue
+            score = float(np.mean(self._signature(row) == signature))
+            if score > best_score or best is None and score == best_score:
+                best, best_score = self.pages[row], score
+        return best
+
+    def add(self, key: str, name: str, page: int, doc_id: Optional[str],
+            signature: "np.ndarray") -> int:
+        """Register a page as held by document `doc_id`, returning its row."""
+        row = len(self.pages)
+        self.pages.append({"key": key, "name": name, "page": page, "doc_id": doc_id})
+        self._new.append(signature)
+        self._bucket(row, signature)
+        self._dirty = True
+        return row
+
+    def forget(self, key: str):
+        """Drop the pages of a PDF that was removed, changed or failed."""
+        for row, page in enumerate(self.pages):
+            if page is not None and page["key"] == key:
+                self.pages[row] = None
+                self._dirty = True
+
+    def forget_docs(self, doc_ids):
+        """Drop the pages held by documents that failed to insert, whichever PDF registered them."""
+        doc_ids = set(doc_ids)
+        for row, page in enumerate(self.pages):
+            if page is not None and page["doc_id"] in doc_ids:
+                self.pages[row] = None
+                self._dirty = True
+
+    def filter_segment(self, key: str, name: str, text: str, doc_id_of) -> tuple:
+        """
+        Drop the pages of a segment that repeat indexed pages.
+
+        Returns (text, linked_doc_ids, duplicate_pages): the segment text
+        with each duplicate page replaced by a note naming the original ("" if
+        no page is left), the documents holding those originals, and a list
+        of (page, original, page_text) for reporting. Each kept page is
+        registered as soon as it is accepted, so a later page of the same
+        segment that repeats it is dropped too; kept pages and their repeats
+        are held by `doc_id_of(text)`, the id the segment is inserted as, and
+        repeats of other documents by the document they link to.
+        """
+        header, pages = split_pages(text)
+        kept, linked, duplicates = [], [], []
+        own = []  # rows held by this segment's document, whose id is known last
+        for page_num, page_text in pages:
+            signature = minhash(page_text)
+            original = self.match(signature) if signature is not None else None
+            if original is None:
+                kept.append(f"[Page {page_num}]\n{page_text}")
+                if signature is not None:
+                    own.append(self.add(key, name, page_num, None, signature))
+                continue
+            kept.append(f"[Page {page_num}]\n(Same as {original['name']}, page {original['page']})")
+            duplicates.append((page_num, original, page_text))
+            if original["doc_id"] is None:
+                # Repeats an earlier page of this segment
+                own.append(self.add(key, name, page_num, None, signature))
+                continue
+            if original["doc_id"] not in linked:
+                linked.append(original["doc_id"])
+            # Registered under the original's document, which this PDF keeps alive
+            self.add(key, name, page_num, original["doc_id"], signature)
+
+        if not duplicates:
+            new_text = text
+        elif own:
+            new_text = header + "\n\n".join(kept)
+        else:
+            # Nothing but repeated pages and short ones such as a title page
+            new_text = ""
+        if new_text:
+            doc_id = doc_id_of(new_text)
+            for row in own:
+                self.pages[row]["doc_id"] = doc_id
+        return new_text, linked, duplicates
+
+    def save(self):
+        """Write the live signatures and page records (forgotten rows are dropped)."""
+        if not self._dirty:
+            return
+        import numpy as np
+
+        signatures = self.signatures
+        if self._new:
+            signatures = np.vstack([signatures, np.stack(self._new)])
+        live = [row for row, page in enumerate(self.pages) if page is not None]
+        signatures = signatures[live]
+        pages = [self.pages[row] for row in live]
+
+        signatures_path = self.storage_dir / SIGNATURES_FILE
+        pages_path = self.storage_dir / PAGES_FILE
+        with open(f"{signatures_path}.tmp", "wb") as f:
+            np.save(f, signatures)
+        with open(f"{pages_path}.tmp", "w") as f:
+            json.dump(pages, f)
+        os.replace(f"{signatures_path}.tmp", signatures_path)
+        os.replace(f"{pages_path}.tmp", pages_path)
+        self._dirty = False
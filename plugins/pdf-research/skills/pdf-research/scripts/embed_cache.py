@@ -0,0 +1,150 @@
+"""
+Content-Addressed Embedding Cache
+Serves repeated embedding requests from a compact on-disk cache.
+
+Vectors are stored per embedding model as raw float32 rows in an append-only
+`<model>-<dim>.f32` file. A companion `.idx` file holds fixed-size records of
+(16-byte BLAKE2b hash of model and text, row number); a record is written only
+after its row, so a crash can leave an unused row but never a wrong vector.
+The cache lives outside any storage directory and is shared by all of them,
+so rebuilding a store or indexing the same PDF twice embeds nothing new.
+"""
+
+import hashlib
+import os
+import re
+import struct
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+_KEY_SIZE = 16
+_RECORD = struct.Struct(f"<{_KEY_SIZE}sQ")
+
+
+def embedding_key(model: str, text: str) -> bytes:
+    return hashlib.blake2b(f"{model}\0{text}".encode(), digest_size=_KEY_SIZE).digest()
+
+
+class EmbeddingCache:
+    """Append-only float32 vector file plus a hash -> row index."""
+
+    def __init__(self, cache_dir: Path, model: str, dim: int):
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}-{dim}"
+        self.model = model
+        self.dim = dim
+        self.row_bytes = dim * 4
+        self.vectors_path = cache_dir / f"{stem}.f32"
+        self.index_path = cache_dir / f"{stem}.idx"
+        self.vectors_path.touch()
+        self.index_path.touch()
+        self.rows = {}
+        self.index_offset = 0
+        self.matrix = None
+        self._read_index()
+
+    def _read_index(self):
+        """Pick up index records appended since the last read (by any process)."""
+        with open(self.index_path, "rb") as f:
+            f.seek(self.index_offset)
+            data = f.read()
+        usable = len(data) - len(data) % _RECORD.size
+        for key, row in _RECORD.iter_unpack(data[:usable]):
+            self.rows[key] = row
+        self.index_offset += usable
+
+    def _vectors(self, min_rows: int):
+        """Memory-map the vector file, remapping when it has grown."""
+        if self.matrix is None or len(self.matrix) < min_rows:
+            n_rows = self.vectors_path.stat().st_size // self.row_bytes
+            self.matrix = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, self.dim)
+            ) if n_rows else np.empty((0, self.dim), dtype=np.float32)
+        return self.matrix
+
+    def lookup(self, keys: list) -> dict:
+        """Return {key: vector} for the keys that are cached."""
+        found = {key: self.rows[key] for key in keys if key in self.rows}
+        if len(found) < len(set(keys)):
+            self._read_index()
+            found = {key: self.rows[key] for key in keys if key in self.rows}
+        if not found:
+            return {}
+        matrix = self._vectors(max(found.values()) + 1)
+        return {key: np.array(matrix[row]) for key, row in found.items()}
+
+    def add(self, keys: list, vectors: np.ndarray):
+        """Append vectors and their index records."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(keys), self.dim)
+        with open(self.index_path, "ab") as index_file:
+            if fcntl:
+                fcntl.flock(index_file, fcntl.LOCK_EX)
+            try:
+                with open(self.vectors_path, "ab") as vector_file:
+                    vector_file.seek(0, os.SEEK_END)
+                    # Drop any partial row left by a torn write; it has no record
+                    first_row = vector_file.tell() // self.row_bytes
+                    vector_file.truncate(first_row * self.row_bytes)
+                    vector_file.write(vectors.tobytes())
+                    vector_file.flush()
+                    os.fsync(vector_file.fileno())
+                index_file.seek(0, os.SEEK_END)
+                index_file.truncate(index_file.tell() - index_file.tell() % _RECORD.size)
+                index_file.write(b"".join(
+                    _RECORD.pack(key, first_row + i) for i, key in enumerate(keys)
+                ))
+                index_file.flush()
+            finally:
+                if fcntl:
+                    fcntl.flock(index_file, fcntl.LOCK_UN)
+        self._read_index()
+
+
+def cached_embedding_func(embedding_func, model: str, cache_dir: Path,
+                          replay_only: bool = False):
+    """
+    Wrap a LightRAG embedding function with the on-disk cache.
+
+    Hits are served locally; the misses of each call are deduplicated and sent
+    upstream in a single request. With `replay_only`, a miss raises
+    ReplayMissError instead.
+    """
+    from lightrag.utils import EmbeddingFunc
+
+    from llm_cache import ReplayMissError
+    from metrics import get_metrics
+
+    cache = EmbeddingCache(cache_dir, model, embedding_func.embedding_dim)
+
+    async def embed(texts: list, **kwargs) -> np.ndarray:
+        if not texts:
+            return np.empty((0, cache.dim), dtype=np.float32)
+        keys = [embedding_key(model, text) for text in texts]
+        vectors = cache.lookup(keys)
+        get_metrics().count("embed_cache_hits", len(vectors))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing and replay_only:
+            raise ReplayMissError(f"{len(missing)} embeddings are not cached")
+        if missing:
+            fresh = await embedding_func(list(missing.values()), **kwargs)
+            fresh = np.asarray(fresh, dtype=np.float32).reshape(len(missing), -1)
+            cache.add(list(missing), fresh)
+            vectors.update(zip(missing, fresh))
+
+        return np.stack([vectors[key] for key in keys])
+
+    return EmbeddingFunc(
+        embedding_dim=embedding_func.embedding_dim,
+        max_token_size=embedding_func.max_token_size,
+        func=embed,
+    )
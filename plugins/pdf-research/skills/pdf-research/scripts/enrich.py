@@ -0,0 +1,166 @@
+"""
+Knowledge-Graph Enrichment
+Second indexing phase: entity and relation extraction for vector-only documents.
+
+`index --fast` inserts PDFs with LightRAG's skip_kg process option: they are
+chunked and embedded, so naive and --context-only search find them within
+seconds, but they add nothing to the knowledge graph that local, global and
+hybrid search read. enrich() finds those documents in the doc status store
+and runs LightRAG's entity extraction and graph merge on their stored chunks.
+The chunks and their vectors stay in place, so a document remains searchable
+while it is enriched.
+
+Documents are enriched one at a time and each is committed (stores flushed,
+status, manifest and sidecar updated) before the next starts, so an
+interrupted run resumes where it stopped. A document cut off mid-merge is
+simply merged again: LightRAG deduplicates descriptions and source ids, and
+the recorded completions (see llm_cache.py) make the repeated extraction free.
+"""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+
+from lightrag_compat import (enrich_unsupported, extract_entities, flush_storages, merge_graph,
+                             store_location)
+from manifest import Manifest
+from metrics import get_metrics
+from models import get_embedding_func, get_llm_func, get_tokenizer
+from storage_meta import lock_storage, write_storage_meta
+
+# LightRAG process option that skips entity and relation extraction
+VECTOR_ONLY = "!"
+ENRICH_LOG = "enrich.log"
+
+
+def is_vector_only(status) -> bool:
+    """Whether a doc status record (dict or DocProcessingStatus) has no graph yet."""
+    if isinstance(status, dict):
+        state, metadata = status.get("status"), status.get("metadata")
+    else:
+        state, metadata = status.status, status.metadata
+    return str(getattr(state, "value", state)) == "processed" and bool((metadata or {}).get("skip_kg"))
+
+
+async def enrich_document(rag, doc_id: str, status) -> tuple:
+    """
+    Extract a vector-only document's entities and relations into the graph.
+
+    Returns the number of (entities, relations) extracted.
+    """
+    chunk_ids = list(status.chunks_list or [])
+    rows = await rag.text_chunks.get_by_ids(chunk_ids)
+    chunks = {chunk_id: row for chunk_id, row in zip(chunk_ids, rows) if row}
+
+    # LightRAG reports merge progress here; nothing reads it outside its server
+    pipeline_status, pipeline_status_lock = {"history_messages": []}, asyncio.Lock()
+    chunk_results = await extract_entities(rag, chunks)
+    await merge_graph(rag, doc_id, chunk_results, status.file_path,
+                      pipeline_status, pipeline_status_lock)
+    await flush_storages(rag)
+
+    # Re-read: the merge advanced the stored metadata
+    stored = await rag.doc_status.get_by_id(doc_id)
+    metadata = dict((stored or {}).get("metadata") or {})
+    metadata.pop("skip_kg", None)
+    metadata["enriched_time"] = int(time.time())
+    await rag.doc_status.update_doc_status_fields(doc_id, {"metadata": metadata})
+    await rag.doc_status.index_done_callback()
+
+    entities = {name for nodes, _ in chunk_results for name in nodes}
+    relations = {pair for _, edges in chunk_results for pair in edges}
+    return len(entities), len(relations)
+
+
+async def enrich(storage_dir: Path, replay_only: bool = False) -> int:
+    """
+    Add every vector-only document in a store to its knowledge graph.
+
+    Returns 1 if the store is locked by another run or a document failed.
+    """
+    if not replay_only and not os.getenv("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY not set.")
+        return 1
+    if not storage_dir.exists():
+        print(f"Error: storage directory not found: {storage_dir}")
+        return 1
+    unsupported = enrich_unsupported()
+    if unsupported:
+        print(f"Error: {unsupported}")
+        return 1
+    lock = lock_storage(storage_dir)
+    if lock is None:
+        print(f"Error: another indexing or enrichment run is using {storage_dir}.")
+        return 1
+
+    from lightrag import LightRAG
+    from lightrag.base import DocStatus
+
+    from vector_store import get_vector_storage
+
+    try:
+        rag = LightRAG(
+            **store_location(storage_dir),
+            embedding_func=get_embedding_func(replay_only=replay_only),
+            llm_model_func=get_llm_func(record=True, replay_only=replay_only),
+            tokenizer=get_tokenizer(),
+            vector_storage=get_vector_storage(storage_dir),
+        )
+        await rag.initialize_storages()
+        try:
+            processed = await rag.doc_status.get_docs_by_statuses([DocStatus.PROCESSED])
+            pending = sorted(
+                ((doc_id, status) for doc_id, status in processed.items() if is_vector_only(status)),
+                key=lambda item: (item[1].created_at, item[0]),
+            )
+            return await _enrich_pending(rag, storage_dir, pending)
+        finally:
+            await rag.finalize_storages()
+    finally:
+        lock.close()
+
+
+async def _enrich_pending(rag, storage_dir: Path, pending: list) -> int:
+    manifest = Manifest.load(storage_dir)
+    names = {}
+    for entry in manifest.files.values():
+        for doc_id in entry["doc_ids"]:
+            names.setdefault(doc_id, entry["name"])
+
+    print("=" * 60)
+    print(f"Knowledge-Graph Enrichment: {storage_dir}")
+    print(f"Vector-only documents: {len(pending)}")
+    print("=" * 60)
+    if not pending:
+        print("Every document is already in the knowledge graph.")
+        return 0
+
+    metrics = get_metrics()
+    failed = 0
+    start = time.monotonic()
+    for i, (doc_id, status) in enumerate(pending, 1):
+        name = names.get(doc_id) or status.file_path
+        try:
+            with metrics.stage("enrich", doc_id=doc_id):
+                entities, relations = await enrich_document(rag, doc_id, status)
+        except Exception as e:
+            print(f"[{i}/{len(pending)}] {name} - Error: {str(e)[:50]}", flush=True)
+            failed += 1
+            continue
+
+        done = manifest.mark_enriched(doc_id)
+        manifest.save()
+        # Bumping the generation reloads query servers and drops cached answers
+        write_storage_meta(storage_dir, manifest)
+        note = f"{entities} entities, {relations} relations"
+        if done:
+            note += ", PDF fully enriched"
+        print(f"[{i}/{len(pending)}] {name} ({note})", flush=True)
+
+    print("-" * 60)
+    print(f"Enriched: {len(pending) - failed} of {len(pending)} documents "
+          f"in {time.monotonic() - start:.1f} s")
+    if failed:
+        print(f"Failed: {failed} (still vector-only; run enrich again to retry)")
+    return 1 if failed else 0
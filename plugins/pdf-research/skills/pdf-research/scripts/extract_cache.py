@@ -0,0 +1,118 @@
+"""
+PDF Extraction Cache
+Keeps the parsed pages of every PDF so rebuilding a store never parses it again.
+
+Pages are stored in a SQLite file in the shared cache directory, keyed by the
+PDF's SHA-256 content hash, the extractor version and the page number. Each
+page is the PyMuPDF text block list (positions and text) that header and
+footer cleaning works from, as zlib-compressed JSON, so cleaned and raw text
+can both be rebuilt from it. The page count is kept per PDF as well, so a
+fully cached PDF is never opened.
+
+Changing the chunk size, switching the embedding model or recovering a
+corrupted store re-indexes from here and is bounded by model calls rather
+than parsing. Bump EXTRACTOR_VERSION whenever page_blocks() changes what it
+returns; a new PyMuPDF release starts a fresh cache automatically.
+"""
+
+import json
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Optional
+
+CACHE_FILE = "extractions.sqlite"
+EXTRACTOR_VERSION = 1
+
+
+def extractor_version() -> str:
+    """Cache key component: this extractor's version and the PyMuPDF release."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        pymupdf = version("pymupdf")
+    except PackageNotFoundError:
+        pymupdf = "unknown"
+    return f"{EXTRACTOR_VERSION}/pymupdf-{pymupdf}"
+
+
+class ExtractionCache:
+    """SQLite tables of per-PDF page counts and per-page text blocks."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.version = extractor_version()
+        # Pool workers share the file; WAL lets readers run beside a writer
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents "
+            "(sha256 TEXT, version TEXT, pages INTEGER, PRIMARY KEY (sha256, version))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages "
+            "(sha256 TEXT, version TEXT, page INTEGER, data BLOB, "
+            "PRIMARY KEY (sha256, version, page))"
+        )
+        self.conn.commit()
+
+    def page_count(self, sha256: str) -> Optional[int]:
+        row = self.conn.execute(
+            "SELECT pages FROM documents WHERE sha256 = ? AND version = ?",
+            (sha256, self.version),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_page_count(self, sha256: str, pages: int):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?)",
+                (sha256, self.version, pages),
+            )
+
+    def is_complete(self, sha256: str) -> bool:
+        """Whether every page of the PDF is cached."""
+        pages = self.page_count(sha256)
+        if pages is None:
+            return False
+        (cached,) = self.conn.execute(
+            "SELECT COUNT(*) FROM pages WHERE sha256 = ? AND version = ?",
+            (sha256, self.version),
+        ).fetchone()
+        return cached >= pages
+
+    def get_pages(self, sha256: str, first_page: int, last_page: int) -> Optional[list]:
+        """
+        Pages [first_page, last_page) (0-based) as (page_num, blocks) with
+        1-based page numbers, or None unless all of them are cached.
+        """
+        rows = self.conn.execute(
+            "SELECT page, data FROM pages WHERE sha256 = ? AND version = ? "
+            "AND page > ? AND page <= ? ORDER BY page",
+            (sha256, self.version, first_page, last_page),
+        ).fetchall()
+        if len(rows) < last_page - first_page:
+            return None
+        return [(page, json.loads(zlib.decompress(data))) for page, data in rows]
+
+    def put_pages(self, sha256: str, pages: list):
+        """Store (page_num, blocks) pages."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                [
+                    (sha256, self.version, page,
+                     zlib.compress(json.dumps(blocks, ensure_ascii=False).encode()))
+                    for page, blocks in pages
+                ],
+            )
+
+
+_caches = {}
+
+
+def open_cache(path: Path) -> ExtractionCache:
+    """One connection per cache file and process (pool workers reuse theirs)."""
+    if path not in _caches:
+        _caches[path] = ExtractionCache(path)
+    return _caches[path]
@@ -4,7 +4,28 @@ PDF Indexing Script for LightRAG
 Extracts text from PDFs and indexes them into LightRAG for semantic search.
 
 Usage:
-    python index_pdfs.py [--pdf-dir <path>] [--storage-dir <path>]
+    python index_pdfs.py [--pdf-dir <path>] [--storage-dir <path>] [--workers <n>]
+                         [--concurrency <n>] [--batch-size <n>] [--segment-size <n>]
+                         [--dedup-threshold <j>] [--no-clean] [--fast] [--replay-only]
+                         [--metrics-file <path>] [--metrics-summary]
+
+LLM completions made while indexing are recorded in the shared cache
+directory (see llm_cache.py) and replayed on later runs. --replay-only fails
+on any completion or embedding that was not recorded, so a rebuild is
+deterministic and needs no network or API key.
+
+Running headers, footers and page numbers are stripped from every page before
+chunking (see text_cleaning.py; --no-clean keeps the raw page text), and pages
+that repeat an already indexed page (see dedup.py) are left out of the
+inserted text, so revisions and shared boilerplate are extracted only once.
+
+Each document's progress is written ahead to a journal in the storage
+directory (see journal.py), so a run that is killed resumes where it stopped:
+completed documents are kept and torn ones rolled back on the next run.
+
+--fast only chunks and embeds: new PDFs are searchable with naive and
+--context-only search within seconds, and `pdf_research.py enrich` (see
+enrich.py) adds them to the knowledge graph afterwards.
 
 Environment:
     OPENAI_API_KEY: Required for embeddings and LLM
@@ -20,13 +41,29 @@ import os
 import sys
 import threading
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Iterable, Optional
 
-import fitz  # PyMuPDF
 from dotenv import load_dotenv
-from lightrag import LightRAG
-from lightrag.llm.openai import gpt_4o_mini_complete, openai_embed
+
+from dedup import DEFAULT_THRESHOLD, PageDedup
+from enrich import VECTOR_ONLY, is_vector_only
+from extract_cache import CACHE_FILE, open_cache
+from journal import COMMITTED, EMBEDDED, EXTRACTED, FAILED, GRAPH_MERGED, Journal, recover
+from lexical_index import LexicalIndex
+from lightrag_compat import fast_index_unsupported, store_location
+from manifest import Manifest, hash_file
+from metrics import get_metrics, start_metrics
+from models import get_cache_dir, get_embedding_func, get_llm_func, get_tokenizer
+from storage_meta import lock_storage, read_storage_meta, write_storage_meta
+from text_cleaning import clean_pages, page_blocks, raw_text
+
+# PyMuPDF and LightRAG take most of a second to import, so they are imported
+# where they are used and commands that never parse or index stay fast
+if TYPE_CHECKING:
+    from lightrag import LightRAG
 
 # Load environment variables
 load_dotenv()
@@ -35,6 +72,18 @@ load_dotenv()
 logging.getLogger("lightrag").setLevel(logging.WARNING)
 logging.getLogger("nano-vectordb").setLevel(logging.WARNING)
 
+# PDF parsing runs on a process pool; default to one worker per core
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Documents LightRAG processes at once, and documents handed over per insert
+DEFAULT_CONCURRENCY = 4
+DEFAULT_BATCH_SIZE = 8
+
+# Large PDFs are indexed as segments of at most this many characters, parsed
+# PAGES_PER_TASK pages per pool task
+DEFAULT_SEGMENT_SIZE = 200_000
+PAGES_PER_TASK = 64
+
 
 class ProgressIndicator:
     """Blinking dot progress indicator."""
@@ -68,101 +117,425 @@ class ProgressIndicator:
         sys.stdout.flush()
 
 
+def read_pages(pdf_path: Path, first_page: int = 0, last_page: Optional[int] = None,
+               sha256: Optional[str] = None, cache_path: Optional[Path] = None) -> list:
+    """
+    Text blocks of pages [first_page, last_page) as (page_num, page_blocks).
+
+    With `sha256` and `cache_path` the pages come from the extraction cache
+    when all of them are there; otherwise the PDF is parsed and the pages are
+    cached for the next run.
+    """
+    cache = open_cache(cache_path) if sha256 and cache_path else None
+    if cache and last_page is not None:
+        page_count = cache.page_count(sha256)
+        if page_count is not None:
+            pages = cache.get_pages(sha256, first_page, min(last_page, page_count))
+            if pages is not None:
+                return pages
+
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        last_page = len(doc) if last_page is None else min(last_page, len(doc))
+        pages = [(i + 1, page_blocks(doc.load_page(i))) for i in range(first_page, last_page)]
+        if cache:
+            cache.set_page_count(sha256, len(doc))
+            cache.put_pages(sha256, pages)
+    return pages
+
+
+def extract_segments(pdf_path: Path, first_page: int = 0, last_page: Optional[int] = None,
+                     segment_size: int = 0, clean: bool = True,
+                     sha256: Optional[str] = None, cache_path: Optional[Path] = None) -> list:
+    """
+    Extract pages [first_page, last_page) as segments of at most `segment_size`
+    characters (0 for no limit; a single larger page gets a segment of its own).
+    Returns a list of (first_page, last_page, text, removed) with 1-based page
+    numbers, where removed is the header, footer and page number text that
+    cleaning dropped ("" with clean=False). Pages are read through the
+    extraction cache when `sha256` and `cache_path` are given.
+
+    Every segment starts with the `[Document: name]` header and keeps the
+    `[Page N]` markers, so a PDF that fits in one uncleaned segment produces
+    exactly the text it always has.
+    """
+    pages = read_pages(pdf_path, first_page, last_page, sha256, cache_path)
+    if clean:
+        page_texts = clean_pages(pages)
+    else:
+        page_texts = [(page_num, raw_text(page), "") for page_num, page in pages]
+
+    header = f"[Document: {pdf_path.name}]\n\n"
+    segments = []
+    parts, page_nums, removed, size = [], [], [], len(header)
+    for page_num, text, dropped in page_texts:
+        removed.append(dropped)
+        if not text.strip():
+            continue
+        part = f"[Page {page_num}]\n{text}"
+        if parts and segment_size and size + len(part) > segment_size:
+            segments.append((page_nums[0], page_nums[-1], header + "\n\n".join(parts), "".join(removed)))
+            parts, page_nums, removed, size = [], [], [], len(header)
+        parts.append(part)
+        page_nums.append(page_num)
+        size += len(part) + 2
+    if parts:
+        segments.append((page_nums[0], page_nums[-1], header + "\n\n".join(parts), "".join(removed)))
+    return segments
+
+
 def extract_text_from_pdf(pdf_path: Path) -> Optional[str]:
     """Extract text content from a PDF file."""
     try:
-        doc = fitz.open(pdf_path)
-        text_parts = []
-
-        for page_num, page in enumerate(doc, 1):
-            text = page.get_text()
-            if text.strip():
-                text_parts.append(f"[Page {page_num}]\n{text}")
-
-        doc.close()
-
-        if text_parts:
-            # Add metadata header
-            full_text = f"[Document: {pdf_path.name}]\n\n" + "\n\n".join(text_parts)
-            return full_text
-        return None
+        segments = extract_segments(pdf_path)
+        return segments[0][2] if segments else None
 
     except Exception as e:
         print(f"Error extracting {pdf_path.name}: {e}")
         return None
 
 
-def get_indexed_docs(storage_dir: Path) -> set:
-    """Get list of already indexed document names."""
+def inspect_pdf(pdf_path: Path, cache_path: Optional[Path] = None) -> tuple:
+    """
+    Hash a PDF's contents and count its pages (runs in a pool worker).
+
+    Returns (sha256, page_count, cached), where cached is set when every page
+    is in the extraction cache and the PDF was not opened.
+    """
+    sha256 = hash_file(pdf_path)
+    if cache_path:
+        cache = open_cache(cache_path)
+        if cache.is_complete(sha256):
+            return sha256, cache.page_count(sha256), True
+
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return sha256, len(doc), False
+
+
+async def iter_extracted_batches(pdf_files: list, workers: int = DEFAULT_WORKERS,
+                                 batch_size: int = 1,
+                                 segment_size: int = DEFAULT_SEGMENT_SIZE,
+                                 clean: bool = True,
+                                 cache_path: Optional[Path] = None):
+    """
+    Extract PDFs on a process pool, yielding lists of
+    (pdf_path, sha256, file_path, text, last, removed).
+
+    Each PDF is split into windows of PAGES_PER_TASK pages that are parsed as
+    separate pool tasks and cut into segments of at most `segment_size`
+    characters, so peak memory depends on the segment and window size rather
+    than the PDF size. `file_path` is the PDF name, with the page range added
+    when the PDF has several segments. `text` is None when extraction failed
+    and "" for an empty final marker; `last` is set on a file's final item,
+    after all its other segments have been yielded. `removed` is the text that
+    header and footer cleaning dropped from the segment's pages.
+
+    With `cache_path`, pages are read from and added to the extraction cache
+    (extract_cache.py), so a PDF parsed once is never opened again.
+
+    At most `workers` tasks run at once and extracted segments wait in a
+    bounded queue, so extraction stays ahead of insertion without holding the
+    whole corpus in memory. Each batch holds whatever is ready, up to
+    `batch_size` segments, so a slow parser never stalls insertion.
+    """
+    workers = max(1, workers)
+    batch_size = max(1, batch_size)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max(workers, batch_size))
+    window_pages = PAGES_PER_TASK if segment_size else None
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        async def run(task):
+            pdf_path, window, sha256 = task
+            start = time.perf_counter()
+            try:
+                if window is None:
+                    result = await loop.run_in_executor(pool, inspect_pdf, pdf_path, cache_path)
+                else:
+                    result = await loop.run_in_executor(
+                        pool, extract_segments, pdf_path, *window, segment_size, clean,
+                        sha256, cache_path,
+                    )
+                    get_metrics().add_time(
+                        "extract", time.perf_counter() - start, file=pdf_path.name,
+                        pages=window, chars=sum(len(text) for _, _, text, _ in result),
+                    )
+            except Exception as e:
+                print(f"Error extracting {pdf_path.name}: {e}")
+                result = None
+            return pdf_path, window, result
+
+        async def produce():
+            # Windows of files already started go first, so files finish in order
+            tasks = deque((pdf_path, None, None) for pdf_path in pdf_files)
+            files = {}
+            in_flight = set()
+            while tasks or in_flight:
+                while tasks and len(in_flight) < workers:
+                    in_flight.add(asyncio.ensure_future(run(tasks.popleft())))
+                done, in_flight = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    pdf_path, window, result = task.result()
+                    if window is None:
+                        if result is None:
+                            await queue.put((pdf_path, None, pdf_path.name, None, True, ""))
+                            continue
+                        sha256, page_count, cached = result
+                        get_metrics().count("extract_cache_hits" if cached else "extract_cache_misses")
+                        step = window_pages or max(page_count, 1)
+                        windows = [(first, first + step) for first in range(0, max(page_count, 1), step)]
+                        files[pdf_path] = {
+                            "sha256": sha256, "windows": len(windows), "split": len(windows) > 1
+                        }
+                        tasks.extendleft((pdf_path, w, sha256) for w in reversed(windows))
+                        continue
+
+                    state = files[pdf_path]
+                    state["windows"] -= 1
+                    last = state["windows"] == 0
+                    if last:
+                        del files[pdf_path]
+                    segments = [(0, 0, None, "")] if result is None else result or [(0, 0, "", "")]
+                    split = state["split"] or len(segments) > 1
+                    for i, (first, end, text, removed) in enumerate(segments):
+                        # LightRAG rejects a second document with the same file path
+                        file_path = f"{pdf_path.name} (pages {first}-{end})" if split else pdf_path.name
+                        await queue.put((pdf_path, state["sha256"], file_path, text,
+                                         last and i == len(segments) - 1, removed))
+            await queue.put(None)
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            finished = False
+            while not finished:
+                batch = []
+                item = await queue.get()
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= batch_size or queue.empty():
+                        break
+                    item = queue.get_nowait()
+                finished = item is None
+                get_metrics().gauge("extract_queue", queue.qsize())
+                if batch:
+                    yield batch
+        finally:
+            producer.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def insert_batch(rag: "LightRAG", segments: list, graph: bool = True) -> list:
+    """
+    Insert a batch of (file_path, text) segments with one list insert.
+
+    LightRAG processes the documents concurrently and records failures per
+    document, so each document's status is read back afterwards. Returns a
+    (doc_id, error, vector_only) triple per segment, where error is None on
+    success and vector_only tells whether the document is missing from the
+    knowledge graph. Without `graph` documents are only chunked and embedded.
+    Documents LightRAG has already processed (completed by an interrupted
+    run, or shared with another PDF) are not inserted again.
+    """
+    from lightrag.utils import compute_mdhash_id
+
+    doc_ids = [compute_mdhash_id(text, prefix="doc-") for _, text in segments]
+    # Identical segments (e.g. the same PDF twice) share one document
+    docs = {}
+    for doc_id, (file_path, text) in zip(doc_ids, segments):
+        docs.setdefault(doc_id, (text, file_path))
+
+    unique_ids = list(docs)
+    metrics = get_metrics()
+    try:
+        existing = await rag.doc_status.get_by_ids(unique_ids)
+        todo = [doc_id for doc_id, status in zip(unique_ids, existing)
+                if (status or {}).get("status") != "processed"]
+        texts = [docs[doc_id][0] for doc_id in todo]
+        file_paths = [docs[doc_id][1] for doc_id in todo]
+        if todo:
+            # What ainsert runs, split so chunking (done while processing) is
+            # timed from out here without wrapping LightRAG's chunker
+            options = {} if graph else {"process_options": VECTOR_ONLY}
+            with metrics.stage("insert", docs=len(todo)):
+                with metrics.stage("enqueue", docs=len(todo)):
+                    await rag.apipeline_enqueue_documents(
+                        texts, ids=todo, file_paths=file_paths, **options
+                    )
+                with metrics.stage("process", docs=len(todo)):
+                    await rag.apipeline_process_enqueue_documents()
+        statuses = await rag.doc_status.get_by_ids(unique_ids)
+    except Exception as e:
+        return [(doc_id, f"Error: {str(e)[:30]}", False) for doc_id in doc_ids]
+
+    results = {}
+    for doc_id, status in zip(unique_ids, statuses):
+        if status and status.get("status") == "processed":
+            results[doc_id] = (None, is_vector_only(status))
+        else:
+            message = (status or {}).get("error_msg") or "not processed"
+            results[doc_id] = (f"Error: {str(message)[:30]}", False)
+    return [(doc_id, *results[doc_id]) for doc_id in doc_ids]
+
+
+async def get_chunk_ids(rag: "LightRAG", doc_ids: list) -> list:
+    """Ids of the chunks LightRAG made from the given documents."""
+    if not doc_ids:
+        return []
+    statuses = await rag.doc_status.get_by_ids(doc_ids)
+    return [chunk_id for status in statuses if status
+            for chunk_id in status.get("chunks_list") or []]
+
+
+async def sync_lexical_index(rag: "LightRAG", lexical: LexicalIndex, doc_ids: list,
+                             removed_chunk_ids: list, full: bool = False) -> dict:
+    """
+    Add the chunks of `doc_ids` to the lexical index and drop `removed_chunk_ids`.
+
+    Only this run's chunks are read, from the loaded storages, so the cost
+    does not grow with the corpus. With `full` (after a recovery, which may
+    have added or removed anything) or on a new index, the whole chunk store
+    is compared instead.
+    """
+    if full or not lexical.exists():
+        return lexical.update()
+    chunk_ids = await get_chunk_ids(rag, doc_ids)
+    records = await rag.text_chunks.get_by_ids(chunk_ids)
+    docs = await rag.full_docs.get_by_ids(doc_ids)
+    return lexical.apply(
+        {chunk_id: record for chunk_id, record in zip(chunk_ids, records) if record},
+        removed_chunk_ids,
+        {doc_id: (doc or {}).get("content", "") for doc_id, doc in zip(doc_ids, docs)},
+    )
+
+
+async def delete_documents(rag: "LightRAG", doc_ids: list) -> int:
+    """Delete documents from the index, returning how many failed."""
+    failed = 0
+    for doc_id in doc_ids:
+        try:
+            await rag.adelete_by_doc_id(doc_id)
+        except Exception as e:
+            print(f"Error deleting {doc_id}: {str(e)[:50]}")
+            failed += 1
+    return failed
+
+
+def load_manifest(storage_dir: Path, pdf_files: list) -> Manifest:
+    """
+    Load the index manifest, seeding it once from the KV store for indexes
+    built before the manifest existed.
+    """
+    manifest = Manifest.load(storage_dir)
+    if not manifest.exists():
+        legacy_docs = scan_indexed_docs(storage_dir)
+        if legacy_docs:
+            manifest.seed_from_legacy(pdf_files, legacy_docs)
+        manifest.save()
+    return manifest
+
+
+def scan_indexed_docs(storage_dir: Path) -> dict:
+    """Map indexed document names to LightRAG document ids by scanning the KV store."""
     status_file = storage_dir / "kv_store_full_docs.json"
     if not status_file.exists():
-        return set()
+        return {}
 
     try:
         with open(status_file) as f:
             data = json.load(f)
         # Extract document names from the stored data
-        indexed = set()
+        indexed = {}
         for doc_id, content in data.items():
+            if isinstance(content, dict):
+                content = content.get("content", "")
             if "[Document: " in content:
                 start = content.find("[Document: ") + len("[Document: ")
                 end = content.find("]", start)
                 if end > start:
-                    indexed.add(content[start:end])
+                    indexed[content[start:end]] = doc_id
         return indexed
     except Exception:
-        return set()
-
+        return {}
 
-def get_storage_stats(storage_dir: Path) -> dict:
-    """Get statistics about the indexed storage."""
-    stats = {
-        "total_docs": 0,
-        "total_chunks": 0,
-        "total_entities": 0,
-        "storage_size_mb": 0
-    }
 
-    try:
-        # Count documents
-        docs_file = storage_dir / "kv_store_full_docs.json"
-        if docs_file.exists():
-            with open(docs_file) as f:
-                data = json.load(f)
-                stats["total_docs"] = len(data)
-
-        # Count chunks
-        chunks_file = storage_dir / "kv_store_text_chunks.json"
-        if chunks_file.exists():
-            with open(chunks_file) as f:
-                data = json.load(f)
-                stats["total_chunks"] = len(data)
-
-        # Count entities
-        entities_file = storage_dir / "kv_store_full_entities.json"
-        if entities_file.exists():
-            with open(entities_file) as f:
-                data = json.load(f)
-                stats["total_entities"] = len(data)
-
-        # Calculate storage size
-        total_size = 0
-        for file in storage_dir.glob("*"):
-            if file.is_file():
-                total_size += file.stat().st_size
-        stats["storage_size_mb"] = round(total_size / (1024 * 1024), 2)
+def get_indexed_docs(storage_dir: Path) -> set:
+    """Get list of already indexed document names."""
+    return set(scan_indexed_docs(storage_dir))
 
-    except Exception:
-        pass
 
-    return stats
+def get_storage_stats(storage_dir: Path) -> dict:
+    """Get statistics about the indexed storage from its metadata sidecar."""
+    meta = read_storage_meta(storage_dir)
+    return {
+        "total_docs": meta["documents"],
+        "total_chunks": meta["chunks"],
+        "total_entities": meta["entities"],
+        "storage_size_mb": round(meta["storage_size_bytes"] / (1024 * 1024), 2),
+    }
 
 
-async def index_pdfs(pdf_dir: Path, storage_dir: Path):
-    """Index all PDFs in the specified directory."""
+async def index_pdfs(pdf_dir: Path, storage_dir: Path, workers: int = DEFAULT_WORKERS,
+                     concurrency: int = DEFAULT_CONCURRENCY,
+                     batch_size: int = DEFAULT_BATCH_SIZE,
+                     replay_only: bool = False,
+                     segment_size: int = DEFAULT_SEGMENT_SIZE,
+                     metrics_file: Optional[Path] = None,
+                     metrics_summary: bool = False,
+                     vector_index: Optional[str] = None,
+                     ann_nprobe: Optional[int] = None,
+                     dedup_threshold: float = DEFAULT_THRESHOLD,
+                     clean: bool = True,
+                     fast: bool = False,
+                     pdf_files: Optional[list] = None):
+    """
+    Index all PDFs in the specified directory, or only `pdf_files` of them.
+
+    PDFs longer than `segment_size` characters (0 for no limit) are indexed
+    as several LightRAG documents that go through extraction in parallel.
+    `vector_index` ("exact" or "ivf") and `ann_nprobe` set the store's
+    approximate nearest-neighbour index; None keeps the store's current one.
+    Pages at least `dedup_threshold` similar to an indexed page are skipped
+    (0 disables the check), and with `clean` running headers, footers and page
+    numbers are stripped before chunking. With `fast` documents are only
+    chunked and embedded, leaving graph extraction to enrich.py. Indexed PDFs
+    of `pdf_dir` missing from `pdf_files` are removed from the store, as when
+    they are deleted (see shards.py).
+    Stage timings, model call counts and queue depths are appended to
+    `metrics_file` as JSON lines, and printed as a table with `metrics_summary`.
+    """
+    storage_dir.mkdir(parents=True, exist_ok=True)
+    lock = lock_storage(storage_dir)
+    if lock is None:
+        print(f"Error: another indexing or enrichment run is using {storage_dir}.")
+        return
 
-    # Verify API key
-    if not os.getenv("OPENAI_API_KEY"):
+    metrics = start_metrics(metrics_file)
+    try:
+        await _index_pdfs(
+            pdf_dir, storage_dir, workers, concurrency, batch_size, replay_only, segment_size,
+            vector_index, ann_nprobe, dedup_threshold, clean, fast, pdf_files,
+        )
+        if metrics_summary:
+            metrics.print_summary()
+    finally:
+        metrics.close()
+        lock.close()
+
+
+async def _index_pdfs(pdf_dir: Path, storage_dir: Path, workers: int, concurrency: int,
+                      batch_size: int, replay_only: bool, segment_size: int,
+                      vector_index: Optional[str], ann_nprobe: Optional[int],
+                      dedup_threshold: float, clean: bool, fast: bool,
+                      pdf_files: Optional[list]):
+
+    # Verify API key (replaying recorded calls needs none)
+    if not replay_only and not os.getenv("OPENAI_API_KEY"):
         print("Error: OPENAI_API_KEY not set.")
         print("Please set it in your environment or .env file.")
         return
@@ -172,72 +545,299 @@ async def index_pdfs(pdf_dir: Path, storage_dir: Path):
         print(f"Error: PDF directory not found: {pdf_dir}")
         return
 
-    # Create storage directory
-    storage_dir.mkdir(parents=True, exist_ok=True)
-
-    # Check already indexed docs
-    indexed_docs = get_indexed_docs(storage_dir)
+    unsupported = fast_index_unsupported() if fast else None
+    if unsupported:
+        print(f"Error: {unsupported}")
+        return
 
     print("=" * 60)
     print("  LightRAG PDF Indexing for Claude Code")
     print("=" * 60)
     print(f"PDF Directory: {pdf_dir}")
     print(f"Storage Directory: {storage_dir}")
+    print(f"Extraction Workers: {workers}")
+    print(f"Insert Concurrency: {concurrency} (batch size {batch_size})")
+    print(f"Segment Size: {f'{segment_size:,} characters' if segment_size else 'unlimited'}")
+    if vector_index:
+        print(f"Vector Index: {vector_index}"
+              + (f" (nprobe {ann_nprobe})" if vector_index == "ivf" and ann_nprobe else ""))
+    print(f"Duplicate Pages: {f'skipped at similarity {dedup_threshold}' if dedup_threshold else 'indexed'}")
+    print(f"Headers and Footers: {'removed' if clean else 'kept (--no-clean)'}")
+    print(f"Knowledge Graph: {'deferred to enrich (--fast)' if fast else 'extracted'}")
+    if replay_only:
+        print("Replay Only: recorded model calls only, misses fail")
     print("-" * 60)
 
-    rag = LightRAG(
-        working_dir=str(storage_dir),
-        embedding_func=openai_embed,
-        llm_model_func=gpt_4o_mini_complete,
-    )
+    metrics = get_metrics()
+    rag = await open_rag(storage_dir, concurrency, replay_only, vector_index, ann_nprobe)
+    try:
+        await index_files(rag, pdf_dir, storage_dir, pdf_files, workers, batch_size,
+                          segment_size, dedup_threshold, clean, fast)
+    finally:
+        with metrics.stage("finalize"):
+            await rag.finalize_storages()
+
 
-    await rag.initialize_storages()
+async def open_rag(storage_dir: Path, concurrency: int = DEFAULT_CONCURRENCY,
+                   replay_only: bool = False, vector_index: Optional[str] = None,
+                   ann_nprobe: Optional[int] = None) -> "LightRAG":
+    """Create the indexing LightRAG instance for a storage directory and load its storages."""
+    from lightrag import LightRAG
 
-    # Find all PDFs
-    pdf_files = sorted(pdf_dir.glob("*.pdf"))
+    from vector_store import get_vector_storage
+
+    rag = LightRAG(
+        **store_location(storage_dir),
+        embedding_func=get_embedding_func(replay_only=replay_only),
+        llm_model_func=get_llm_func(record=True, replay_only=replay_only),
+        tokenizer=get_tokenizer(),
+        vector_storage=get_vector_storage(storage_dir),
+        vector_db_storage_cls_kwargs={"vector_index": vector_index, "ann_nprobe": ann_nprobe},
+        max_parallel_insert=max(1, concurrency),
+    )
+    with get_metrics().stage("storage_load"):
+        await rag.initialize_storages()
+    return rag
+
+
+async def index_files(rag: "LightRAG", pdf_dir: Path, storage_dir: Path,
+                      pdf_files: Optional[list] = None, workers: int = DEFAULT_WORKERS,
+                      batch_size: int = DEFAULT_BATCH_SIZE,
+                      segment_size: int = DEFAULT_SEGMENT_SIZE,
+                      dedup_threshold: float = DEFAULT_THRESHOLD, clean: bool = True,
+                      fast: bool = False, keep: Iterable = (),
+                      loaded: Optional[dict] = None) -> dict:
+    """
+    Bring a loaded store up to date with the PDFs in `pdf_dir` (or `pdf_files`).
+
+    Unchanged PDFs are skipped, so this is cheap to call again on the same
+    LightRAG instance whenever files arrive (see watch.py); the caller
+    finalizes the storages. PDFs in `keep` are still being written: they are
+    neither indexed nor treated as removed, so their indexed documents stay
+    until the new version is complete. A caller that indexes the same store
+    repeatedly passes the same `loaded` dict every time, which keeps the
+    manifest, page signatures and lexical index loaded between calls. Returns
+    the number of PDFs "indexed", "failed" and "removed".
+    """
+    metrics = get_metrics()
+
+    # Find all PDFs, unless the caller routed a subset here
+    if pdf_files is None:
+        pdf_files = pdf_dir.glob("*.pdf")
+    pdf_files = sorted(pdf_files)
     total = len(pdf_files)
 
-    # Filter out already indexed
-    pending_files = [p for p in pdf_files if p.name not in indexed_docs]
+    loaded = {} if loaded is None else loaded
+    if "manifest" not in loaded:
+        loaded["manifest"] = load_manifest(storage_dir, pdf_files)
+        loaded["dedup"] = PageDedup.load(storage_dir, dedup_threshold) if dedup_threshold else None
+        loaded["lexical"] = LexicalIndex(storage_dir)
+    manifest, dedup, lexical = loaded["manifest"], loaded["dedup"], loaded["lexical"]
+
+    # Finish or roll back what an interrupted run left behind
+    journal = Journal(storage_dir)
+    recovered = False
+    if journal.exists():
+        with metrics.stage("recover"):
+            result = await recover(rag, journal, manifest, dedup)
+        recovered = True
+        print(f"Interrupted Run Recovered: {result['resumed']} PDFs completed, "
+              f"{result['rolled_back']} partial documents rolled back")
+
+    # Compare with the manifest: skip unchanged, re-index changed, drop removed
+    plan = manifest.plan(pdf_dir, pdf_files, keep)
+    pending_files = plan["new"] + plan["changed"]
 
     print(f"Total PDFs: {total}")
-    print(f"Already indexed: {len(indexed_docs)}")
-    print(f"Pending: {len(pending_files)}")
+    print(f"Already indexed: {len(plan['unchanged'])}")
+    print(f"Pending: {len(pending_files)} ({len(plan['new'])} new, {len(plan['changed'])} changed)")
+    print(f"Removed: {len(plan['removed'])}")
     print("-" * 60)
 
+    stale_keys = plan["removed"] + [str(p) for p in plan["changed"]]
+    stale_doc_ids = []
+    for key in stale_keys:
+        stale_doc_ids.extend(manifest.forget(key))
+        if dedup:
+            dedup.forget(key)
+    # Chunks to take out of the lexical index along with their documents
+    stale_chunk_ids = await get_chunk_ids(rag, stale_doc_ids)
+    if stale_doc_ids:
+        progress = ProgressIndicator()
+        progress.start(f"Removing {len(stale_doc_ids)} outdated documents")
+        with metrics.stage("delete", docs=len(stale_doc_ids)):
+            delete_failed = await delete_documents(rag, stale_doc_ids)
+        progress.stop(f"Removed {len(stale_doc_ids) - delete_failed} outdated documents")
+    manifest.save()
+    if dedup:
+        dedup.save()
+
     if not pending_files:
         print("All files are already indexed.")
+        if stale_doc_ids or recovered or not lexical.exists():
+            with metrics.stage("lexical_index"):
+                await sync_lexical_index(rag, lexical, [], stale_chunk_ids, full=recovered)
+        with metrics.stage("write_meta"):
+            write_storage_meta(storage_dir, manifest, changed=bool(stale_doc_ids) or recovered)
+        journal.clear()
         stats = get_storage_stats(storage_dir)
         print(f"\nStorage Statistics:")
         print(f"  Documents: {stats['total_docs']}")
         print(f"  Chunks: {stats['total_chunks']}")
         print(f"  Entities: {stats['total_entities']}")
         print(f"  Storage Size: {stats['storage_size_mb']} MB")
-        await rag.finalize_storages()
-        return
+        return {"indexed": 0, "failed": 0, "removed": len(plan["removed"])}
 
     progress = ProgressIndicator()
-    indexed_count = len(indexed_docs)
+    indexed_count = len(plan["unchanged"])
     failed_count = 0
-
-    for i, pdf_path in enumerate(pending_files, 1):
-        # Start progress indicator
-        display_name = pdf_path.name[:40] + "..." if len(pdf_path.name) > 40 else pdf_path.name
-        progress.start(f"[{indexed_count + i}/{total}] {display_name}")
-
-        text = extract_text_from_pdf(pdf_path)
-        if text:
-            try:
-                await rag.ainsert(text)
-                progress.stop(f"[{indexed_count + i}/{total}] {display_name}")
-            except Exception as e:
-                progress.stop(f"[{indexed_count + i}/{total}] {display_name} - Error: {str(e)[:30]}")
-                failed_count += 1
+    last_save = time.monotonic()
+
+    from lightrag.utils import compute_mdhash_id
+
+    def doc_id_of(text):
+        return compute_mdhash_id(text, prefix="doc-")
+
+    def file_state(pdf_path):
+        # Segments inserted so far for a PDF, linked duplicate documents and
+        # the tokens cleaning removed
+        return open_files.setdefault(
+            pdf_path,
+            {"doc_ids": [], "vector_only": [], "linked": [], "cleaned": 0, "error": None},
+        )
+
+    i = 0
+    open_files = {}
+    # PDFs recorded in the manifest since it was last saved
+    uncommitted = []
+    added_doc_ids = []
+    # Documents whose insert failed; PDFs linked to them fail too
+    failed_doc_ids = set()
+    duplicate_pages = duplicate_files = skipped_tokens = inserted_tokens = cleaned_tokens = 0
+    # No more parsing processes than PDFs to parse
+    batches = iter_extracted_batches(pending_files, min(workers, len(pending_files)), batch_size,
+                                     segment_size, clean, cache_path=get_cache_dir() / CACHE_FILE)
+    async for batch in batches:
+        names = list(dict.fromkeys(pdf_path.name for pdf_path, *_ in batch))
+        if len(names) == 1:
+            label = names[0][:40] + "..." if len(names[0]) > 40 else names[0]
+            progress.start(f"[{indexed_count + i + 1}/{total}] {label}")
         else:
-            progress.stop(f"[{indexed_count + i}/{total}] {display_name} - No text extracted")
-            failed_count += 1
-
-    await rag.finalize_storages()
+            progress.start(f"[{indexed_count + i + 1}/{total}] Inserting {len(batch)} segments")
+
+        if dedup:
+            with metrics.stage("dedup", segments=len(batch)):
+                filtered = []
+                for pdf_path, sha256, file_path, text, last, removed in batch:
+                    state = file_state(pdf_path)
+                    if text:
+                        text, linked, duplicates = dedup.filter_segment(
+                            str(pdf_path), pdf_path.name, text, doc_id_of
+                        )
+                        state["linked"].extend(d for d in linked if d not in state["linked"])
+                        for _, _, page_text in duplicates:
+                            skipped_tokens += len(rag.tokenizer.encode(page_text))
+                        duplicate_pages += len(duplicates)
+                        metrics.count("dedup_pages", len(duplicates))
+                    filtered.append((pdf_path, sha256, file_path, text, last, removed))
+                batch = filtered
+
+        segments = [(file_path, text) for _, _, file_path, text, _, _ in batch if text]
+        journal.write([
+            {"doc": doc_id_of(text), "pdf": str(pdf_path), "sha256": sha256, "stage": EXTRACTED}
+            for pdf_path, sha256, _, text, _, _ in batch if text
+        ])
+        if dedup:
+            inserted_tokens += sum(len(rag.tokenizer.encode(text)) for _, text in segments)
+        results = await insert_batch(rag, segments, graph=not fast) if segments else []
+        progress.stop()
+        failed = {doc_id for doc_id, error, _ in results if error}
+        if failed:
+            failed_doc_ids |= failed
+            # Later segments, in this run or the next, must not link to them
+            if dedup:
+                dedup.forget_docs(failed)
+        results = iter(results)
+
+        stages = []
+        for pdf_path, sha256, _, text, last, removed in batch:
+            state = file_state(pdf_path)
+            if removed:
+                state["cleaned"] += len(rag.tokenizer.encode(removed))
+            if text is None:
+                state["error"] = state["error"] or "No text extracted"
+            elif text:
+                doc_id, error, vector_only = next(results)
+                stage = FAILED if error else EMBEDDED if vector_only else GRAPH_MERGED
+                stages.append({"doc": doc_id, "pdf": str(pdf_path), "stage": stage})
+                if doc_id not in state["doc_ids"]:
+                    state["doc_ids"].append(doc_id)
+                    if vector_only:
+                        state["vector_only"].append(doc_id)
+                state["error"] = state["error"] or error
+            if not last:
+                continue
+
+            del open_files[pdf_path]
+            i += 1
+            # Documents holding this PDF's repeated pages stay while it is indexed
+            doc_ids = state["doc_ids"] + [d for d in state["linked"] if d not in state["doc_ids"]]
+            error = state["error"] or (None if doc_ids else "No text extracted")
+            if not error and failed_doc_ids.intersection(state["linked"]):
+                error = "Error: the indexed copy failed"
+            metrics.event("document", file=pdf_path.name, doc_ids=state["doc_ids"], error=error)
+            metrics.count("documents_failed" if error else "documents_indexed")
+            display_name = pdf_path.name[:40] + "..." if len(pdf_path.name) > 40 else pdf_path.name
+            notes = [f"{len(state['doc_ids'])} segments"] if len(state["doc_ids"]) > 1 else []
+            if not state["doc_ids"] and state["linked"]:
+                notes = ["duplicate, linked to the indexed copy"]
+                duplicate_files += 1
+            if state["cleaned"]:
+                notes.append(f"{state['cleaned']:,} header/footer tokens removed")
+                cleaned_tokens += state["cleaned"]
+                metrics.count("cleaned_tokens", state["cleaned"])
+            segment_note = f" ({', '.join(notes)})" if notes else ""
+            if error:
+                print(f"[{indexed_count + i}/{total}] {display_name} - {error}")
+                failed_count += 1
+                if dedup:
+                    dedup.forget(str(pdf_path))
+            else:
+                manifest.record(pdf_path, sha256, doc_ids, state["vector_only"])
+                added_doc_ids.extend(state["doc_ids"])
+                stages.append({
+                    "pdf": str(pdf_path), "sha256": sha256,
+                    "stage": EMBEDDED if state["vector_only"] else GRAPH_MERGED,
+                    "doc_ids": doc_ids, "vector_only": state["vector_only"],
+                })
+                uncommitted.append(str(pdf_path))
+                print(f"[{indexed_count + i}/{total}] {display_name}{segment_note}")
+        journal.write(stages)
+
+        # Persist progress periodically so an interrupted run can resume
+        if time.monotonic() - last_save > 5:
+            with metrics.stage("manifest_save"):
+                manifest.save()
+                if dedup:
+                    dedup.save()
+            journal.write([{"pdf": key, "stage": COMMITTED} for key in uncommitted])
+            uncommitted.clear()
+            last_save = time.monotonic()
+
+    with metrics.stage("manifest_save"):
+        manifest.save()
+        if dedup:
+            dedup.save()
+    journal.write([{"pdf": key, "stage": COMMITTED} for key in uncommitted])
+
+    with metrics.stage("lexical_index"):
+        await sync_lexical_index(rag, lexical, added_doc_ids, stale_chunk_ids, full=recovered)
+    with metrics.stage("write_meta"):
+        write_storage_meta(
+            storage_dir, manifest,
+            changed=bool(stale_doc_ids) or recovered or failed_count < len(pending_files)
+        )
+    journal.clear()
 
     # Final statistics
     stats = get_storage_stats(storage_dir)
@@ -247,12 +847,31 @@ async def index_pdfs(pdf_dir: Path, storage_dir: Path):
     print(f"  Succeeded: {len(pending_files) - failed_count}")
     print(f"  Failed: {failed_count}")
     print(f"  Total Indexed: {indexed_count + len(pending_files) - failed_count}")
+    cache_hits = metrics.counters.get("extract_cache_hits", 0)
+    if cache_hits:
+        print(f"  Read From Extraction Cache: {cache_hits} of {len(pending_files)} PDFs")
+    if cleaned_tokens:
+        print(f"  Headers/Footers Removed: {cleaned_tokens:,} tokens")
+    if duplicate_pages:
+        # Estimate the time saved from this run's insert time per token
+        insert_seconds = metrics.stage_seconds("insert")
+        saved = ""
+        if inserted_tokens and insert_seconds:
+            saved = f", ~{skipped_tokens * insert_seconds / inserted_tokens:.1f} s saved"
+        print(f"  Duplicates Skipped: {duplicate_pages} pages ({duplicate_files} whole files), "
+              f"{skipped_tokens:,} tokens{saved}")
+    vector_only = sum(1 for entry in manifest.files.values() if entry.get("vector_only"))
+    if vector_only:
+        print(f"  Vector-Only: {vector_only} PDFs (naive and --context-only search only "
+              f"until enriched: pdf_research.py enrich)")
     print(f"\nStorage Statistics:")
     print(f"  Documents: {stats['total_docs']}")
     print(f"  Chunks: {stats['total_chunks']}")
     print(f"  Entities: {stats['total_entities']}")
     print(f"  Storage Size: {stats['storage_size_mb']} MB")
     print("=" * 60)
+    return {"indexed": len(pending_files) - failed_count, "failed": failed_count,
+            "removed": len(plan["removed"])}
 
 
 def main():
@@ -271,13 +890,94 @@ def main():
         default=os.getenv("PDF_RESEARCH_STORAGE", "./rag_storage"),
         help="Directory to store the RAG index"
     )
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Parallel PDF extraction processes (default: {DEFAULT_WORKERS})"
+    )
+    parser.add_argument(
+        "--concurrency", "-c",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Documents processed by LightRAG in parallel (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--batch-size", "-b",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Documents per LightRAG insert call (default: {DEFAULT_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--segment-size",
+        type=int,
+        default=DEFAULT_SEGMENT_SIZE,
+        help=f"Split PDFs into documents of at most this many characters, 0 for no limit "
+             f"(default: {DEFAULT_SEGMENT_SIZE})"
+    )
+    parser.add_argument(
+        "--vector-index",
+        choices=["exact", "ivf"],
+        help="Vector search: exact scan or IVF approximate index (default: keep the store's)"
+    )
+    parser.add_argument(
+        "--ann-nprobe",
+        type=int,
+        help="IVF lists scored per query (default: 16)"
+    )
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Skip pages at least this similar (0-1) to an indexed page, 0 to index every page "
+             f"(default: {DEFAULT_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--no-clean",
+        action="store_true",
+        help="Keep running headers, footers and page numbers in the indexed text"
+    )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="Only chunk and embed; build the knowledge graph later with pdf_research.py enrich"
+    )
+    parser.add_argument(
+        "--replay-only",
+        action="store_true",
+        help="Use only recorded LLM completions and embeddings; fail on a cache miss"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        help="Append per-stage timings and counters to this JSONL file"
+    )
+    parser.add_argument(
+        "--metrics-summary",
+        action="store_true",
+        help="Print a table of stage timings and counters at the end"
+    )
 
     args = parser.parse_args()
 
     pdf_dir = Path(args.pdf_dir).resolve()
     storage_dir = Path(args.storage_dir).resolve()
 
-    asyncio.run(index_pdfs(pdf_dir, storage_dir))
+    asyncio.run(index_pdfs(
+        pdf_dir, storage_dir,
+        workers=args.workers,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        replay_only=args.replay_only,
+        segment_size=max(0, args.segment_size),
+        metrics_file=Path(args.metrics_file) if args.metrics_file else None,
+        metrics_summary=args.metrics_summary,
+        vector_index=args.vector_index,
+        ann_nprobe=args.ann_nprobe,
+        dedup_threshold=max(0.0, min(1.0, args.dedup_threshold)),
+        clean=not args.no_clean,
+        fast=args.fast,
+    ))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+"""
+Indexing Journal
+Write-ahead log of per-document indexing stages, so an interrupted run
+resumes from the last completed stage and leaves no half-written documents.
+
+A run appends JSON lines to index_journal.jsonl in the storage directory and
+fsyncs them before going on:
+
+- extracted:    a document's id, PDF and content hash, before it is handed to
+                LightRAG (the PDF's pages are in the extraction cache by then)
+- embedded:     the document is chunked and embedded (--fast stops here)
+- graph_merged: its entities and relations are merged into the graph
+- failed:       LightRAG gave up on it
+
+Once all of a PDF's documents are in, a PDF record with its document ids
+follows, and a committed record once the manifest naming it has been saved.
+LightRAG chunks and embeds in one pipeline step, so a document cut off
+between the two shows up only in its doc status (a chunk list without the
+processed status).
+
+recover() runs before the next index plan. PDFs whose documents all
+completed are recorded in the manifest without any work; documents of the
+other PDFs that never completed are deleted from every store (their chunks,
+vectors and graph contributions), and those PDFs are indexed again from the
+extraction cache, skipping the documents that did complete. The journal is
+emptied at the end of every run that finishes.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+JOURNAL_FILE = "index_journal.jsonl"
+
+EXTRACTED = "extracted"
+EMBEDDED = "embedded"
+GRAPH_MERGED = "graph_merged"
+FAILED = "failed"
+COMMITTED = "committed"
+
+
+class Journal:
+    """Append-only, fsynced record of the stages documents and PDFs reach."""
+
+    def __init__(self, storage_dir: Path):
+        self.path = storage_dir / JOURNAL_FILE
+
+    def exists(self) -> bool:
+        return self.path.exists() and self.path.stat().st_size > 0
+
+    def write(self, records: list):
+        """Append records and make them durable before returning."""
+        if not records:
+            return
+        now = round(time.time(), 3)
+        with open(self.path, "a") as f:
+            for record in records:
+                f.write(json.dumps({"ts": now, **record}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self) -> list:
+        """All complete records; a line torn by a crash is ignored."""
+        if not self.path.exists():
+            return []
+        records = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+        return records
+
+    def clear(self):
+        """Forget all records once the run's results are saved."""
+        if self.path.exists():
+            self.path.unlink()
+
+    def pending(self) -> dict:
+        """
+        PDFs of an interrupted run that were never committed.
+
+        Maps each PDF key to {"sha256", "docs": {doc_id: stage}, "done"}, where
+        done is the PDF's final record ({"doc_ids", "vector_only"}) if every
+        one of its documents completed.
+        """
+        files = {}
+        for record in self.read():
+            key = record.get("pdf")
+            if key is None:
+                continue
+            if record["stage"] == COMMITTED:
+                files.pop(key, None)
+                continue
+            entry = files.setdefault(key, {"sha256": None, "docs": {}, "done": None})
+            entry["sha256"] = record.get("sha256") or entry["sha256"]
+            if "doc" in record:
+                entry["docs"][record["doc"]] = record["stage"]
+            elif record["stage"] in (EMBEDDED, GRAPH_MERGED):
+                entry["done"] = {"doc_ids": record["doc_ids"],
+                                 "vector_only": record.get("vector_only", [])}
+        return files
+
+
+async def recover(rag, journal: Journal, manifest, dedup=None) -> dict:
+    """
+    Finish or roll back the PDFs an interrupted run left uncommitted.
+
+    A PDF is resumed (recorded in the manifest) when its final record exists,
+    the file is unchanged and LightRAG holds all of its documents as
+    processed. Otherwise its documents that did not complete (all of them if
+    the PDF changed or is gone), unless another indexed PDF uses them, are
+    deleted. Returns counts of "resumed" PDFs, "rolled_back" documents and
+    the torn "chunked" documents among those.
+    """
+    from manifest import hash_file
+
+    pending = journal.pending()
+    result = {"resumed": 0, "rolled_back": 0, "chunked": 0}
+    if not pending:
+        return result
+
+    doc_ids = sorted({doc_id for entry in pending.values() for doc_id in entry["docs"]})
+    statuses = dict(zip(doc_ids, await rag.doc_status.get_by_ids(doc_ids)))
+
+    def processed(doc_id):
+        return (statuses.get(doc_id) or {}).get("status") == "processed"
+
+    torn = set()
+    for key, entry in pending.items():
+        pdf_path = Path(key)
+        done = entry["done"]
+        unchanged = pdf_path.exists() and hash_file(pdf_path) == entry["sha256"]
+        if unchanged and done and all(processed(d) for d in done["doc_ids"]):
+            manifest.record(pdf_path, entry["sha256"], done["doc_ids"], done["vector_only"])
+            result["resumed"] += 1
+            continue
+        if dedup:
+            dedup.forget(key)
+        # Completed documents of an unchanged PDF are reused when it is indexed again
+        torn.update(d for d in entry["docs"] if not (unchanged and processed(d)))
+
+    in_use = {doc_id for entry in manifest.files.values() for doc_id in entry["doc_ids"]}
+    failed = 0
+    for doc_id in sorted(torn - in_use):
+        status = statuses.get(doc_id)
+        if not status:
+            continue
+        try:
+            await rag.adelete_by_doc_id(doc_id)
+        except Exception as e:
+            print(f"Error rolling back {doc_id}: {str(e)[:50]}")
+            failed += 1
+            continue
+        result["rolled_back"] += 1
+        if status.get("status") != "processed" and status.get("chunks_list"):
+            result["chunked"] += 1
+
+    manifest.save()
+    if dedup:
+        dedup.save()
+    # Every pending PDF is now in the manifest or absent from the stores; keep
+    # the records of a failed rollback so the next run tries again
+    if not failed:
+        journal.clear()
+    return result
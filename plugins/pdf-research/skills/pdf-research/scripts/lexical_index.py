@@ -0,0 +1,423 @@
+"""
+Lexical BM25 Index
+Inverted index over the text chunks for exact-term search without any model.
+
+The indexer updates it from kv_store_text_chunks.json after every run. It
+lives in the `lexical_index/` directory of the storage directory as immutable
+segments: each run writes one segment for the chunks added since the last run
+and tombstones the chunks that were deleted. A segment is a set of flat
+arrays opened as memory maps, so a query reads only its own terms' postings:
+
+- terms.bin, term_offsets.npy: sorted vocabulary, binary searched in place
+- term_postings.npy: start of each term's postings, plus one end entry
+- post_docs.npy, post_tf.npy: chunk number and term frequency per posting
+- doc_lens.npy: token count per chunk
+- text.bin, text_offsets.npy: chunk text, for result passages
+- chunks.json: chunk id, document name and pages per chunk
+
+index.json lists the live segments, their tombstones and the collection
+statistics BM25 needs. Too many tombstones merge all segments back into one,
+too many segments merge all but the largest. Tokens are lower-cased words;
+identifiers such as ERR-1234 or v2.1 are indexed whole and by their parts, so
+a lookup for either form matches.
+"""
+
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from metrics import get_metrics
+from retrieval import chunk_pages, source_name
+from storage_meta import CHUNKS_FILE, DOCS_FILE
+
+# numpy is imported where segments are written or read, so that loading this
+# module (search.py and index_pdfs.py do on startup) stays cheap
+
+INDEX_DIR = "lexical_index"
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_SEGMENTS = 8
+MAX_DELETED_RATIO = 0.3
+
+_TOKEN = re.compile(r"\w+(?:[-.:/]\w+)*")
+_PART = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased word tokens; compound identifiers also yield their parts."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def _empty_meta() -> dict:
+    return {
+        "version": INDEX_VERSION,
+        "next_segment": 1,
+        "segments": [],
+        "live_chunks": 0,
+        "live_tokens": 0,
+    }
+
+
+def _offsets(lengths: list) -> "np.ndarray":
+    """Start offsets of consecutive items, plus the end of the last one."""
+    import numpy as np
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.array(lengths, dtype=np.int64))
+    return offsets
+
+
+def _write_segment(path: Path, chunks: list) -> dict:
+    """Write a segment for [(chunk_id, document, pages, text)] and describe it."""
+    import numpy as np
+
+    postings = {}
+    doc_lens = np.zeros(len(chunks), dtype=np.int32)
+    for doc_num, (_, _, _, text) in enumerate(chunks):
+        tokens = tokenize(text)
+        doc_lens[doc_num] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term, []).append((doc_num, tf))
+
+    terms = sorted(postings)
+    encoded = [term.encode() for term in terms]
+    term_offsets = _offsets([len(term) for term in encoded])
+    term_postings = _offsets([len(postings[term]) for term in terms])
+    flat = [posting for term in terms for posting in postings[term]]
+    post_docs = np.array([doc for doc, _ in flat], dtype=np.int32)
+    post_tf = np.minimum(np.array([tf for _, tf in flat], dtype=np.int64), 65535).astype(np.uint16)
+
+    texts = [text.encode() for _, _, _, text in chunks]
+    text_offsets = _offsets([len(text) for text in texts])
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    (tmp_path / "terms.bin").write_bytes(b"".join(encoded))
+    (tmp_path / "text.bin").write_bytes(b"".join(texts))
+    for name, array in (("term_offsets", term_offsets), ("term_postings", term_postings),
+                        ("post_docs", post_docs), ("post_tf", post_tf),
+                        ("doc_lens", doc_lens), ("text_offsets", text_offsets)):
+        np.save(tmp_path / f"{name}.npy", array)
+    with open(tmp_path / "chunks.json", "w", encoding="utf-8") as f:
+        json.dump([[chunk_id, document, pages] for chunk_id, document, pages, _ in chunks],
+                  f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    return {"name": path.name, "chunks": len(chunks), "deleted": []}
+
+
+class _Vocabulary:
+    """Sequence view of a segment's sorted terms, for bisect."""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+
+def _map_file(path: Path):
+    """Read-only memory map of a file (empty files give empty bytes)."""
+    if path.stat().st_size == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class Segment:
+    """Memory-mapped reader for one immutable segment."""
+
+    def __init__(self, path: Path):
+        import numpy as np
+
+        self.path = path
+
+        def load(name):
+            return np.load(path / f"{name}.npy", mmap_mode="r")
+
+        self.vocabulary = _Vocabulary(_map_file(path / "terms.bin"), load("term_offsets"))
+        self.term_postings = load("term_postings")
+        self.post_docs = load("post_docs")
+        self.post_tf = load("post_tf")
+        self.doc_lens = load("doc_lens")
+        self.text_data = _map_file(path / "text.bin")
+        self.text_offsets = load("text_offsets")
+        self._chunks = None
+
+    def postings(self, term: str):
+        """Return (chunk numbers, term frequencies) for a term, or None."""
+        key = term.encode()
+        pos = bisect_left(self.vocabulary, key)
+        if pos == len(self.vocabulary) or self.vocabulary[pos] != key:
+            return None
+        start, end = self.term_postings[pos], self.term_postings[pos + 1]
+        return self.post_docs[start:end], self.post_tf[start:end]
+
+    def chunk(self, doc_num: int) -> tuple:
+        """(chunk_id, document, pages, text) of one chunk."""
+        if self._chunks is None:
+            with open(self.path / "chunks.json", encoding="utf-8") as f:
+                self._chunks = json.load(f)
+        chunk_id, document, pages = self._chunks[doc_num]
+        start, end = self.text_offsets[doc_num], self.text_offsets[doc_num + 1]
+        return chunk_id, document, pages, self.text_data[start:end].decode("utf-8")
+
+    def chunk_ids(self) -> list:
+        with open(self.path / "chunks.json", encoding="utf-8") as f:
+            return [entry[0] for entry in json.load(f)]
+
+
+class LexicalIndex:
+    """BM25 index of one storage directory's text chunks."""
+
+    def __init__(self, storage_dir: Path):
+        self.dir = storage_dir / INDEX_DIR
+        self.meta_path = self.dir / INDEX_FILE
+        self.meta = _empty_meta()
+        if self.meta_path.exists():
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") == INDEX_VERSION:
+                self.meta = meta
+        self.storage_dir = storage_dir
+        self._segments = {}
+        self._known = None
+
+    def exists(self) -> bool:
+        return self.meta_path.exists()
+
+    def segment(self, name: str) -> Segment:
+        if name not in self._segments:
+            self._segments[name] = Segment(self.dir / name)
+        return self._segments[name]
+
+    def _save(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.meta_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _new_segment(self, chunks: list) -> dict:
+        name = f"seg_{self.meta['next_segment']:06d}"
+        self.meta["next_segment"] += 1
+        info = _write_segment(self.dir / name, chunks)
+        self._track(info, [chunk_id for chunk_id, _, _, _ in chunks])
+        return info
+
+    def _track(self, info: dict, chunk_ids: list):
+        if self._known is not None:
+            for doc_num, chunk_id in enumerate(chunk_ids):
+                self._known[chunk_id] = (info, doc_num)
+
+    def known(self) -> dict:
+        """Map each live chunk id to its (segment info, chunk number)."""
+        if self._known is None:
+            self._known = {}
+            for info in self.meta["segments"]:
+                deleted = set(info["deleted"])
+                for doc_num, chunk_id in enumerate(self.segment(info["name"]).chunk_ids()):
+                    if doc_num not in deleted:
+                        self._known[chunk_id] = (info, doc_num)
+        return self._known
+
+    def update(self) -> dict:
+        """
+        Bring the index in line with kv_store_text_chunks.json.
+
+        Indexes chunks added since the last update as a new segment and
+        tombstones removed ones. Reads the whole chunk store; after an
+        indexing run that knows what it added and deleted, apply() is cheaper.
+        """
+        chunks_path = self.storage_dir / CHUNKS_FILE
+        records = {}
+        if chunks_path.exists():
+            with open(chunks_path, encoding="utf-8") as f:
+                records = json.load(f)
+
+        known = self.known()
+        added = {chunk_id: record for chunk_id, record in records.items() if chunk_id not in known}
+        removed = [chunk_id for chunk_id in known if chunk_id not in records]
+        return self.apply(added, removed)
+
+    def apply(self, added: dict, removed, docs: Optional[dict] = None) -> dict:
+        """
+        Index the `added` chunks ({chunk_id: chunk record}) as a new segment
+        and tombstone the `removed` chunk ids, without reading the chunk store.
+
+        `docs` maps the added chunks' document ids to their full text, for the
+        page numbers; by default it is read from kv_store_full_docs.json.
+        Segments are merged when there are too many of them or too many
+        tombstones.
+        """
+        known = self.known()
+        # Removed first: a re-indexed document can bring back the chunks it lost
+        removed = [chunk_id for chunk_id in dict.fromkeys(removed) if chunk_id in known]
+        for chunk_id in removed:
+            info, doc_num = known.pop(chunk_id)
+            info["deleted"].append(doc_num)
+            self.meta["live_chunks"] -= 1
+            self.meta["live_tokens"] -= int(self.segment(info["name"]).doc_lens[doc_num])
+        added = {chunk_id: record for chunk_id, record in added.items() if chunk_id not in known}
+        if not added and not removed and self.exists():
+            return {"added": 0, "removed": 0, "chunks": self.meta["live_chunks"]}
+
+        if added:
+            chunks = self._prepare_chunks(added, list(added), docs)
+            info = self._new_segment(chunks)
+            self.meta["segments"].append(info)
+            self.meta["live_chunks"] += len(chunks)
+            self.meta["live_tokens"] += int(self.segment(info["name"]).doc_lens.sum())
+
+        obsolete = self._compact()
+        self._save()
+        for name in obsolete:
+            self._segments.pop(name, None)
+            shutil.rmtree(self.dir / name, ignore_errors=True)
+
+        return {"added": len(added), "removed": len(removed), "chunks": self.meta["live_chunks"]}
+
+    def _compact(self) -> list:
+        """
+        Merge segments from their own stored chunks, returning the merged names.
+
+        Too many tombstones merge everything; too many segments merge all but
+        the largest, so a stream of small updates does not rewrite the whole
+        index each time.
+        """
+        segments = self.meta["segments"]
+        total = sum(info["chunks"] for info in segments)
+        dead = sum(len(info["deleted"]) for info in segments)
+        if total and dead / total > MAX_DELETED_RATIO:
+            merge = list(segments)
+        elif len(segments) > MAX_SEGMENTS:
+            largest = max(segments, key=lambda info: info["chunks"] - len(info["deleted"]))
+            merge = [info for info in segments if info is not largest]
+        else:
+            return []
+
+        chunks = []
+        for info in merge:
+            segment, deleted = self.segment(info["name"]), set(info["deleted"])
+            chunks.extend(segment.chunk(doc_num) for doc_num in range(info["chunks"])
+                          if doc_num not in deleted)
+        kept = [info for info in segments if info not in merge]
+        self.meta["segments"] = kept
+        if chunks:
+            self.meta["segments"].append(self._new_segment(chunks))
+        return [info["name"] for info in merge]
+
+    def _prepare_chunks(self, records: dict, chunk_ids: list, docs: Optional[dict] = None) -> list:
+        """[(chunk_id, document, pages, text)] with pages from the full documents."""
+        doc_ids = {records[chunk_id].get("full_doc_id") for chunk_id in chunk_ids}
+        if docs is None:
+            docs = {}
+            docs_path = self.storage_dir / DOCS_FILE
+            if docs_path.exists():
+                with open(docs_path, encoding="utf-8") as f:
+                    docs = {doc_id: doc.get("content", "")
+                            for doc_id, doc in json.load(f).items() if doc_id in doc_ids}
+
+        chunks = []
+        for chunk_id in chunk_ids:
+            record = records[chunk_id]
+            content = record.get("content", "")
+            pages = chunk_pages(docs.get(record.get("full_doc_id"), ""), content)
+            chunks.append((chunk_id, source_name(record.get("file_path")), pages, content))
+        return chunks
+
+    def search(self, query: str, top_k: int = 10) -> list:
+        """Return the top_k chunks by BM25 score, in retrieval.py's result format."""
+        import numpy as np
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        live = self.meta["live_chunks"]
+        if not terms or not live:
+            return []
+        avgdl = max(self.meta["live_tokens"] / live, 1.0)
+
+        infos = self.meta["segments"]
+        matches = {}
+        for term in terms:
+            found = []
+            for info in infos:
+                postings = self.segment(info["name"]).postings(term)
+                if postings is not None:
+                    found.append((info, postings))
+            if found:
+                matches[term] = found
+
+        scores = {}
+        for term, found in matches.items():
+            # Postings of tombstoned chunks count until their segment is merged
+            df = min(sum(len(docs) for _, (docs, _) in found), live)
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            for info, (docs, tfs) in found:
+                segment = self.segment(info["name"])
+                if info["name"] not in scores:
+                    scores[info["name"]] = np.zeros(info["chunks"], dtype=np.float32)
+                tf = tfs.astype(np.float32)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.doc_lens[docs] / avgdl)
+                scores[info["name"]][docs] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        candidates = []
+        for info in infos:
+            seg_scores = scores.get(info["name"])
+            if seg_scores is None:
+                continue
+            seg_scores[info["deleted"]] = 0
+            hits = np.flatnonzero(seg_scores)
+            if len(hits) > top_k:
+                hits = hits[np.argpartition(-seg_scores[hits], top_k)[:top_k]]
+            candidates.extend((float(seg_scores[doc]), info["name"], int(doc)) for doc in hits)
+        candidates.sort(key=lambda item: -item[0])
+
+        results = []
+        for rank, (score, name, doc_num) in enumerate(candidates[:top_k], 1):
+            chunk_id, document, pages, content = self.segment(name).chunk(doc_num)
+            results.append({
+                "rank": rank,
+                "score": round(score, 4),
+                "document": document,
+                "pages": pages,
+                "chunk_id": chunk_id,
+                "content": content,
+            })
+        return results
+
+
+def update_lexical_index(storage_dir: Path) -> dict:
+    """Update the storage directory's lexical index from its text chunks."""
+    return LexicalIndex(storage_dir).update()
+
+
+def lexical_search(storage_dir: Path, query: str, top_k: int = 10) -> list:
+    """BM25 search, building the index first for stores indexed before it existed."""
+    metrics = get_metrics()
+    index = LexicalIndex(storage_dir)
+    if not index.exists():
+        with metrics.stage("lexical_build"):
+            index.update()
+    with metrics.stage("lexical"):
+        return index.search(query, top_k)
@@ -0,0 +1,123 @@
+"""
+LightRAG Compatibility
+Feature checks for the LightRAG APIs that --fast and enrich rely on, and the
+one place that calls LightRAG's private methods.
+
+`index --fast` enqueues documents with a per-document process option, and
+`enrich` runs LightRAG's own extraction and graph merge on stored chunks,
+which LightRAG does not expose publicly. Both need a newer LightRAG than plain
+indexing and search, so they check the installed one first and refuse with a
+clear message instead of failing halfway through a run. If a LightRAG release
+renames one of the private methods, this module is what needs updating.
+
+LightRAG also keeps the data of every store it loads in one table per process,
+keyed by workspace, and only the first instance of a workspace reads its files.
+Every store is therefore opened as a workspace named after its directory (see
+store_location), so shards searched or indexed side by side stay apart.
+"""
+
+import inspect
+from functools import partial
+from pathlib import Path
+from typing import Optional
+
+# First release with everything below (anchor callbacks in the graph merge)
+MIN_VERSION = "1.5.6"
+
+_PRIVATE_METHODS = (
+    "_process_extract_entities",
+    "_build_global_config",
+    "_mark_graph_mutation_started",
+    "_insert_done",
+)
+_MERGE_PARAMETERS = ("entity_chunks_storage", "relation_chunks_storage", "on_anchors_durable")
+
+
+def installed_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("lightrag-hku")
+    except Exception:
+        return "unknown"
+
+
+def _unsupported(feature: str, missing: list) -> Optional[str]:
+    if not missing:
+        return None
+    return (f"{feature} needs lightrag-hku>={MIN_VERSION} (installed: {installed_version()}, "
+            f"missing {', '.join(missing)}). Upgrade with: pip install -U 'lightrag-hku[api]'")
+
+
+def store_location(storage_dir: Path) -> dict:
+    """
+    LightRAG working_dir and workspace arguments for a storage directory.
+
+    LightRAG puts a workspace's files in working_dir/workspace, so the files
+    stay where they are while each directory gets its own in-process data.
+    """
+    storage_dir = Path(storage_dir).resolve()
+    return {"working_dir": str(storage_dir.parent), "workspace": storage_dir.name}
+
+
+def release_loaded_stores():
+    """Drop the store data LightRAG holds in this process, so the next instance reads the files again."""
+    from lightrag.kg.shared_storage import finalize_share_data
+
+    finalize_share_data()
+
+
+def fast_index_unsupported() -> Optional[str]:
+    """Why `index --fast` cannot run on the installed LightRAG, or None."""
+    from lightrag import LightRAG
+
+    parameters = inspect.signature(LightRAG.apipeline_enqueue_documents).parameters
+    missing = [] if "process_options" in parameters else ["per-document process_options"]
+    return _unsupported("--fast", missing)
+
+
+def enrich_unsupported() -> Optional[str]:
+    """Why `enrich` cannot run on the installed LightRAG, or None."""
+    from lightrag import LightRAG
+    from lightrag.operate import merge_nodes_and_edges
+
+    missing = [name for name in _PRIVATE_METHODS if not hasattr(LightRAG, name)]
+    parameters = inspect.signature(merge_nodes_and_edges).parameters
+    missing += [f"merge_nodes_and_edges({name})" for name in _MERGE_PARAMETERS
+                if name not in parameters]
+    return _unsupported("enrich", missing)
+
+
+async def extract_entities(rag, chunks: dict) -> list:
+    """Run LightRAG's entity and relation extraction on {chunk_id: chunk} rows."""
+    return await rag._process_extract_entities(chunks)
+
+
+async def merge_graph(rag, doc_id: str, chunk_results: list, file_path: str,
+                      pipeline_status: dict, pipeline_status_lock):
+    """Merge extraction results into the graph and entity/relation stores as one document's."""
+    from lightrag.operate import merge_nodes_and_edges
+
+    await merge_nodes_and_edges(
+        chunk_results=chunk_results,
+        knowledge_graph_inst=rag.chunk_entity_relation_graph,
+        entity_vdb=rag.entities_vdb,
+        relationships_vdb=rag.relationships_vdb,
+        global_config=rag._build_global_config(),
+        full_entities_storage=rag.full_entities,
+        full_relations_storage=rag.full_relations,
+        doc_id=doc_id,
+        pipeline_status=pipeline_status,
+        pipeline_status_lock=pipeline_status_lock,
+        llm_response_cache=rag.llm_response_cache,
+        entity_chunks_storage=rag.entity_chunks,
+        relation_chunks_storage=rag.relation_chunks,
+        file_path=file_path,
+        # Lets a later deletion find this document's graph contributions
+        on_anchors_durable=partial(rag._mark_graph_mutation_started, doc_id),
+    )
+
+
+async def flush_storages(rag):
+    """Write every storage to disk, as LightRAG does at the end of an insert."""
+    await rag._insert_done()
@@ -0,0 +1,102 @@
+"""
+LLM Completion Record/Replay Cache
+Persists the completions made during indexing so they never have to be paid
+for twice.
+
+Every completion is stored in a SQLite file in the shared cache directory,
+keyed by a hash of the model, system prompt, history, prompt and the
+JSON-serializable call options. A crashed run, a rebuild with a different
+storage layout, or indexing the same PDFs into another store replays the
+recorded answers instantly. In replay-only mode a cache miss raises
+ReplayMissError instead of calling the model, which makes indexing
+deterministic and runnable offline.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from metrics import get_metrics
+
+# Call options that describe plumbing rather than the request itself
+_IGNORED_OPTIONS = {"hashing_kv", "token_tracker", "stream"}
+
+
+class ReplayMissError(RuntimeError):
+    """Raised in replay-only mode when a call has no recorded response."""
+
+
+def _request_options(kwargs: dict) -> dict:
+    options = {}
+    for name, value in kwargs.items():
+        if name in _IGNORED_OPTIONS or name.startswith("_"):
+            continue
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        options[name] = value
+    return options
+
+
+def completion_key(model: str, prompt: str, system_prompt, history_messages, kwargs: dict) -> str:
+    request = [model, system_prompt, history_messages or [], prompt, _request_options(kwargs)]
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+class CompletionStore:
+    """SQLite table of key -> completion text."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions "
+            "(key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL)"
+        )
+        self.conn.commit()
+
+    def get(self, key: str):
+        row = self.conn.execute(
+            "SELECT response FROM completions WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, model: str, response: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                (key, model, response, time.time())
+            )
+
+
+def recorded_llm_func(llm_func, model: str, cache_path: Path, replay_only: bool = False):
+    """Wrap a LightRAG llm_model_func with the record/replay cache."""
+    store = CompletionStore(cache_path)
+
+    async def complete(prompt, system_prompt=None, history_messages=None, **kwargs):
+        if kwargs.get("stream"):
+            if replay_only:
+                raise ReplayMissError("Streaming completions cannot be replayed")
+            return await llm_func(
+                prompt, system_prompt=system_prompt, history_messages=history_messages, **kwargs
+            )
+
+        key = completion_key(model, prompt, system_prompt, history_messages, kwargs)
+        response = store.get(key)
+        if response is not None:
+            get_metrics().count("llm_cache_hits")
+            return response
+        if replay_only:
+            raise ReplayMissError(f"No recorded completion for request {key[:12]}")
+
+        response = await llm_func(
+            prompt, system_prompt=system_prompt, history_messages=history_messages, **kwargs
+        )
+        if isinstance(response, str):
+            store.put(key, model, response)
+        return response
+
+    return complete
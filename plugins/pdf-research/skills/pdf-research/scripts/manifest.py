@@ -0,0 +1,153 @@
+"""
+Index Manifest for Incremental PDF Indexing
+Tracks which PDFs are indexed and what their content was at the time.
+
+The manifest lives in the storage directory as pdf_manifest.json and maps each
+PDF's absolute path to its size, mtime, SHA-256 content hash, the LightRAG
+document ids created from it and which of those are still missing from the
+knowledge graph. Unchanged files are recognised from size and mtime alone, so
+the LightRAG key-value stores never have to be read.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+MANIFEST_FILE = "pdf_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_file(path: Path) -> str:
+    """Compute the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Path -> {size, mtime_ns, sha256, doc_ids, vector_only} record of indexed PDFs."""
+
+    def __init__(self, storage_dir: Path, files: Optional[dict] = None):
+        self.path = storage_dir / MANIFEST_FILE
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, storage_dir: Path) -> "Manifest":
+        """Load the manifest, or return an empty one if none exists yet."""
+        path = storage_dir / MANIFEST_FILE
+        if not path.exists():
+            return cls(storage_dir)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return cls(storage_dir, data.get("files", {}))
+        except (OSError, ValueError):
+            return cls(storage_dir)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def save(self):
+        """Write the manifest atomically."""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def record(self, pdf_path: Path, sha256: str, doc_ids: list, vector_only: tuple = ()):
+        """
+        Record a successfully indexed PDF.
+
+        `vector_only` lists the document ids that were chunked and embedded
+        but not yet added to the knowledge graph (see enrich.py).
+        """
+        stat = pdf_path.stat()
+        self.files[str(pdf_path)] = {
+            "name": pdf_path.name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "doc_ids": list(doc_ids),
+            "vector_only": list(vector_only),
+        }
+
+    def mark_enriched(self, doc_id: str) -> list:
+        """
+        Note that a document joined the knowledge graph.
+
+        Returns the names of the PDFs that are now fully enriched.
+        """
+        names = []
+        for entry in self.files.values():
+            if doc_id in entry.get("vector_only", ()):
+                entry["vector_only"].remove(doc_id)
+                if not entry["vector_only"]:
+                    names.append(entry["name"])
+        return names
+
+    def forget(self, key: str) -> list:
+        """
+        Drop a manifest entry and return the document ids that can be deleted.
+
+        Ids still referenced by another entry (identical PDFs under different
+        names share a document) are kept.
+        """
+        entry = self.files.pop(key, None)
+        if not entry:
+            return []
+        in_use = {doc_id for other in self.files.values() for doc_id in other["doc_ids"]}
+        return [doc_id for doc_id in entry["doc_ids"] if doc_id not in in_use]
+
+    def plan(self, pdf_dir: Path, pdf_files: list, keep: Iterable = ()) -> dict:
+        """
+        Compare the PDFs on disk with the manifest.
+
+        Returns a dict with "new", "changed" and "unchanged" lists of paths and
+        a "removed" list of manifest keys. Only entries directly inside
+        `pdf_dir` can be reported as removed, so indexing another folder into
+        the same storage never deletes documents. Entries for the paths in
+        `keep` (PDFs still being written) are left as they are.
+        """
+        plan = {"new": [], "changed": [], "unchanged": [], "removed": []}
+        seen = {str(pdf_path) for pdf_path in keep}
+
+        for pdf_path in pdf_files:
+            key = str(pdf_path)
+            seen.add(key)
+            entry = self.files.get(key)
+            if entry is None:
+                plan["new"].append(pdf_path)
+                continue
+
+            stat = pdf_path.stat()
+            if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+                plan["unchanged"].append(pdf_path)
+            elif hash_file(pdf_path) == entry["sha256"]:
+                # Touched but identical: remember the new mtime and move on
+                entry["size"] = stat.st_size
+                entry["mtime_ns"] = stat.st_mtime_ns
+                plan["unchanged"].append(pdf_path)
+            else:
+                plan["changed"].append(pdf_path)
+
+        for key in self.files:
+            if key not in seen and Path(key).parent == pdf_dir:
+                plan["removed"].append(key)
+
+        return plan
+
+    def seed_from_legacy(self, pdf_files: list, legacy_docs: dict):
+        """
+        Build entries for stores indexed before the manifest existed.
+
+        `legacy_docs` maps document names (from the `[Document: name]` header)
+        to LightRAG document ids.
+        """
+        for pdf_path in pdf_files:
+            doc_id = legacy_docs.get(pdf_path.name)
+            if doc_id:
+                self.record(pdf_path, hash_file(pdf_path), [doc_id])
@@ -0,0 +1,168 @@
+"""
+Indexing and Search Metrics
+Per-stage timers, call and token counters and queue depth gauges, so a slow
+run can be attributed to PDF parsing, embedding, LLM calls or storage writes.
+Nothing inside LightRAG is replaced to measure it: chunking is part of each
+batch's "process" stage, next to the embedding and LLM calls made there.
+
+Stages are timed with `with get_metrics().stage("name"):` and aggregated in
+memory; events are also appended as JSON lines to a metrics file when one is
+given. Stage totals are busy time: concurrent model calls each add their own
+duration, so a stage's total can exceed the wall-clock time of the run.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class Metrics:
+    """In-memory stage, counter and gauge aggregates with an optional JSONL sink."""
+
+    def __init__(self, metrics_file: Path = None):
+        self.started = time.monotonic()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self.file = open(metrics_file, "a") if metrics_file else None
+
+    def event(self, kind: str, **fields):
+        """Append one event to the metrics file."""
+        if self.file:
+            record = {"ts": round(time.time(), 3), "type": kind, **fields}
+            self.file.write(json.dumps(record, default=str) + "\n")
+
+    def add_time(self, name: str, seconds: float, **fields):
+        """Record one timed occurrence of a stage."""
+        total = self.stages.setdefault(name, {"count": 0, "seconds": 0.0, "max": 0.0})
+        total["count"] += 1
+        total["seconds"] += seconds
+        total["max"] = max(total["max"], seconds)
+        self.event("stage", stage=name, seconds=round(seconds, 6), **fields)
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        """Time the enclosed block as one occurrence of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start, **fields)
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float):
+        """Track the last and peak value of a level such as a queue depth."""
+        gauge = self.gauges.setdefault(name, {"last": value, "max": value})
+        gauge["last"] = value
+        gauge["max"] = max(gauge["max"], value)
+
+    def stage_seconds(self, name: str) -> float:
+        return self.stages.get(name, {}).get("seconds", 0.0)
+
+    def summary(self) -> dict:
+        return {
+            "elapsed": round(time.monotonic() - self.started, 3),
+            "stages": {
+                name: {key: round(value, 6) for key, value in total.items()}
+                for name, total in self.stages.items()
+            },
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+
+    def print_summary(self):
+        """Print the stage, counter and gauge aggregates as a table."""
+        summary = self.summary()
+        print(f"\nMetrics ({summary['elapsed']:.2f}s elapsed):")
+        if summary["stages"]:
+            print(f"  {'Stage':<16}{'Count':>8}{'Total s':>11}{'Mean ms':>11}{'Max ms':>11}")
+            for name, total in sorted(summary["stages"].items(), key=lambda item: -item[1]["seconds"]):
+                mean_ms = total["seconds"] / total["count"] * 1000 if total["count"] else 0
+                print(f"  {name:<16}{total['count']:>8}{total['seconds']:>11.3f}"
+                      f"{mean_ms:>11.1f}{total['max'] * 1000:>11.1f}")
+        for name, value in sorted(summary["counters"].items()):
+            print(f"  {name}: {value}")
+        for name, gauge in sorted(summary["gauges"].items()):
+            print(f"  {name}: max {gauge['max']}, last {gauge['last']}")
+
+    def close(self):
+        if self.file:
+            self.event("summary", **self.summary())
+            self.file.close()
+            self.file = None
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """The metrics collector of the current run."""
+    return _metrics
+
+
+def start_metrics(metrics_file: Path = None) -> Metrics:
+    """Start a fresh collector, writing events to `metrics_file` if given."""
+    global _metrics
+    _metrics.close()
+    _metrics = Metrics(metrics_file)
+    return _metrics
+
+
+class TokenCounter:
+    """LightRAG token_tracker that adds provider-reported usage to the metrics."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+
+    def add_usage(self, usage: dict):
+        metrics = get_metrics()
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            if usage.get(key):
+                metrics.count(f"{self.prefix}_{key}", usage[key])
+
+
+def timed_llm_func(llm_func):
+    """Wrap an llm_model_func to time calls and count calls, characters and tokens."""
+    tokens = TokenCounter("llm")
+
+    async def complete(prompt, system_prompt=None, history_messages=None, **kwargs):
+        metrics = get_metrics()
+        # Older LightRAG flags keyword calls; newer ones only send the prompt
+        keywords = kwargs.get("keyword_extraction") or "keyword extractor" in prompt
+        stage = "llm_keywords" if keywords else "llm"
+        kwargs.setdefault("token_tracker", tokens)
+        metrics.count("llm_calls")
+        metrics.count("llm_prompt_chars", len(prompt) + len(system_prompt or ""))
+        with metrics.stage(stage):
+            response = await llm_func(
+                prompt, system_prompt=system_prompt, history_messages=history_messages, **kwargs
+            )
+        if isinstance(response, str):
+            metrics.count("llm_response_chars", len(response))
+        return response
+
+    return complete
+
+
+def timed_embedding_func(embedding_func):
+    """Wrap a LightRAG EmbeddingFunc to time calls and count texts and tokens."""
+    from lightrag.utils import EmbeddingFunc
+
+    tokens = TokenCounter("embed")
+
+    async def embed(texts: list, **kwargs):
+        metrics = get_metrics()
+        kwargs.setdefault("token_tracker", tokens)
+        metrics.count("embed_calls")
+        metrics.count("embed_texts", len(texts))
+        with metrics.stage("embed", texts=len(texts)):
+            return await embedding_func(texts, **kwargs)
+
+    return EmbeddingFunc(
+        embedding_dim=embedding_func.embedding_dim,
+        max_token_size=embedding_func.max_token_size,
+        func=embed,
+    )
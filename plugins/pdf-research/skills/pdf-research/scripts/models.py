@@ -0,0 +1,134 @@
+"""
+Model Functions for LightRAG
+Builds the embedding and LLM functions that the indexer and search pass to
+LightRAG, layering the plugin's caches over the OpenAI-backed defaults and
+the rate limiter (see rate_limit.py) under the caches.
+
+Environment:
+    PDF_RESEARCH_CACHE_DIR: Shared cache directory (default: ~/.cache/pdf-research)
+    PDF_RESEARCH_{LLM,EMBED}_{RPM,TPM}, PDF_RESEARCH_MAX_RETRIES: see rate_limit.py
+"""
+
+import os
+from pathlib import Path
+
+# Models used by lightrag.llm.openai.openai_embed and gpt_4o_mini_complete
+EMBEDDING_MODEL = "text-embedding-3-small"
+LLM_MODEL = "gpt-4o-mini"
+
+# Replacement model functions, e.g. the offline stubs used by benchmarks/
+_overrides = {}
+
+
+def set_model_overrides(embedding_func=None, llm_func=None, tokenizer=None,
+                        embedding_model: str = None, llm_model: str = None):
+    """
+    Replace the OpenAI-backed functions with local ones.
+
+    The caches still wrap the replacements, keyed by the given model names so
+    their entries never mix with real OpenAI results.
+    """
+    _overrides.clear()
+    if embedding_func is not None:
+        _overrides["embedding"] = (embedding_func, embedding_model or "override-embedding")
+    if llm_func is not None:
+        _overrides["llm"] = (llm_func, llm_model or "override-llm")
+    if tokenizer is not None:
+        _overrides["tokenizer"] = tokenizer
+
+
+def get_cache_dir() -> Path:
+    """Cache directory shared by every storage directory."""
+    cache_dir = os.getenv("PDF_RESEARCH_CACHE_DIR")
+    if cache_dir:
+        return Path(cache_dir).expanduser()
+    return Path.home() / ".cache" / "pdf-research"
+
+
+def _without_retries(func):
+    """
+    LightRAG's OpenAI function without its own tenacity retries.
+
+    The rate limiter retries with backoff and adapts concurrency; three more
+    quick retries underneath would only add requests while throttled.
+    """
+    return getattr(func, "__wrapped__", func)
+
+
+def get_embedding_func(replay_only: bool = False):
+    """
+    OpenAI embeddings behind the content-addressed embedding cache.
+
+    Upstream calls (cache misses) are rate limited and retried, and timed and
+    counted in the run metrics.
+
+    With `replay_only`, uncached texts raise ReplayMissError instead of
+    reaching the API.
+    """
+    from embed_cache import cached_embedding_func
+    from metrics import timed_embedding_func
+    from rate_limit import rate_limited_embedding_func
+
+    if "embedding" in _overrides:
+        embedding_func, model = _overrides["embedding"]
+    else:
+        from lightrag.llm.openai import openai_embed
+        from lightrag.utils import EmbeddingFunc
+
+        embedding_func = EmbeddingFunc(
+            embedding_dim=openai_embed.embedding_dim,
+            max_token_size=openai_embed.max_token_size,
+            func=_without_retries(openai_embed.func),
+        )
+        model = EMBEDDING_MODEL
+
+    return cached_embedding_func(
+        rate_limited_embedding_func(timed_embedding_func(embedding_func)), model,
+        get_cache_dir() / "embeddings", replay_only=replay_only,
+    )
+
+
+def get_llm_func(record: bool = False, replay_only: bool = False):
+    """
+    LLM completion function used for entity extraction and answers.
+
+    Upstream calls are rate limited and retried, and timed and counted in the
+    run metrics; replayed ones only count as cache hits.
+
+    With `record`, completions go through the record/replay cache; with
+    `replay_only`, a call that was never recorded raises ReplayMissError.
+    """
+    from metrics import timed_llm_func
+    from rate_limit import rate_limited_llm_func
+
+    if "llm" in _overrides:
+        llm_func, model = _overrides["llm"]
+    else:
+        from lightrag.llm.openai import openai_complete_if_cache
+
+        complete = _without_retries(openai_complete_if_cache)
+
+        # gpt_4o_mini_complete, minus the retries
+        async def llm_func(prompt, system_prompt=None, history_messages=None, **kwargs):
+            return await complete(
+                LLM_MODEL, prompt, system_prompt=system_prompt,
+                history_messages=history_messages or [], **kwargs
+            )
+
+        model = LLM_MODEL
+    llm_func = rate_limited_llm_func(timed_llm_func(llm_func))
+
+    if not (record or replay_only):
+        return llm_func
+
+    from llm_cache import recorded_llm_func
+
+    return recorded_llm_func(
+        llm_func, model, get_cache_dir() / "llm_completions.sqlite",
+        replay_only=replay_only,
+    )
+
+
+def get_tokenizer():
+    """Tokenizer override for LightRAG, or None for its tiktoken default."""
+    return _overrides.get("tokenizer")
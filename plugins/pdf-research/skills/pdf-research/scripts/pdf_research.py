@@ -3,14 +3,29 @@
 PDF Research CLI - Unified interface for indexing and searching PDFs.
 
 Usage:
-    python pdf_research.py index <pdf_dir> [--storage <path>]
-    python pdf_research.py search <query> [--mode <mode>] [--storage <path>]
-    python pdf_research.py status [--storage <path>]
+    python pdf_research.py index <pdf_dir> [--storage <path>] [--workers <n>]
+                                 [--concurrency <n>] [--batch-size <n>] [--segment-size <n>]
+                                 [--dedup-threshold <j>] [--no-clean] [--fast] [--replay-only]
+    python pdf_research.py watch [pdf_dir] [--storage <path>] [--settle <seconds>] [--poll] [--fast]
+    python pdf_research.py enrich [--storage <path> | --shard <name>] [--background] [--replay-only]
+    python pdf_research.py search <query> [--mode <mode>] [--storage <path> | --shard <name>...]
+                                  [--no-cache] [--context-only] [--top-k <n>] [--json]
+    python pdf_research.py search --batch <queries.jsonl> [--concurrency <n>] [--output <path>]
+    python pdf_research.py serve [--storage <path> | --shard <name>]
+    python pdf_research.py migrate [--storage <path>] [--keep-json]
+    python pdf_research.py ann-report [--storage <path>] [--namespace <ns>] [--queries <n>]
+    python pdf_research.py status [--storage <path> | --shard <name>]
     python pdf_research.py config --pdf-dir <path> --storage-dir <path>
+                                  [--vector-index exact|ivf] [--ann-nprobe <n>]
+                                  [--dedup-threshold <j>]
+                                  [--shard-root <path>] [--shard <name>=<rule>[,<rule>]...]
+                                  [--remove-shard <name>] [--auto-index on|off]
+
+Once a shard root is configured, index, search and status work on the shards
+under it (see shards.py) unless --storage names a single store.
 """
 
 import argparse
-import asyncio
 import json
 import os
 import sys
@@ -52,9 +67,27 @@ def get_paths(args, config):
     return pdf_dir, storage_dir
 
 
+def get_shard_paths(names, config):
+    """Storage paths of the named shards (all indexed ones if none), or None after an error."""
+    from shards import select_shards, shards_enabled
+
+    if not shards_enabled(config):
+        print("Error: No shards configured.")
+        print("Configure them with: python pdf_research.py config --shard-root <path> --shard <name>=<folder>")
+        return None
+    try:
+        return select_shards(config, names)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return None
+
+
 async def cmd_index(args, config):
     """Index PDF files."""
-    from index_pdfs import index_pdfs
+    from dedup import DEFAULT_THRESHOLD
+    from index_pdfs import (
+        DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY, DEFAULT_SEGMENT_SIZE, DEFAULT_WORKERS, index_pdfs,
+    )
 
     pdf_dir, storage_dir = get_paths(args, config)
 
@@ -71,42 +104,300 @@ async def cmd_index(args, config):
         print(f"Error: PDF directory not found: {pdf_path}")
         return 1
 
-    await index_pdfs(pdf_path, storage_path)
+    options = dict(
+        workers=args.workers or DEFAULT_WORKERS,
+        concurrency=args.concurrency or DEFAULT_CONCURRENCY,
+        batch_size=args.batch_size or DEFAULT_BATCH_SIZE,
+        replay_only=args.replay_only,
+        segment_size=DEFAULT_SEGMENT_SIZE if args.segment_size is None else max(0, args.segment_size),
+        metrics_file=Path(args.metrics_file) if args.metrics_file else None,
+        metrics_summary=args.metrics_summary,
+        vector_index=config.get('vector_index'),
+        ann_nprobe=config.get('ann_nprobe'),
+        dedup_threshold=max(0.0, min(1.0, args.dedup_threshold if args.dedup_threshold is not None
+                                     else config.get('dedup_threshold', DEFAULT_THRESHOLD))),
+        clean=not args.no_clean,
+        fast=args.fast,
+    )
+
+    from shards import route_files, shard_dir, shards_enabled
+
+    if shards_enabled(config) and not args.storage:
+        # Each PDF goes to the shard its folder or name is routed to; a shard
+        # that no longer gets a PDF drops it like a deleted file
+        storage_paths = []
+        routes = route_files(sorted(pdf_path.glob("*.pdf")), config)
+        for name, pdf_files in routes.items():
+            shard_path = shard_dir(config, name)
+            if not pdf_files and not shard_path.exists():
+                continue
+            print(f"\nShard: {name} ({len(pdf_files)} PDFs)")
+            await index_pdfs(pdf_path, shard_path, pdf_files=pdf_files, **options)
+            storage_paths.append(shard_path)
+    else:
+        await index_pdfs(pdf_path, storage_path, **options)
+        storage_paths = [storage_path]
+        config['storage_dir'] = str(storage_path)
 
     # Update config with used paths
     config['pdf_dir'] = str(pdf_path)
-    config['storage_dir'] = str(storage_path)
     save_config(config)
 
+    if args.fast:
+        from storage_meta import read_storage_meta
+
+        for path in storage_paths:
+            documents = read_storage_meta(path)["document_list"]
+            if any(not doc.get("enriched", True) for doc in documents):
+                start_background_enrich(path, args.replay_only)
+
     return 0
 
 
+async def cmd_watch(args, config):
+    """Index new and changed PDFs as they land in the PDF directory."""
+    from dedup import DEFAULT_THRESHOLD
+    from index_pdfs import (
+        DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY, DEFAULT_SEGMENT_SIZE, DEFAULT_WORKERS,
+    )
+    from shards import shards_enabled
+    from watch import SETTLE_SECONDS, watch
+
+    if not config.get('auto_index', True):
+        print("Automatic indexing is off.")
+        print("Turn it on with: python pdf_research.py config --auto-index on")
+        return 1
+
+    pdf_dir, storage_dir = get_paths(args, config)
+    if not pdf_dir:
+        print("Error: PDF directory not specified.")
+        print("Use: python pdf_research.py watch <pdf_dir>")
+        print("Or configure with: python pdf_research.py config --pdf-dir <path>")
+        return 1
+
+    pdf_path = Path(pdf_dir).resolve()
+    if not pdf_path.is_dir():
+        print(f"Error: PDF directory not found: {pdf_path}")
+        return 1
+
+    if not args.replay_only and not os.getenv("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY not set.")
+        return 1
+
+    return await watch(
+        pdf_path, Path(storage_dir).resolve(),
+        workers=args.workers or DEFAULT_WORKERS,
+        concurrency=args.concurrency or DEFAULT_CONCURRENCY,
+        batch_size=args.batch_size or DEFAULT_BATCH_SIZE,
+        segment_size=DEFAULT_SEGMENT_SIZE,
+        dedup_threshold=max(0.0, min(1.0, config.get('dedup_threshold', DEFAULT_THRESHOLD))),
+        clean=not args.no_clean,
+        fast=args.fast,
+        replay_only=args.replay_only,
+        vector_index=config.get('vector_index'),
+        ann_nprobe=config.get('ann_nprobe'),
+        settle=SETTLE_SECONDS if args.settle is None else max(0.0, args.settle),
+        poll=args.poll,
+        shard_config=config if shards_enabled(config) and not args.storage else None,
+    )
+
+
+def start_background_enrich(storage_path: Path, replay_only: bool = False) -> int:
+    """Run `enrich` detached from this process, logging to the store's enrich.log."""
+    import subprocess
+
+    from enrich import ENRICH_LOG
+
+    command = [sys.executable, str(Path(__file__).resolve()), "enrich", "--storage", str(storage_path)]
+    if replay_only:
+        command.append("--replay-only")
+    log_path = storage_path / ENRICH_LOG
+    with open(log_path, "a") as log:
+        process = subprocess.Popen(
+            command, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    print(f"Building the knowledge graph in the background (pid {process.pid}); progress in {log_path}")
+    return process.pid
+
+
+async def cmd_enrich(args, config):
+    """Add vector-only documents to the knowledge graph."""
+    from enrich import enrich
+
+    _, storage_dir = get_paths(args, config)
+    storage_path = Path(storage_dir).resolve()
+
+    if not storage_path.exists():
+        print(f"Error: No indexed data found at {storage_path}")
+        print("Run indexing first: python pdf_research.py index <pdf_dir>")
+        return 1
+
+    if args.background:
+        start_background_enrich(storage_path, args.replay_only)
+        return 0
+    return await enrich(storage_path, replay_only=args.replay_only)
+
+
 async def cmd_search(args, config):
     """Search indexed PDFs."""
-    from search import search, interactive_search
+    from metrics import start_metrics
+    from retrieval import DEFAULT_TOP_K
+    from search import batch_search, search, search_shards, interactive_search
+    from shards import shards_enabled
 
     _, storage_dir = get_paths(args, config)
     storage_path = Path(storage_dir).resolve()
 
-    if not storage_path.exists():
+    shard_paths = None
+    if shards_enabled(config) and not args.storage:
+        shard_paths = get_shard_paths(args.shards, config)
+        if shard_paths is None:
+            return 1
+        if not shard_paths:
+            print(f"Error: No indexed shards found under {config['shard_root']}")
+            print("Run indexing first: python pdf_research.py index <pdf_dir>")
+            return 1
+        if len(shard_paths) == 1:
+            # One shard is an ordinary store: server, batch and interactive modes apply
+            storage_path = next(iter(shard_paths.values()))
+            shard_paths = None
+        elif args.batch or not args.query:
+            print("Error: Batch and interactive searches use a single shard; choose one with --shard")
+            return 1
+
+    if not shard_paths and not storage_path.exists():
         print(f"Error: No indexed data found at {storage_path}")
         print("Run indexing first: python pdf_research.py index <pdf_dir>")
         return 1
 
     mode = args.mode or config.get('search_mode', 'hybrid')
+    top_k = max(1, args.top_k or DEFAULT_TOP_K)
+
+    metrics = start_metrics(Path(args.metrics_file) if args.metrics_file else None)
+    try:
+        if shard_paths:
+            result = await search_shards(
+                " ".join(args.query), shard_paths, Path(config['shard_root']).expanduser(), mode,
+                use_cache=not args.no_cache,
+                context_only=args.context_only,
+                top_k=top_k,
+                as_json=args.json,
+            )
+            print(result)
+            if args.metrics_summary:
+                metrics.print_summary()
+        elif args.batch:
+            failed = await batch_search(
+                args.batch, storage_path, mode,
+                concurrency=args.concurrency or 4,
+                output=args.output,
+                use_cache=not args.no_cache,
+                metrics_summary=args.metrics_summary,
+                context_only=args.context_only,
+                top_k=top_k,
+            )
+            return 1 if failed else 0
+        elif args.query:
+            query = " ".join(args.query)
+            result = await search(
+                query, storage_path, mode,
+                use_server=not args.no_server,
+                use_cache=not args.no_cache,
+                context_only=args.context_only,
+                top_k=top_k,
+                as_json=args.json,
+            )
+            print(result)
+            if args.metrics_summary:
+                metrics.print_summary()
+        else:
+            await interactive_search(
+                storage_path, use_cache=not args.no_cache,
+                metrics_summary=args.metrics_summary,
+                context_only=args.context_only,
+                top_k=top_k,
+            )
+    finally:
+        metrics.close()
 
-    if args.query:
-        query = " ".join(args.query)
-        result = await search(query, storage_path, mode)
-        print(result)
-    else:
-        await interactive_search(storage_path)
+    return 0
+
+
+async def cmd_serve(args, config):
+    """Keep storages loaded and answer searches over a local socket."""
+    from query_server import serve
+
+    _, storage_dir = get_paths(args, config)
+    storage_path = Path(storage_dir).resolve()
+
+    if not storage_path.exists():
+        print(f"Error: No indexed data found at {storage_path}")
+        print("Run indexing first: python pdf_research.py index <pdf_dir>")
+        return 1
+
+    return await serve(storage_path)
 
+
+def cmd_migrate(args, config):
+    """Convert NanoVectorDB JSON vector files to the memory-mapped format."""
+    from query_server import is_server_running
+    from vector_store import migrate_vector_storage
+
+    _, storage_dir = get_paths(args, config)
+    storage_path = Path(storage_dir).resolve()
+
+    if not storage_path.exists():
+        print(f"Error: No indexed data found at {storage_path}")
+        return 1
+
+    pid = is_server_running(storage_path)
+    if pid:
+        print(f"Error: a query server is running for {storage_path} (pid {pid}). Stop it first.")
+        return 1
+
+    migrated = migrate_vector_storage(storage_path, keep_json=args.keep_json)
+    if not migrated:
+        print(f"No JSON vector files to migrate in {storage_path}")
+        return 0
+    for namespace, rows in migrated.items():
+        print(f"  {namespace}: {rows} vectors")
+    print(f"Migrated {storage_path} to memory-mapped vector storage.")
+    if args.keep_json:
+        print("The JSON files were kept; delete vdb_*.json once you no longer need them.")
     return 0
 
 
+def cmd_ann_report(args, config):
+    """Compare IVF search against exact search on the stored vectors."""
+    from ann_index import REPORT_NPROBES, ann_report
+
+    _, storage_dir = get_paths(args, config)
+    storage_path = Path(storage_dir).resolve()
+
+    if not storage_path.exists():
+        print(f"Error: No indexed data found at {storage_path}")
+        return 1
+
+    nprobes = REPORT_NPROBES
+    if args.nprobe:
+        nprobes = tuple(int(n) for n in args.nprobe.split(",") if n.strip())
+    return ann_report(
+        storage_path, args.namespace,
+        queries=max(1, args.queries),
+        top_k=max(1, args.top_k),
+        nprobes=nprobes,
+        as_json=args.json,
+    )
+
+
 def cmd_status(args, config):
     """Show indexing status."""
+    from shards import shards_enabled
+
+    if shards_enabled(config) and not args.storage:
+        return print_shard_status(config)
+
     _, storage_dir = get_paths(args, config)
     storage_path = Path(storage_dir).resolve()
 
@@ -120,6 +411,7 @@ def cmd_status(args, config):
     print(f"  Storage Directory: {storage_dir}")
     print(f"  Search Mode: {config.get('search_mode', 'hybrid')}")
     print(f"  Auto Index: {config.get('auto_index', True)}")
+    print(f"  Vector Index: {config.get('vector_index', 'exact')}")
 
     # Check storage
     if not storage_path.exists():
@@ -127,44 +419,42 @@ def cmd_status(args, config):
         print("Run indexing first: python pdf_research.py index <pdf_dir>")
         return 0
 
-    # Count documents
-    docs_file = storage_path / "kv_store_full_docs.json"
-    chunks_file = storage_path / "kv_store_text_chunks.json"
-    entities_file = storage_path / "kv_store_full_entities.json"
-
-    doc_count = 0
-    chunk_count = 0
-    entity_count = 0
-    doc_names = []
-
-    if docs_file.exists():
-        with open(docs_file) as f:
-            data = json.load(f)
-            doc_count = len(data)
-            for doc_id, content in data.items():
-                if "[Document: " in content:
-                    start = content.find("[Document: ") + len("[Document: ")
-                    end = content.find("]", start)
-                    if end > start:
-                        doc_names.append(content[start:end])
-
-    if chunks_file.exists():
-        with open(chunks_file) as f:
-            chunk_count = len(json.load(f))
-
-    if entities_file.exists():
-        with open(entities_file) as f:
-            entity_count = len(json.load(f))
-
-    # Calculate size
-    total_size = sum(f.stat().st_size for f in storage_path.glob("*") if f.is_file())
-    size_mb = total_size / (1024 * 1024)
+    # Read counts from the metadata sidecar kept by the indexer
+    from storage_meta import get_cache_size, read_storage_meta
+
+    meta = read_storage_meta(storage_path)
+    doc_names = [doc["name"] for doc in meta["document_list"]]
+    size_mb = meta["storage_size_bytes"] / (1024 * 1024)
 
     print(f"\nStorage Status:")
-    print(f"  Documents: {doc_count}")
-    print(f"  Chunks: {chunk_count}")
-    print(f"  Entities: {entity_count}")
+    print(f"  Documents: {meta['documents']}")
+    if meta.get("segments", meta["documents"]) != meta["documents"]:
+        print(f"  Segments: {meta['segments']}")
+    print(f"  Chunks: {meta['chunks']}")
+    print(f"  Entities: {meta['entities']}")
     print(f"  Size: {size_mb:.2f} MB")
+    print(f"  Caches: {get_cache_size(storage_path) / (1024 * 1024):.2f} MB "
+          f"(query answers, LLM responses, logs)")
+    print(f"  Last Indexed: {meta['last_indexed'] or 'unknown'}")
+    vector_only = sorted(doc["name"] for doc in meta["document_list"] if not doc.get("enriched", True))
+    print(f"  Knowledge Graph: {len(doc_names) - len(vector_only)} of {len(doc_names)} PDFs enriched")
+
+    from query_server import is_server_running
+
+    server_pid = is_server_running(storage_path)
+    print(f"  Query Server: {f'running (pid {server_pid})' if server_pid else 'not running'}")
+
+    from query_cache import get_cache_stats
+
+    cache = get_cache_stats(storage_path)
+    print(f"  Query Cache: {cache['entries']} entries, {cache['hits']} hits, {cache['misses']} misses")
+
+    from journal import Journal
+
+    journal = Journal(storage_path)
+    if journal.exists():
+        print(f"  Indexing Journal: {len(journal.pending())} PDFs in progress or interrupted "
+              f"(the next index run resumes them)")
 
     if doc_names:
         print(f"\nIndexed Documents:")
@@ -173,6 +463,47 @@ def cmd_status(args, config):
         if len(doc_names) > 10:
             print(f"  ... and {len(doc_names) - 10} more")
 
+    if vector_only:
+        print(f"\nVector-Only Documents (naive and --context-only search only):")
+        for name in vector_only[:10]:
+            print(f"  - {name}")
+        if len(vector_only) > 10:
+            print(f"  ... and {len(vector_only) - 10} more")
+        print("Build their knowledge graph with: python pdf_research.py enrich --background")
+
+    print("=" * 60)
+    return 0
+
+
+def print_shard_status(config):
+    """Summarize every configured shard; `status --shard NAME` shows one in full."""
+    from shards import DEFAULT_SHARD, shard_dir, shard_names
+    from storage_meta import read_storage_meta
+
+    print("=" * 60)
+    print("  PDF Research Status")
+    print("=" * 60)
+
+    print(f"\nConfiguration:")
+    print(f"  PDF Directory: {config.get('pdf_dir') or '(not set)'}")
+    print(f"  Shard Root: {config['shard_root']}")
+    print(f"  Search Mode: {config.get('search_mode', 'hybrid')}")
+    print(f"  Vector Index: {config.get('vector_index', 'exact')}")
+
+    print(f"\nShards:")
+    for name in shard_names(config):
+        rules = ", ".join(config.get('shards', {}).get(name, [])) or (
+            "everything else" if name == DEFAULT_SHARD else "(no rules)")
+        shard_path = shard_dir(config, name)
+        if not shard_path.exists():
+            print(f"  {name}: not indexed ({rules})")
+            continue
+        meta = read_storage_meta(shard_path)
+        size_mb = meta["storage_size_bytes"] / (1024 * 1024)
+        print(f"  {name}: {meta['documents']} documents, {meta['chunks']} chunks, "
+              f"{meta['entities']} entities, {size_mb:.2f} MB ({rules})")
+
+    print("\nDetails of one shard: python pdf_research.py status --shard <name>")
     print("=" * 60)
     return 0
 
@@ -185,13 +516,71 @@ def cmd_config(args, config):
         config['storage_dir'] = str(Path(args.storage_dir).resolve())
     if args.mode:
         config['search_mode'] = args.mode
-
-    save_config(config)
+    if args.vector_index:
+        config['vector_index'] = args.vector_index
+    if args.ann_nprobe:
+        config['ann_nprobe'] = max(1, args.ann_nprobe)
+    if args.dedup_threshold is not None:
+        config['dedup_threshold'] = max(0.0, min(1.0, args.dedup_threshold))
+    if args.auto_index:
+        config['auto_index'] = args.auto_index == 'on'
+    if args.shard_root is not None:
+        # An empty root turns sharding off again
+        config['shard_root'] = str(Path(args.shard_root).expanduser().resolve()) if args.shard_root else ""
+    for spec in args.shard or []:
+        from shards import parse_shard
+
+        try:
+            name, rules = parse_shard(spec)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+        config.setdefault('shards', {})[name] = rules
+    for name in args.remove_shard or []:
+        if config.get('shards', {}).pop(name, None) is None:
+            print(f"Shard not configured: {name}")
+
+    # Without options this only shows the configuration
+    if (args.pdf_dir or args.storage_dir or args.mode or args.vector_index or args.ann_nprobe
+            or args.dedup_threshold is not None or args.shard_root is not None
+            or args.shard or args.remove_shard or args.auto_index):
+        save_config(config)
+
+    # Apply ANN settings to the configured store now rather than at its next change
+    storage_dir = config.get('storage_dir')
+    if (args.vector_index or args.ann_nprobe) and storage_dir and Path(storage_dir).exists():
+        from query_server import is_server_running
+        from vector_store import configure_vector_index
+
+        pid = is_server_running(Path(storage_dir))
+        if pid:
+            print(f"Error: a query server is running for {storage_dir} (pid {pid}). "
+                  "Stop it to apply the vector index settings.")
+            return 1
+        changes = configure_vector_index(Path(storage_dir), args.vector_index,
+                                         config.get('ann_nprobe'))
+        for namespace, change in changes.items():
+            print(f"  {namespace}: {change}")
 
     print("\nCurrent Configuration:")
     print(f"  PDF Directory: {config.get('pdf_dir') or '(not set)'}")
     print(f"  Storage Directory: {config.get('storage_dir') or '(not set)'}")
     print(f"  Search Mode: {config.get('search_mode', 'hybrid')}")
+    print(f"  Auto Index (watch): {'on' if config.get('auto_index', True) else 'off'}")
+    vector_index = config.get('vector_index', 'exact')
+    if vector_index == 'ivf':
+        vector_index += f" (nprobe {config.get('ann_nprobe', 16)})"
+    print(f"  Vector Index: {vector_index}")
+    print(f"  Duplicate Page Threshold: {config.get('dedup_threshold', 0.85) or 'off'}")
+    if config.get('shard_root'):
+        from shards import DEFAULT_SHARD, shard_names
+
+        print(f"  Shard Root: {config['shard_root']}")
+        for name in shard_names(config):
+            rules = config.get('shards', {}).get(name, [])
+            print(f"    {name}: {', '.join(rules) or ('everything else' if name == DEFAULT_SHARD else '(no rules)')}")
+    elif config.get('shards'):
+        print("  Shards: configured but off (set --shard-root to use them)")
 
     return 0
 
@@ -208,12 +597,42 @@ Examples:
   # Index PDFs
   python pdf_research.py index ~/Documents/papers
 
+  # Make new PDFs searchable first, extracting the knowledge graph in the background
+  python pdf_research.py index ~/Documents/papers --fast
+
+  # Index PDFs as they are saved to the folder, until Ctrl+C
+  python pdf_research.py watch ~/Documents/papers
+
   # Search (single query)
   python pdf_research.py search "What is machine learning?"
 
   # Search (interactive mode)
   python pdf_research.py search
 
+  # Ranked passages with document and page, no generated answer
+  python pdf_research.py search "attention heads" --context-only --top-k 5
+
+  # Exact identifier or error-code lookup, offline
+  python pdf_research.py search "ERR-4032" --mode lexical
+
+  # Answer a JSONL file of questions, 8 at a time
+  python pdf_research.py search --batch questions.jsonl --concurrency 8 --output answers.jsonl
+
+  # Keep the index loaded so searches skip the startup cost
+  python pdf_research.py serve
+
+  # Convert an older store's JSON vectors to memory-mapped files
+  python pdf_research.py migrate
+
+  # Measure approximate vector search against exact search, then enable it
+  python pdf_research.py ann-report
+  python pdf_research.py config --vector-index ivf --ann-nprobe 16
+
+  # Split the index into shards by folder and search two of them together
+  python pdf_research.py config --shard-root ~/rag --shard papers=~/pdfs/papers --shard specs=~/pdfs/specs
+  python pdf_research.py index ~/pdfs/papers
+  python pdf_research.py search "rate limits" --shard papers --shard specs
+
   # Check status
   python pdf_research.py status
 """
@@ -225,24 +644,138 @@ Examples:
     index_parser = subparsers.add_parser('index', help='Index PDF files')
     index_parser.add_argument('pdf_dir', nargs='?', help='Directory containing PDFs')
     index_parser.add_argument('--storage', '-s', help='Storage directory for index')
+    index_parser.add_argument('--workers', '-w', type=int,
+                              help='Parallel PDF extraction processes (default: CPU count)')
+    index_parser.add_argument('--concurrency', '-c', type=int,
+                              help='Documents processed by LightRAG in parallel (default: 4)')
+    index_parser.add_argument('--batch-size', '-b', type=int,
+                              help='Documents per LightRAG insert call (default: 8)')
+    index_parser.add_argument('--segment-size', type=int,
+                              help='Split PDFs into documents of at most this many characters, '
+                                   '0 for no limit (default: 200000)')
+    index_parser.add_argument('--dedup-threshold', type=float,
+                              help='Skip pages at least this similar (0-1) to an indexed page, '
+                                   '0 to index every page (default: 0.85)')
+    index_parser.add_argument('--no-clean', action='store_true',
+                              help='Keep running headers, footers and page numbers in the indexed text')
+    index_parser.add_argument('--fast', action='store_true',
+                              help='Only chunk and embed, then build the knowledge graph in the background')
+    index_parser.add_argument('--replay-only', action='store_true',
+                              help='Use only recorded model calls; fail on a cache miss')
+    index_parser.add_argument('--metrics-file', help='Append stage timings and counters to this JSONL file')
+    index_parser.add_argument('--metrics-summary', action='store_true',
+                              help='Print a table of stage timings and counters')
+
+    # Watch command
+    watch_parser = subparsers.add_parser(
+        'watch', help='Index new and changed PDFs as they land in the PDF directory')
+    watch_parser.add_argument('pdf_dir', nargs='?', help='Directory to watch (default: configured)')
+    watch_parser.add_argument('--storage', '-s', help='Storage directory for index')
+    watch_parser.add_argument('--workers', '-w', type=int,
+                              help='Parallel PDF extraction processes (default: CPU count)')
+    watch_parser.add_argument('--concurrency', '-c', type=int,
+                              help='Documents processed by LightRAG in parallel (default: 4)')
+    watch_parser.add_argument('--batch-size', '-b', type=int,
+                              help='Documents per LightRAG insert call (default: 8)')
+    watch_parser.add_argument('--settle', type=float,
+                              help='Seconds a PDF must stay unchanged before it is indexed (default: 2)')
+    watch_parser.add_argument('--poll', action='store_true',
+                              help='Scan the directory every second instead of using inotify')
+    watch_parser.add_argument('--no-clean', action='store_true',
+                              help='Keep running headers, footers and page numbers in the indexed text')
+    watch_parser.add_argument('--fast', action='store_true',
+                              help='Only chunk and embed new PDFs; run enrich later for the knowledge graph')
+    watch_parser.add_argument('--replay-only', action='store_true',
+                              help='Use only recorded model calls; fail on a cache miss')
+
+    # Enrich command
+    enrich_parser = subparsers.add_parser(
+        'enrich', help='Extract the knowledge graph of documents indexed with --fast')
+    enrich_parser.add_argument('--storage', '-s', help='Storage directory')
+    enrich_parser.add_argument('--shard', help='Shard to enrich instead of --storage')
+    enrich_parser.add_argument('--background', action='store_true',
+                               help="Run detached, logging to the store's enrich.log")
+    enrich_parser.add_argument('--replay-only', action='store_true',
+                               help='Use only recorded model calls; fail on a cache miss')
 
     # Search command
     search_parser = subparsers.add_parser('search', help='Search indexed PDFs')
     search_parser.add_argument('query', nargs='*', help='Search query (omit for interactive)')
-    search_parser.add_argument('--mode', '-m', choices=['naive', 'local', 'global', 'hybrid'],
-                               help='Search mode')
+    search_parser.add_argument('--mode', '-m',
+                               choices=['naive', 'local', 'global', 'hybrid', 'lexical'],
+                               help='Search mode (lexical: BM25 passages, no API key needed)')
     search_parser.add_argument('--storage', '-s', help='Storage directory')
+    search_parser.add_argument('--shard', action='append', dest='shards', metavar='NAME',
+                               help='Shard to search; repeat for several (default: all indexed shards)')
+    search_parser.add_argument('--no-server', action='store_true',
+                               help='Search in-process even if a query server is running')
+    search_parser.add_argument('--no-cache', action='store_true',
+                               help='Bypass the query result cache')
+    search_parser.add_argument('--context-only', action='store_true',
+                               help='Return the top-k ranked passages instead of a generated answer')
+    search_parser.add_argument('--top-k', '-k', type=int,
+                               help='Passages returned with --context-only or --mode lexical (default: 10)')
+    search_parser.add_argument('--json', action='store_true',
+                               help='Print --context-only or lexical passages as JSON')
+    search_parser.add_argument('--batch', metavar='QUERIES_JSONL',
+                               help="Answer every query in this JSONL file ('-' for stdin)")
+    search_parser.add_argument('--concurrency', '-c', type=int,
+                               help='Queries answered at once in batch mode (default: 4)')
+    search_parser.add_argument('--output', '-o', help='Write batch results to this file instead of stdout')
+    search_parser.add_argument('--metrics-file', help='Append stage timings and counters to this JSONL file')
+    search_parser.add_argument('--metrics-summary', action='store_true',
+                               help='Print a table of stage timings and counters')
+
+    # Serve command
+    serve_parser = subparsers.add_parser('serve', help='Keep the index loaded for fast searches')
+    serve_parser.add_argument('--storage', '-s', help='Storage directory')
+    serve_parser.add_argument('--shard', help='Shard to serve instead of --storage')
+
+    # Migrate command
+    migrate_parser = subparsers.add_parser(
+        'migrate', help='Convert JSON vector files to memory-mapped vector storage')
+    migrate_parser.add_argument('--storage', '-s', help='Storage directory')
+    migrate_parser.add_argument('--keep-json', action='store_true',
+                                help='Keep the vdb_*.json files after converting them')
+
+    # ANN report command
+    ann_parser = subparsers.add_parser(
+        'ann-report', help='Measure IVF recall and latency against exact vector search')
+    ann_parser.add_argument('--storage', '-s', help='Storage directory')
+    ann_parser.add_argument('--namespace', choices=['chunks', 'entities', 'relationships'],
+                            default='chunks', help='Vector store to measure (default: chunks)')
+    ann_parser.add_argument('--queries', '-q', type=int, default=200,
+                            help='Stored vectors used as sample queries (default: 200)')
+    ann_parser.add_argument('--top-k', '-k', type=int, default=10,
+                            help='Neighbours compared per query (default: 10)')
+    ann_parser.add_argument('--nprobe', help='Comma-separated nprobe values (default: 1,2,4,...,64)')
+    ann_parser.add_argument('--json', action='store_true', help='Print the report as JSON')
 
     # Status command
     status_parser = subparsers.add_parser('status', help='Show indexing status')
     status_parser.add_argument('--storage', '-s', help='Storage directory')
+    status_parser.add_argument('--shard', help='Show one shard in full')
 
     # Config command
     config_parser = subparsers.add_parser('config', help='Configure default settings')
     config_parser.add_argument('--pdf-dir', help='Default PDF directory')
     config_parser.add_argument('--storage-dir', help='Default storage directory')
-    config_parser.add_argument('--mode', choices=['naive', 'local', 'global', 'hybrid'],
+    config_parser.add_argument('--mode', choices=['naive', 'local', 'global', 'hybrid', 'lexical'],
                                help='Default search mode')
+    config_parser.add_argument('--vector-index', choices=['exact', 'ivf'],
+                               help='Vector search: exact scan or IVF approximate index')
+    config_parser.add_argument('--ann-nprobe', type=int,
+                               help='IVF lists scored per query; higher is slower and more exact')
+    config_parser.add_argument('--dedup-threshold', type=float,
+                               help='Default similarity (0-1) above which repeated pages are skipped, 0 to disable')
+    config_parser.add_argument('--auto-index', choices=['on', 'off'],
+                               help='Allow `watch` to index PDFs as they land in the PDF directory')
+    config_parser.add_argument('--shard-root',
+                               help="Directory holding one store per shard ('' to stop sharding)")
+    config_parser.add_argument('--shard', action='append', metavar='NAME=RULE[,RULE]',
+                               help='Add or replace a shard; rules are folders or wildcard file patterns')
+    config_parser.add_argument('--remove-shard', action='append', metavar='NAME',
+                               help='Remove a shard from the routing rules (its store is kept)')
 
     args = parser.parse_args()
     config = load_config()
@@ -251,10 +784,35 @@ Examples:
         parser.print_help()
         return 0
 
+    if getattr(args, 'shard', None) and args.command != 'config' and not args.storage:
+        # A single shard is addressed like any storage directory
+        shard_paths = get_shard_paths([args.shard], config)
+        if shard_paths is None:
+            return 1
+        args.storage = str(shard_paths[args.shard])
+
+    if args.command in ('index', 'watch', 'enrich', 'search', 'serve'):
+        # Only the model-backed commands need an event loop; status and config
+        # run on the standard library alone so they start instantly
+        import asyncio
+
     if args.command == 'index':
         return asyncio.run(cmd_index(args, config))
+    elif args.command == 'watch':
+        try:
+            return asyncio.run(cmd_watch(args, config))
+        except KeyboardInterrupt:
+            return 0
+    elif args.command == 'enrich':
+        return asyncio.run(cmd_enrich(args, config))
     elif args.command == 'search':
         return asyncio.run(cmd_search(args, config))
+    elif args.command == 'serve':
+        return asyncio.run(cmd_serve(args, config))
+    elif args.command == 'migrate':
+        return cmd_migrate(args, config)
+    elif args.command == 'ann-report':
+        return cmd_ann_report(args, config)
     elif args.command == 'status':
         return cmd_status(args, config)
     elif args.command == 'config':
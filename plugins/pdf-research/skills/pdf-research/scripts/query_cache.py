@@ -0,0 +1,148 @@
+"""
+Query Result Cache
+On-disk LRU cache of search answers, stored in the storage directory.
+
+Answers are keyed by the normalized query text, the search mode and the
+index generation from the metadata sidecar. The indexer bumps the generation
+whenever documents are added or removed, so re-indexing invalidates every
+cached answer without any explicit purge. Entries expire after a TTL and the
+least recently used ones are evicted beyond a size cap.
+
+Environment:
+    PDF_RESEARCH_CACHE_SIZE: Maximum cached answers (default: 1000)
+    PDF_RESEARCH_CACHE_TTL: Seconds before an answer expires (default: 7 days)
+
+A malformed value is ignored with a warning.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+CACHE_FILE = "query_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL = 7 * 24 * 3600.0
+
+# Settings already warned about, so a bad value is reported once per process
+_warned = set()
+
+
+def _env_number(name: str, default, cast=float):
+    """A numeric setting from the environment, or `default` if unset or malformed."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        if name not in _warned:
+            _warned.add(name)
+            print(f"Warning: ignoring {name}={value!r}, not a number; using {default}.",
+                  file=sys.stderr)
+        return default
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace and trailing punctuation."""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!. ").lower()
+
+
+def get_cache_key(query: str, mode: str, generation: int) -> str:
+    raw = f"{generation}\0{mode}\0{normalize_query(query)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class QueryCache:
+    """LRU + TTL cache of query answers for one storage directory."""
+
+    def __init__(self, storage_dir: Path, generation: int = 0,
+                 max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self.generation = generation
+        self.max_entries = (_env_number("PDF_RESEARCH_CACHE_SIZE", DEFAULT_MAX_ENTRIES, int)
+                            if max_entries is None else max_entries)
+        self.ttl = _env_number("PDF_RESEARCH_CACHE_TTL", DEFAULT_TTL) if ttl is None else ttl
+        self.conn = sqlite3.connect(storage_dir / CACHE_FILE, timeout=10)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                generation INTEGER,
+                result TEXT,
+                created REAL,
+                accessed REAL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed);
+            CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER);
+        """)
+        # Answers from an older index generation can never be hit again
+        with self.conn:
+            self.conn.execute("DELETE FROM entries WHERE generation != ?", (generation,))
+
+    def _count(self, name: str):
+        self.conn.execute(
+            "INSERT INTO stats VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def get(self, query: str, mode: str):
+        """Return the cached answer, or None on a miss."""
+        key = get_cache_key(query, mode, self.generation)
+        now = time.time()
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT result, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row:
+                self.conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                self._count("hits")
+                return row[0]
+            self._count("misses")
+            return None
+
+    def put(self, query: str, mode: str, result: str):
+        """Store an answer and evict the least recently used beyond the cap."""
+        if not result or result.startswith("Error:"):
+            return
+        key = get_cache_key(query, mode, self.generation)
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, self.generation, result, now, now)
+            )
+            self.conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+            self.conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def get_cache_stats(storage_dir: Path) -> dict:
+    """Entry, hit and miss counts, without creating a cache that doesn't exist."""
+    stats = {"entries": 0, "hits": 0, "misses": 0}
+    cache_file = storage_dir / CACHE_FILE
+    if not cache_file.exists():
+        return stats
+
+    try:
+        conn = sqlite3.connect(f"file:{cache_file}?mode=ro", uri=True, timeout=10)
+        try:
+            stats["entries"] = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            for name, value in conn.execute("SELECT name, value FROM stats"):
+                stats[name] = value
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+    return stats
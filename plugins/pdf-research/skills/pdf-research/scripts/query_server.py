@@ -0,0 +1,283 @@
+"""
+Warm Query Server for PDF Search
+Keeps LightRAG storages loaded behind a local Unix socket.
+
+Starting LightRAG loads the vector databases and knowledge graph from disk,
+which dominates the latency of one-shot searches. `pdf_research.py serve`
+runs this server once per storage directory; `search()` sends queries to it
+when it is running and falls back to an in-process LightRAG when it is not.
+
+Protocol: the client writes one JSON line, {"query": ..., "mode": ...}, and
+reads one JSON line back, {"result": ...} or {"error": ...}. A request with
+"context_only": true and "top_k" gets the ranked chunk list as its result.
+
+When the index changes, the next request loads a new instance and later
+requests use it; the old one is finalized once the queries still running on
+it have finished.
+"""
+
+import hashlib
+import json
+import os
+import signal
+import socket
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from lightrag_compat import release_loaded_stores, store_location
+from storage_meta import META_FILE
+
+# asyncio (which pulls in ssl) is imported by the code that serves or sends
+# queries; `status` only pings the socket and should not pay for it
+
+CONNECT_TIMEOUT = 1.0
+# Line limit of both ends' stream readers; a context-only reply with long chunks
+# is far over asyncio's default of 64 KiB
+STREAM_LIMIT = 64 * 1024 * 1024
+
+
+def get_socket_path(storage_dir: Path) -> Path:
+    """Socket path for a storage directory (kept short for the AF_UNIX limit)."""
+    key = hashlib.sha1(str(storage_dir.resolve()).encode()).hexdigest()[:12]
+    return Path(tempfile.gettempdir()) / f"pdf-research-{key}.sock"
+
+
+def server_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def is_server_running(storage_dir: Path) -> Optional[int]:
+    """Return the server's pid if one is serving this storage directory."""
+    socket_path = get_socket_path(storage_dir)
+    if not server_supported() or not socket_path.exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(str(socket_path))
+            sock.sendall(b'{"ping": true}\n')
+            reply = sock.makefile("rb").readline()
+        return json.loads(reply).get("pid")
+    except (OSError, ValueError):
+        return None
+
+
+async def query_server(storage_dir: Path, query: str, mode: str,
+                       context_only: bool = False, top_k: int = None):
+    """
+    Run a query on the warm server.
+
+    Returns the answer, or the ranked chunks for a context-only query. Returns
+    None when no server is listening for this storage directory, so the caller
+    can fall back to in-process search.
+    """
+    import asyncio
+
+    socket_path = get_socket_path(storage_dir)
+    if not server_supported() or not socket_path.exists():
+        return None
+
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(str(socket_path), limit=STREAM_LIMIT), CONNECT_TIMEOUT
+        )
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+    try:
+        request = {"query": query, "mode": mode}
+        if context_only:
+            request.update(context_only=True, top_k=top_k)
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        reply = await reader.readline()
+    except (OSError, ValueError, asyncio.LimitOverrunError):
+        # readline() reports a line over the limit as ValueError
+        return None
+    finally:
+        writer.close()
+
+    try:
+        response = json.loads(reply)
+    except ValueError:
+        # Empty or cut short, e.g. by a server that stopped mid-reply
+        return None
+    if "error" in response:
+        return f"Error: {response['error']}"
+    return response["result"]
+
+
+class QueryServer:
+    """Serves queries from one long-lived LightRAG instance."""
+
+    def __init__(self, storage_dir: Path):
+        import asyncio
+
+        self.storage_dir = storage_dir
+        self.socket_path = get_socket_path(storage_dir)
+        self.rag = None
+        self.meta_mtime = None
+        self.reload_lock = asyncio.Lock()
+        # Queries running per instance (by id), and replaced instances still in use
+        self.in_flight = {}
+        self.retired = {}
+
+    def _index_mtime(self):
+        meta_path = self.storage_dir / META_FILE
+        return meta_path.stat().st_mtime_ns if meta_path.exists() else None
+
+    async def load(self):
+        """(Re)load storages, swapping the new instance in once it is ready."""
+        from lightrag import LightRAG
+
+        from models import get_embedding_func, get_llm_func, get_tokenizer
+        from vector_store import get_vector_storage
+
+        if self.rag is not None:
+            # Otherwise the new instance gets the old one's data instead of the
+            # files; the old instance keeps its own data for queries in flight
+            release_loaded_stores()
+        rag = LightRAG(
+            **store_location(self.storage_dir),
+            embedding_func=get_embedding_func(),
+            llm_model_func=get_llm_func(),
+            tokenizer=get_tokenizer(),
+            vector_storage=get_vector_storage(self.storage_dir),
+        )
+        await rag.initialize_storages()
+        old_rag, self.rag = self.rag, rag
+        self.meta_mtime = self._index_mtime()
+        if old_rag is None:
+            return
+        if self.in_flight.get(id(old_rag)):
+            # Finalized by release() when its last query finishes
+            self.retired[id(old_rag)] = old_rag
+        else:
+            await old_rag.finalize_storages()
+
+    async def get_rag(self):
+        """Return the LightRAG instance, reloading it if the index changed."""
+        if self._index_mtime() != self.meta_mtime:
+            async with self.reload_lock:
+                if self._index_mtime() != self.meta_mtime:
+                    print("Index changed, reloading storages...")
+                    await self.load()
+        return self.rag
+
+    async def acquire(self):
+        """The current instance, counted as in use until release()."""
+        rag = await self.get_rag()
+        # No await since get_rag() returned, so a reload cannot slip in between
+        self.in_flight[id(rag)] = self.in_flight.get(id(rag), 0) + 1
+        return rag
+
+    async def release(self, rag):
+        """Finish a query; finalize its instance if it was replaced and is now idle."""
+        self.in_flight[id(rag)] -= 1
+        if self.in_flight[id(rag)]:
+            return
+        del self.in_flight[id(rag)]
+        if self.retired.pop(id(rag), None) is not None:
+            await rag.finalize_storages()
+
+    async def handle(self, reader, writer):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            if request.get("ping"):
+                response = {"pid": os.getpid()}
+            else:
+                response = await self.answer(request)
+            writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+            await writer.drain()
+        except (OSError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def answer(self, request: dict) -> dict:
+        from lightrag import QueryParam
+
+        from retrieval import DEFAULT_TOP_K, retrieve_chunks
+
+        try:
+            rag = await self.acquire()
+        except Exception as e:
+            return {"error": str(e)}
+        try:
+            if request.get("context_only"):
+                chunks = await retrieve_chunks(
+                    rag, request["query"], request.get("top_k") or DEFAULT_TOP_K
+                )
+                return {"result": chunks}
+            result = await rag.aquery(
+                request["query"],
+                param=QueryParam(mode=request.get("mode", "hybrid"))
+            )
+            return {"result": result}
+        except Exception as e:
+            return {"error": str(e)}
+        finally:
+            await self.release(rag)
+
+    async def listen(self):
+        """Start accepting connections on the socket."""
+        import asyncio
+
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        server = await asyncio.start_unix_server(self.handle, path=str(self.socket_path),
+                                                 limit=STREAM_LIMIT)
+        os.chmod(self.socket_path, 0o600)
+        return server
+
+    async def serve_forever(self):
+        import asyncio
+
+        await self.load()
+        server = await self.listen()
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        print(f"Serving {self.storage_dir}")
+        print(f"Socket: {self.socket_path} (pid {os.getpid()})")
+        print("Press Ctrl+C to stop.")
+
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            if self.socket_path.exists():
+                self.socket_path.unlink()
+            for rag in [self.rag, *self.retired.values()]:
+                await rag.finalize_storages()
+            print("\nServer stopped.")
+
+
+async def serve(storage_dir: Path) -> int:
+    """Run the warm query server until interrupted."""
+    if not server_supported():
+        print("Error: the query server needs Unix domain sockets (not available on this platform).")
+        return 1
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY not set.")
+        return 1
+
+    if not storage_dir.exists():
+        print(f"Error: No indexed data found at {storage_dir}. Run index_pdfs.py first.")
+        return 1
+
+    pid = is_server_running(storage_dir)
+    if pid:
+        print(f"A query server is already running for {storage_dir} (pid {pid}).")
+        return 1
+
+    await QueryServer(storage_dir).serve_forever()
+    return 0
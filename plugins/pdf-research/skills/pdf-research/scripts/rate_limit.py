@@ -0,0 +1,264 @@
+"""
+Adaptive Rate Limiting for Model Calls
+Paces the upstream embedding and completion requests, adapts their
+concurrency to the throttling the provider reports, and retries them.
+
+Raising --concurrency makes LightRAG send more requests at once than the
+account's rate limits allow; the provider answers with 429s and timeouts,
+LightRAG's own three quick retries run out, and whole documents fail. Every
+upstream call (cache misses only; see embed_cache.py and llm_cache.py) goes
+through the RateLimiter of its endpoint instead:
+
+- token buckets hold requests and estimated tokens per minute to the
+  configured budgets (unlimited unless set)
+- an AIMD concurrency limit halves when a call is throttled (429, timeout or
+  5xx) and grows by one slot after each window of successful calls, so it
+  settles just under the rate the provider sustains
+- throttled and transient failures are retried with jittered exponential
+  backoff, honouring Retry-After; while a Retry-After is pending no call to
+  the endpoint starts
+
+Environment (per endpoint, LLM and EMBED; 0 or unset means no budget):
+    PDF_RESEARCH_LLM_RPM, PDF_RESEARCH_LLM_TPM: Completion requests and tokens per minute
+    PDF_RESEARCH_EMBED_RPM, PDF_RESEARCH_EMBED_TPM: Embedding requests and tokens per minute
+    PDF_RESEARCH_MAX_RETRIES: Attempts after the first before a call fails (default: 8)
+"""
+
+import asyncio
+import os
+import random
+import time
+import weakref
+from collections import deque
+
+from metrics import get_metrics
+
+DEFAULT_MAX_RETRIES = 8
+# Upper bound of the adaptive limit; LightRAG's own max_async usually binds first
+MAX_CONCURRENCY = 32
+# Seconds of budget a bucket can spend at once after being idle; providers
+# enforce per-minute limits over short intervals, so bursts are kept small
+BURST_SECONDS = 1
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# The limit is halved at most once per this many seconds, so the calls already
+# in flight when throttling starts do not all cut it again
+DECREASE_INTERVAL = 5.0
+# Rough token estimate for budgets; providers count with their own tokenizer
+CHARS_PER_TOKEN = 4
+
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+
+
+def classify_error(error: BaseException):
+    """THROTTLED, TRANSIENT, or None for an error that retrying cannot fix."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    name = type(error).__name__
+    if status == 429 or name == "RateLimitError":
+        # An exhausted quota or spend limit does not recover by waiting
+        if "insufficient_quota" in str(error) or getattr(error, "code", None) == "insufficient_quota":
+            return None
+        return THROTTLED
+    if (isinstance(error, (asyncio.TimeoutError, TimeoutError)) or name == "APITimeoutError"
+            or status == 408 or (status or 0) >= 500 or name == "InternalServerError"):
+        return THROTTLED
+    # LightRAG raises the last two for empty or malformed completions
+    if (status == 409 or isinstance(error, ConnectionError)
+            or name in ("APIConnectionError", "InvalidResponseError", "TransientBadRequestError")):
+        return TRANSIENT
+    return None
+
+
+def retry_after(error: BaseException):
+    """Seconds from the response's Retry-After headers, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value is not None:
+            try:
+                return max(0.0, float(value) * scale)
+            except ValueError:
+                pass
+    return None
+
+
+class TokenBucket:
+    """Budget of `per_minute` units, refilled continuously."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` units and return how long to wait before using them."""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # Going into debt queues callers in arrival order
+        self.level -= min(amount, self.capacity)
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+
+class RateLimiter:
+    """Budgets, adaptive concurrency and retries for one endpoint."""
+
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_concurrency: int = MAX_CONCURRENCY, max_retries: int = DEFAULT_MAX_RETRIES):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.successes = 0
+        self.paused_until = 0.0
+        self.decreased_at = float("-inf")
+        self._waiters = deque()
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < max(1, int(self.limit))
+
+    def _wake(self):
+        while self._waiters and self._has_slot():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+
+    async def _acquire(self, tokens: int):
+        start = time.perf_counter()
+        if not self._waiters and self._has_slot():
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Woken and cancelled at once: hand the slot on
+                    self.in_flight -= 1
+                    self._wake()
+                raise
+        try:
+            delay = max(self.paused_until - time.monotonic(), 0.0)
+            if self.requests:
+                delay = max(delay, self.requests.reserve(1))
+            if self.tokens:
+                delay = max(delay, self.tokens.reserve(tokens))
+            if delay:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._release(TRANSIENT)
+            raise
+        waited = time.perf_counter() - start
+        if waited > 0.001:
+            get_metrics().add_time(f"{self.name}_rate_wait", waited)
+
+    def _release(self, outcome, pause: float = None):
+        """Free a slot and adapt the limit to the call's outcome (None for success)."""
+        metrics = get_metrics()
+        self.in_flight -= 1
+        if outcome is None:
+            # Additive increase: one slot per window of successful calls
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.max_concurrency:
+                self.limit = min(self.max_concurrency, self.limit + 1)
+                self.successes = 0
+        elif outcome == THROTTLED:
+            metrics.count(f"{self.name}_throttled")
+            now = time.monotonic()
+            if pause:
+                self.paused_until = max(self.paused_until, now + pause)
+            if now - self.decreased_at >= DECREASE_INTERVAL:
+                # Multiplicative decrease
+                self.limit = max(1.0, self.limit / 2)
+                self.successes = 0
+                self.decreased_at = now
+        metrics.gauge(f"{self.name}_concurrency", int(self.limit))
+        self._wake()
+
+    async def call(self, func, *args, tokens: int = 0, **kwargs):
+        """Run `await func(*args, **kwargs)` within the budgets, retrying failures."""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(tokens)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                pause = retry_after(e) if kind == THROTTLED else None
+                self._release(kind or TRANSIENT, pause)
+                if kind is None or attempt == self.max_retries:
+                    raise
+                get_metrics().count(f"{self.name}_retries")
+                backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+                await asyncio.sleep(max(backoff, pause or 0.0))
+                continue
+            except BaseException:
+                self._release(TRANSIENT)
+                raise
+            self._release(None)
+            return result
+
+
+def _env_number(name: str, default: float = 0) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+# One limiter per endpoint and event loop (its waiters are futures of that loop)
+_limiters = weakref.WeakKeyDictionary()
+
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """The shared limiter of an endpoint ("llm" or "embed") in the running loop."""
+    limiters = _limiters.setdefault(asyncio.get_running_loop(), {})
+    if name not in limiters:
+        prefix = f"PDF_RESEARCH_{name.upper()}"
+        limiters[name] = RateLimiter(
+            name,
+            requests_per_minute=_env_number(f"{prefix}_RPM"),
+            tokens_per_minute=_env_number(f"{prefix}_TPM"),
+            max_retries=int(_env_number("PDF_RESEARCH_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+        )
+    return limiters[name]
+
+
+def rate_limited_llm_func(llm_func):
+    """Send an llm_model_func's calls through the shared "llm" limiter."""
+
+    async def complete(prompt, system_prompt=None, history_messages=None, **kwargs):
+        chars = len(prompt) + len(system_prompt or "") + sum(
+            len(str(message.get("content", ""))) for message in history_messages or []
+        )
+        return await get_rate_limiter("llm").call(
+            llm_func, prompt, system_prompt=system_prompt, history_messages=history_messages,
+            tokens=chars // CHARS_PER_TOKEN + 1, **kwargs
+        )
+
+    return complete
+
+
+def rate_limited_embedding_func(embedding_func):
+    """Send a LightRAG EmbeddingFunc's calls through the shared "embed" limiter."""
+    from lightrag.utils import EmbeddingFunc
+
+    async def embed(texts: list, **kwargs):
+        chars = sum(len(text) for text in texts)
+        return await get_rate_limiter("embed").call(
+            embedding_func, texts, tokens=chars // CHARS_PER_TOKEN + 1, **kwargs
+        )
+
+    return EmbeddingFunc(
+        embedding_dim=embedding_func.embedding_dim,
+        max_token_size=embedding_func.max_token_size,
+        func=embed,
+    )
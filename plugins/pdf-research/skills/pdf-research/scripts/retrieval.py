@@ -0,0 +1,95 @@
+"""
+Retrieval-Only Search
+Ranked chunk lookup for callers that need the supporting passages, not an
+answer.
+
+The query is embedded and matched against LightRAG's chunk vector store
+directly, so no keyword extraction or answer completion runs and latency is
+bounded by one embedding call and the vector lookup. Each hit carries its
+similarity score, the source PDF name and the page numbers it spans, read
+from the "[Page N]" markers the indexer writes into every document.
+"""
+
+import json
+import re
+from typing import TYPE_CHECKING
+
+from metrics import get_metrics
+
+if TYPE_CHECKING:
+    from lightrag import LightRAG
+
+DEFAULT_TOP_K = 10
+
+PAGE_MARKER = re.compile(r"\[Page (\d+)\]")
+SEGMENT_SUFFIX = re.compile(r" \(pages \d+-\d+\)$")
+
+
+def source_name(file_path: str) -> str:
+    """PDF name of a document, without the page range of a split segment."""
+    return SEGMENT_SUFFIX.sub("", file_path or "unknown")
+
+
+def chunk_pages(doc_text: str, content: str) -> list:
+    """Pages a chunk spans: the page it starts on plus any it runs into."""
+    start = doc_text.find(content[:200]) if doc_text else -1
+    pages = []
+    if start >= 0:
+        before = PAGE_MARKER.findall(doc_text, 0, start)
+        if before:
+            pages.append(int(before[-1]))
+    for page in PAGE_MARKER.findall(content):
+        if int(page) not in pages:
+            pages.append(int(page))
+    return pages
+
+
+async def retrieve_chunks(rag: "LightRAG", query: str, top_k: int = DEFAULT_TOP_K) -> list:
+    """Return the top_k chunks most similar to the query, best first."""
+    metrics = get_metrics()
+    with metrics.stage("retrieval", mode="context"):
+        hits = await rag.chunks_vdb.query(query, top_k=top_k)
+
+        doc_ids = list(dict.fromkeys(hit.get("full_doc_id") for hit in hits if hit.get("full_doc_id")))
+        docs = await rag.full_docs.get_by_ids(doc_ids) if doc_ids else []
+        doc_texts = {
+            doc_id: (doc or {}).get("content", "") for doc_id, doc in zip(doc_ids, docs)
+        }
+
+    chunks = []
+    for rank, hit in enumerate(hits, 1):
+        content = hit.get("content", "")
+        chunks.append({
+            "rank": rank,
+            "score": round(float(hit.get("distance", 0.0)), 4),
+            "document": source_name(hit.get("file_path")),
+            "pages": chunk_pages(doc_texts.get(hit.get("full_doc_id"), ""), content),
+            "chunk_id": hit.get("id"),
+            "content": content,
+        })
+    return chunks
+
+
+def format_chunks(chunks: list, as_json: bool = False) -> str:
+    """Render ranked chunks as JSON or as readable text."""
+    if as_json:
+        return json.dumps(chunks, ensure_ascii=False, indent=2)
+    if not chunks:
+        return "No matching passages found."
+
+    blocks = []
+    for chunk in chunks:
+        pages = chunk["pages"]
+        if len(pages) > 1:
+            where = f"pp. {pages[0]}-{pages[-1]}"
+        elif pages:
+            where = f"p. {pages[0]}"
+        else:
+            where = "page unknown"
+        # Results merged across shards name the shard they came from
+        source = f"{chunk['shard']}/{chunk['document']}" if "shard" in chunk else chunk["document"]
+        blocks.append(
+            f"[{chunk['rank']}] {source}, {where} (score {chunk['score']:.3f})\n"
+            f"{chunk['content'].strip()}"
+        )
+    return "\n\n".join(blocks)
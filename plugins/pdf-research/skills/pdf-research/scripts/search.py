@@ -4,13 +4,32 @@ PDF Search Interface for LightRAG
 Query indexed PDFs using natural language.
 
 Usage:
-    python search.py [query] [--mode <mode>] [--storage-dir <path>]
+    python search.py [query] [--mode <mode>] [--storage-dir <path>] [--no-server] [--no-cache]
+                     [--context-only] [--top-k <n>] [--json]
+                     [--metrics-file <path>] [--metrics-summary]
+    python search.py --batch <queries.jsonl> [--concurrency <n>] [--output <results.jsonl>]
 
 Search Modes:
-    naive  - Simple keyword matching
-    local  - Focus on specific entities/details
-    global - Focus on broad themes/summaries
-    hybrid - Combines local and global (default, recommended)
+    naive   - Vector search over text chunks
+    local   - Focus on specific entities/details
+    global  - Focus on broad themes/summaries
+    hybrid  - Combines local and global (default, recommended)
+    lexical - BM25 keyword search for exact terms, identifiers and error
+              codes; returns ranked passages and needs no API key
+
+--context-only skips answer generation and returns the top-k ranked chunks
+with their scores, document names and pages (see retrieval.py).
+
+Single queries go to a warm `pdf_research.py serve` process when one is
+running for the storage directory, and run in-process otherwise. Answers are
+cached per storage directory until the index changes (see query_cache.py).
+`pdf_research.py search` spreads a query over several shards with
+search_shards() (see shards.py).
+
+Batch mode reads one query per line, either a JSON string or an object with
+"query" and optional "id" and "mode" keys, answers them concurrently on one
+loaded LightRAG instance and writes one JSON result per line in completion
+order.
 
 Environment:
     OPENAI_API_KEY: Required for embeddings and LLM
@@ -18,51 +37,311 @@ Environment:
 """
 
 import argparse
-import asyncio
 import json
 import os
 import sys
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
-from lightrag import LightRAG, QueryParam
-from lightrag.llm.openai import gpt_4o_mini_complete, openai_embed
+
+from metrics import get_metrics, start_metrics
+from models import get_embedding_func, get_llm_func, get_tokenizer
+from query_cache import QueryCache
+from lexical_index import LexicalIndex, lexical_search
+from lightrag_compat import store_location
+from query_server import query_server
+from retrieval import DEFAULT_TOP_K, format_chunks, retrieve_chunks
+from shards import interleave, merge_chunks
+from storage_meta import get_index_generation, read_storage_meta
+
+# LightRAG is imported where a query runs, so --help and listings stay fast
+if TYPE_CHECKING:
+    from lightrag import LightRAG
 
 # Load environment variables
 load_dotenv()
 
+SEARCH_MODES = ["naive", "local", "global", "hybrid", "lexical"]
 
-async def search(query: str, storage_dir: Path, mode: str = "hybrid") -> str:
+
+async def search(query: str, storage_dir: Path, mode: str = "hybrid",
+                 use_server: bool = True, use_cache: bool = True,
+                 context_only: bool = False, top_k: int = DEFAULT_TOP_K,
+                 as_json: bool = False) -> str:
     """
     Search indexed PDFs with a natural language query.
 
     Args:
         query: Natural language search query
         storage_dir: Path to the RAG storage directory
-        mode: Search mode - 'naive', 'local', 'global', or 'hybrid' (default)
+        mode: Search mode - 'naive', 'local', 'global', 'hybrid' (default) or
+            'lexical', which returns the top_k BM25-ranked chunks
+        use_server: Send the query to a running `pdf_research.py serve`
+            process, if any, instead of loading storages in-process
+        use_cache: Answer repeated queries from the on-disk result cache
+        context_only: Return the top_k ranked chunks instead of an answer
+        top_k: Number of chunks returned by a context-only search
+        as_json: Format context-only results as JSON instead of text
     """
+    if mode == "lexical":
+        # Local index only: no API key, server or result cache needed
+        if not storage_dir.exists():
+            return f"Error: No indexed data found at {storage_dir}. Run index_pdfs.py first."
+        return format_chunks(lexical_search(storage_dir, query, top_k), as_json)
+
     if not os.getenv("OPENAI_API_KEY"):
         return "Error: OPENAI_API_KEY not set."
 
     if not storage_dir.exists():
         return f"Error: No indexed data found at {storage_dir}. Run index_pdfs.py first."
 
-    rag = LightRAG(
-        working_dir=str(storage_dir),
-        embedding_func=openai_embed,
-        llm_model_func=gpt_4o_mini_complete,
-    )
+    if context_only:
+        return await _search_context(query, storage_dir, top_k, as_json, use_server, use_cache)
 
-    await rag.initialize_storages()
+    metrics = get_metrics()
+    cache = QueryCache(storage_dir, get_index_generation(storage_dir)) if use_cache else None
+    try:
+        if cache:
+            with metrics.stage("cache_lookup"):
+                result = cache.get(query, mode)
+            if result is not None:
+                metrics.count("query_cache_hits")
+                return result
+
+        result = None
+        if use_server:
+            with metrics.stage("server"):
+                result = await query_server(storage_dir, query, mode)
+        if result is None:
+            result = await _search_in_process(query, storage_dir, mode)
+
+        if cache:
+            cache.put(query, mode, result)
+        return result
+    finally:
+        if cache:
+            cache.close()
+
+
+async def _search_context(query: str, storage_dir: Path, top_k: int, as_json: bool,
+                          use_server: bool, use_cache: bool) -> str:
+    """Context-only search: ranked chunks, from the cache, server or in-process."""
+    # Chunk lists are cached as JSON under their own mode key
+    cache_mode = f"context:{top_k}"
+    metrics = get_metrics()
+    cache = QueryCache(storage_dir, get_index_generation(storage_dir)) if use_cache else None
+    try:
+        if cache:
+            with metrics.stage("cache_lookup"):
+                cached = cache.get(query, cache_mode)
+            if cached is not None:
+                metrics.count("query_cache_hits")
+                return format_chunks(json.loads(cached), as_json)
+
+        chunks = None
+        if use_server:
+            with metrics.stage("server"):
+                chunks = await query_server(storage_dir, query, "naive",
+                                            context_only=True, top_k=top_k)
+            if isinstance(chunks, str):
+                return chunks  # error reported by the server
+        if chunks is None:
+            chunks = await _search_in_process(query, storage_dir, "naive",
+                                              context_only=True, top_k=top_k)
+
+        if cache:
+            cache.put(query, cache_mode, json.dumps(chunks))
+        return format_chunks(chunks, as_json)
+    finally:
+        if cache:
+            cache.close()
+
+
+async def _search_in_process(query: str, storage_dir: Path, mode: str,
+                             context_only: bool = False, top_k: int = DEFAULT_TOP_K):
+    """Load storages, answer one query (or rank its chunks) and release them."""
+    metrics = get_metrics()
+    with metrics.stage("storage_load"):
+        rag = await load_rag(storage_dir)
 
+    if context_only:
+        result = await retrieve_chunks(rag, query, top_k)
+    else:
+        result = await timed_query(rag, query, mode)
+
+    await rag.finalize_storages()
+
+    return result
+
+
+async def timed_query(rag: "LightRAG", query: str, mode: str) -> str:
+    """
+    Answer a query on loaded storages, recording retrieval and generation time.
+
+    Generation is the time spent in answer completions; retrieval is the rest,
+    including keyword extraction and query embedding.
+    """
+    from lightrag import QueryParam
+
+    metrics = get_metrics()
+    generation_before = metrics.stage_seconds("llm")
+    start = time.perf_counter()
     result = await rag.aquery(
         query,
         param=QueryParam(mode=mode)
     )
+    elapsed = time.perf_counter() - start
+    generation = metrics.stage_seconds("llm") - generation_before
+    metrics.add_time("retrieval", max(0.0, elapsed - generation), mode=mode)
+    metrics.add_time("generation", generation, mode=mode)
+    return result
 
-    await rag.finalize_storages()
 
-    return result
+async def search_shards(query: str, shard_dirs: dict, shard_root: Path, mode: str = "hybrid",
+                        use_cache: bool = True, context_only: bool = False,
+                        top_k: int = DEFAULT_TOP_K, as_json: bool = False) -> str:
+    """
+    Search several shards (see shards.py) concurrently and merge the results.
+
+    `shard_dirs` maps shard names to storage directories. Only those shards
+    are loaded, all at once. Ranked chunks (context-only and lexical searches)
+    are merged by score; answers come from one completion over the interleaved
+    entities, relations and chunks every shard retrieved. Results are cached in
+    `shard_root` until any shard under it is re-indexed.
+    """
+    import asyncio
+
+    missing = [name for name, path in shard_dirs.items() if not path.exists()]
+    if missing:
+        return f"Error: Shard not indexed yet: {', '.join(missing)}. Run indexing first."
+
+    if mode == "lexical":
+        with get_metrics().stage("lexical", shards=len(shard_dirs)):
+            results = {name: lexical_search(path, query, top_k) for name, path in shard_dirs.items()}
+        return format_chunks(merge_chunks(results, top_k), as_json)
+
+    if not os.getenv("OPENAI_API_KEY"):
+        return "Error: OPENAI_API_KEY not set."
+
+    cache_mode = (f"context:{top_k}" if context_only else mode) + "@" + ",".join(sorted(shard_dirs))
+    generation = sum(get_index_generation(path) for path in shard_root.iterdir() if path.is_dir())
+    metrics = get_metrics()
+    cache = QueryCache(shard_root, generation) if use_cache else None
+    try:
+        if cache:
+            with metrics.stage("cache_lookup"):
+                result = cache.get(query, cache_mode)
+            if result is not None:
+                metrics.count("query_cache_hits")
+                return format_chunks(json.loads(result), as_json) if context_only else result
+
+        with metrics.stage("storage_load", shards=len(shard_dirs)):
+            rags = dict(zip(shard_dirs, await asyncio.gather(
+                *(load_rag(path) for path in shard_dirs.values())
+            )))
+        try:
+            if context_only:
+                ranked = await asyncio.gather(
+                    *(retrieve_chunks(rag, query, top_k) for rag in rags.values())
+                )
+                chunks = merge_chunks(dict(zip(rags, ranked)), top_k)
+                result = json.dumps(chunks)
+            else:
+                result = await answer_from_shards(list(rags.values()), query, mode)
+        finally:
+            await asyncio.gather(*(rag.finalize_storages() for rag in rags.values()))
+
+        if cache:
+            cache.put(query, cache_mode, result)
+        return format_chunks(chunks, as_json) if context_only else result
+    finally:
+        if cache:
+            cache.close()
+
+
+async def load_rag(storage_dir: Path) -> "LightRAG":
+    """Initialize a query-only LightRAG instance on a storage directory."""
+    from lightrag import LightRAG
+
+    from vector_store import get_vector_storage
+
+    rag = LightRAG(
+        **store_location(storage_dir),
+        embedding_func=get_embedding_func(),
+        llm_model_func=get_llm_func(),
+        tokenizer=get_tokenizer(),
+        vector_storage=get_vector_storage(storage_dir),
+    )
+    await rag.initialize_storages()
+    return rag
+
+
+async def answer_from_shards(rags: list, query: str, mode: str) -> str:
+    """
+    Retrieve from every shard at once, then generate a single answer.
+
+    Each shard's entities, relations and chunks are interleaved by rank and
+    cut to the limits one store would use, and the references renumbered, so
+    the prompt has the shape LightRAG builds for a single store.
+    """
+    import asyncio
+
+    from lightrag import QueryParam
+    from lightrag.prompt import PROMPTS
+
+    metrics = get_metrics()
+    param = QueryParam(mode=mode)
+    with metrics.stage("retrieval", mode=mode):
+        results = await asyncio.gather(
+            *(rag.aquery_data(query, param=QueryParam(mode=mode)) for rag in rags)
+        )
+    data = [result.get("data") or {} for result in results if result.get("status") == "success"]
+    entities = interleave([d.get("entities", []) for d in data], param.top_k)
+    relations = interleave([d.get("relationships", []) for d in data], param.top_k)
+    chunks = interleave([d.get("chunks", []) for d in data], param.chunk_top_k)
+    if not chunks and not entities and not relations:
+        return PROMPTS["fail_response"]
+
+    references = {}
+    for chunk in chunks:
+        references.setdefault(chunk.get("file_path") or "unknown_source", len(references) + 1)
+    text_chunks_str = "\n".join(
+        json.dumps({"reference_id": str(references[chunk.get("file_path") or "unknown_source"]),
+                    "content": chunk.get("content", "")}, ensure_ascii=False)
+        for chunk in chunks
+    )
+    reference_list_str = "\n".join(f"[{number}] {path}" for path, number in references.items())
+
+    if mode == "naive":
+        context = PROMPTS["naive_query_context"].format(
+            text_chunks_str=text_chunks_str, reference_list_str=reference_list_str,
+        )
+        system_prompt = PROMPTS["naive_rag_response"].format(
+            response_type=param.response_type, user_prompt="n/a", content_data=context,
+        )
+    else:
+        entities_str = "\n".join(
+            json.dumps({"entity": e.get("entity_name"), "type": e.get("entity_type"),
+                        "description": e.get("description")}, ensure_ascii=False)
+            for e in entities
+        )
+        relations_str = "\n".join(
+            json.dumps({"entity1": r.get("src_id"), "entity2": r.get("tgt_id"),
+                        "description": r.get("description")}, ensure_ascii=False)
+            for r in relations
+        )
+        context = PROMPTS["kg_query_context"].format(
+            entities_str=entities_str, relations_str=relations_str,
+            text_chunks_str=text_chunks_str, reference_list_str=reference_list_str,
+        )
+        system_prompt = PROMPTS["rag_response"].format(
+            response_type=param.response_type, user_prompt="n/a", context_data=context,
+        )
+
+    with metrics.stage("generation", mode=mode):
+        return await get_llm_func()(query, system_prompt=system_prompt)
 
 
 def get_storage_info(storage_dir: Path) -> dict:
@@ -70,33 +349,30 @@ def get_storage_info(storage_dir: Path) -> dict:
     info = {
         "exists": storage_dir.exists(),
         "documents": 0,
+        "chunks": 0,
+        "entities": 0,
+        "storage_size_mb": 0,
+        "last_indexed": None,
         "document_names": []
     }
 
     if not storage_dir.exists():
         return info
 
-    docs_file = storage_dir / "kv_store_full_docs.json"
-    if docs_file.exists():
-        try:
-            with open(docs_file) as f:
-                data = json.load(f)
-            info["documents"] = len(data)
-
-            # Extract document names
-            for doc_id, content in data.items():
-                if "[Document: " in content:
-                    start = content.find("[Document: ") + len("[Document: ")
-                    end = content.find("]", start)
-                    if end > start:
-                        info["document_names"].append(content[start:end])
-        except Exception:
-            pass
+    meta = read_storage_meta(storage_dir)
+    info["documents"] = meta["documents"]
+    info["chunks"] = meta["chunks"]
+    info["entities"] = meta["entities"]
+    info["storage_size_mb"] = round(meta["storage_size_bytes"] / (1024 * 1024), 2)
+    info["last_indexed"] = meta["last_indexed"]
+    info["document_names"] = [doc["name"] for doc in meta["document_list"]]
 
     return info
 
 
-async def interactive_search(storage_dir: Path):
+async def interactive_search(storage_dir: Path, use_cache: bool = True,
+                             metrics_summary: bool = False, context_only: bool = False,
+                             top_k: int = DEFAULT_TOP_K):
     """Interactive search mode."""
     print("=" * 60)
     print("  LightRAG PDF Search System")
@@ -120,8 +396,8 @@ async def interactive_search(storage_dir: Path):
             print(f"  ... and {len(info['document_names']) - 10} more")
 
     print("\n" + "-" * 60)
-    print("Search modes: naive, local, global, hybrid (default)")
-    print("Commands: /mode <mode>, /docs, /info, /quit, /help")
+    print("Search modes: naive, local, global, hybrid (default), lexical")
+    print("Commands: /mode <mode>, /context, /top-k <n>, /docs, /info, /quit, /help")
     print("-" * 60)
 
     current_mode = "hybrid"
@@ -131,17 +407,30 @@ async def interactive_search(storage_dir: Path):
         return
 
     # Initialize RAG once for the session
-    rag = LightRAG(
-        working_dir=str(storage_dir),
-        embedding_func=openai_embed,
-        llm_model_func=gpt_4o_mini_complete,
-    )
-    await rag.initialize_storages()
+    from lightrag import LightRAG
+
+    from vector_store import get_vector_storage
+
+    metrics = get_metrics()
+    with metrics.stage("storage_load"):
+        rag = LightRAG(
+            **store_location(storage_dir),
+            embedding_func=get_embedding_func(),
+            llm_model_func=get_llm_func(),
+            tokenizer=get_tokenizer(),
+            vector_storage=get_vector_storage(storage_dir),
+        )
+        await rag.initialize_storages()
+    cache = QueryCache(storage_dir, get_index_generation(storage_dir)) if use_cache else None
 
     try:
         while True:
             try:
-                query = input(f"\n[{current_mode}] Query: ").strip()
+                if context_only and current_mode != "lexical":
+                    prompt_mode = f"context top-{top_k}"
+                else:
+                    prompt_mode = current_mode
+                query = input(f"\n[{prompt_mode}] Query: ").strip()
             except EOFError:
                 break
 
@@ -153,10 +442,13 @@ async def interactive_search(storage_dir: Path):
 
             if query.lower() == "/help":
                 print("\nCommands:")
-                print("  /mode naive  - Simple keyword matching")
-                print("  /mode local  - Focus on specific details")
-                print("  /mode global - Focus on broad themes")
-                print("  /mode hybrid - Combined approach (recommended)")
+                print("  /mode naive   - Vector search over text chunks")
+                print("  /mode local   - Focus on specific details")
+                print("  /mode global  - Focus on broad themes")
+                print("  /mode hybrid  - Combined approach (recommended)")
+                print("  /mode lexical - Exact terms, identifiers and error codes (BM25)")
+                print("  /context     - Toggle passages-only results (no generated answer)")
+                print("  /top-k <n>   - Number of passages shown in context mode")
                 print("  /docs        - List indexed documents")
                 print("  /info        - Show storage statistics")
                 print("  /quit        - Exit the search")
@@ -171,36 +463,226 @@ async def interactive_search(storage_dir: Path):
             if query.lower() == "/info":
                 print(f"\nStorage: {storage_dir}")
                 print(f"Documents: {info['documents']}")
+                print(f"Chunks: {info['chunks']}")
+                print(f"Entities: {info['entities']}")
+                print(f"Size: {info['storage_size_mb']} MB")
+                print(f"Last Indexed: {info['last_indexed'] or 'unknown'}")
                 print(f"Mode: {current_mode}")
+                print(f"Context only: {'on' if context_only else 'off'} (top-k {top_k})")
+                continue
+
+            if query.lower() == "/context":
+                context_only = not context_only
+                print(f"Context only: {'on' if context_only else 'off'}")
+                continue
+
+            if query.lower().startswith("/top-k "):
+                value = query[7:].strip()
+                if value.isdigit() and int(value) > 0:
+                    top_k = int(value)
+                    print(f"Top-k changed to: {top_k}")
+                else:
+                    print("Invalid top-k. Use a positive integer.")
                 continue
 
             if query.lower().startswith("/mode "):
                 new_mode = query[6:].strip().lower()
-                if new_mode in ["naive", "local", "global", "hybrid"]:
+                if new_mode in SEARCH_MODES:
                     current_mode = new_mode
                     print(f"Mode changed to: {current_mode}")
                 else:
-                    print("Invalid mode. Use: naive, local, global, or hybrid")
+                    print("Invalid mode. Use: naive, local, global, hybrid or lexical")
                 continue
 
             print("\nSearching...\n")
-            result = await rag.aquery(
-                query,
-                param=QueryParam(mode=current_mode)
-            )
+            if current_mode == "lexical":
+                result = format_chunks(lexical_search(storage_dir, query, top_k))
+                print("-" * 60)
+                print(result)
+                print("-" * 60)
+                continue
+
+            if context_only:
+                result = format_chunks(await retrieve_chunks(rag, query, top_k))
+                print("-" * 60)
+                print(result)
+                print("-" * 60)
+                continue
+
+            result = cache.get(query, current_mode) if cache else None
+            if result is None:
+                result = await timed_query(rag, query, current_mode)
+                if cache:
+                    cache.put(query, current_mode, result)
             print("-" * 60)
             print(result)
             print("-" * 60)
 
     finally:
+        if cache:
+            cache.close()
         await rag.finalize_storages()
+        if metrics_summary:
+            metrics.print_summary()
         print("\nGoodbye!")
 
 
-async def single_query(query: str, storage_dir: Path, mode: str = "hybrid"):
+def read_batch_queries(queries_file: str, default_mode: str) -> list:
+    """Parse a JSONL query file ("-" for stdin) into request dicts."""
+    if queries_file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(queries_file).read_text(encoding="utf-8").splitlines()
+
+    requests = []
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        request = {"id": line_num, "mode": default_mode}
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError as e:
+            request["error"] = f"Invalid JSON: {e}"
+            requests.append(request)
+            continue
+
+        if isinstance(entry, str):
+            entry = {"query": entry}
+        if not isinstance(entry, dict) or not str(entry.get("query") or "").strip():
+            request["error"] = "Missing query"
+        else:
+            request.update(entry)
+            request["query"] = str(entry["query"]).strip()
+            if request["mode"] not in SEARCH_MODES:
+                request["error"] = f"Invalid mode: {request['mode']}"
+        requests.append(request)
+    return requests
+
+
+async def batch_search(queries_file: str, storage_dir: Path, mode: str = "hybrid",
+                       concurrency: int = 4, output: str = None, use_cache: bool = True,
+                       metrics_summary: bool = False, context_only: bool = False,
+                       top_k: int = DEFAULT_TOP_K) -> int:
+    """
+    Answer a JSONL file of queries on one loaded LightRAG instance.
+
+    At most `concurrency` queries run at once. Each result is written as soon
+    as it completes, with the query's id, mode, answer or error and latency;
+    with context_only the answer is the list of top_k ranked chunks.
+    Returns the number of failed queries.
+    """
+    import asyncio
+    from contextlib import redirect_stdout
+
+    from lightrag import LightRAG, QueryParam
+
+    from vector_store import get_vector_storage
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY not set.", file=sys.stderr)
+        return 1
+
+    if not storage_dir.exists():
+        print(f"Error: No indexed data found at {storage_dir}. Run index_pdfs.py first.",
+              file=sys.stderr)
+        return 1
+
+    requests = read_batch_queries(queries_file, mode)
+
+    metrics = get_metrics()
+    with metrics.stage("storage_load"):
+        rag = LightRAG(
+            **store_location(storage_dir),
+            embedding_func=get_embedding_func(),
+            llm_model_func=get_llm_func(),
+            tokenizer=get_tokenizer(),
+            vector_storage=get_vector_storage(storage_dir),
+        )
+        await rag.initialize_storages()
+    cache = QueryCache(storage_dir, get_index_generation(storage_dir)) if use_cache else None
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    out = open(output, "w", encoding="utf-8") if output else sys.stdout
+    lexical = LexicalIndex(storage_dir)
+    if not lexical.exists() and any(request["mode"] == "lexical" for request in requests):
+        with metrics.stage("lexical_build"):
+            lexical.update()
+
+    async def run(request: dict) -> dict:
+        mode = "context" if context_only and request["mode"] != "lexical" else request["mode"]
+        result = {"id": request["id"], "query": request.get("query"), "mode": mode,
+                  "answer": None, "error": request.get("error"), "cached": False,
+                  "latency_ms": 0.0}
+        if result["error"]:
+            return result
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                cache_mode = f"context:{top_k}" if context_only else request["mode"]
+                cached = None
+                if cache and mode != "lexical":
+                    cached = cache.get(request["query"], cache_mode)
+                result["cached"] = cached is not None
+                if mode == "lexical":
+                    with metrics.stage("lexical"):
+                        answer = lexical.search(request["query"], top_k)
+                elif cached is not None:
+                    metrics.count("query_cache_hits")
+                    answer = json.loads(cached) if context_only else cached
+                elif context_only:
+                    answer = await retrieve_chunks(rag, request["query"], top_k)
+                    if cache:
+                        cache.put(request["query"], cache_mode, json.dumps(answer))
+                else:
+                    # Queries overlap, so time each as a whole rather than
+                    # splitting retrieval from generation as timed_query does
+                    with metrics.stage("query", mode=request["mode"]):
+                        answer = await rag.aquery(
+                            request["query"], param=QueryParam(mode=request["mode"])
+                        )
+                    if cache:
+                        cache.put(request["query"], cache_mode, answer)
+                result["answer"] = answer
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    failed = 0
+    start = time.perf_counter()
+    try:
+        for next_result in asyncio.as_completed([run(request) for request in requests]):
+            result = await next_result
+            failed += result["error"] is not None
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if output:
+            out.close()
+        if cache:
+            cache.close()
+        await rag.finalize_storages()
+
+    elapsed = time.perf_counter() - start
+    print(f"Answered {len(requests) - failed}/{len(requests)} queries in {elapsed:.2f}s "
+          f"({failed} failed)", file=sys.stderr)
+    if metrics_summary:
+        # Keep stdout pure JSONL when results go there
+        with redirect_stdout(sys.stderr):
+            metrics.print_summary()
+    return failed
+
+
+async def single_query(query: str, storage_dir: Path, mode: str = "hybrid",
+                       use_server: bool = True, use_cache: bool = True,
+                       metrics_summary: bool = False, context_only: bool = False,
+                       top_k: int = DEFAULT_TOP_K, as_json: bool = False):
     """Single query mode for CLI usage."""
-    result = await search(query, storage_dir, mode)
+    result = await search(query, storage_dir, mode, use_server=use_server, use_cache=use_cache,
+                          context_only=context_only, top_k=top_k, as_json=as_json)
     print(result)
+    if metrics_summary:
+        get_metrics().print_summary()
 
 
 def main():
@@ -214,7 +696,7 @@ def main():
     )
     parser.add_argument(
         "--mode", "-m",
-        choices=["naive", "local", "global", "hybrid"],
+        choices=SEARCH_MODES,
         default="hybrid",
         help="Search mode (default: hybrid)"
     )
@@ -224,15 +706,96 @@ def main():
         default=os.getenv("PDF_RESEARCH_STORAGE", "./rag_storage"),
         help="Directory containing the RAG index"
     )
+    parser.add_argument(
+        "--no-server",
+        action="store_true",
+        help="Always load storages in-process, even if a query server is running"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the query result cache"
+    )
+    parser.add_argument(
+        "--context-only",
+        action="store_true",
+        help="Return the top-k ranked passages instead of a generated answer"
+    )
+    parser.add_argument(
+        "--top-k", "-k",
+        type=int,
+        default=DEFAULT_TOP_K,
+        help=f"Passages returned with --context-only or --mode lexical (default: {DEFAULT_TOP_K})"
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print --context-only or lexical passages as JSON"
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="QUERIES_JSONL",
+        help="Answer every query in this JSONL file ('-' for stdin) and write JSONL results"
+    )
+    parser.add_argument(
+        "--concurrency", "-c",
+        type=int,
+        default=4,
+        help="Queries answered at once in batch mode (default: 4)"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        help="Write batch results to this file instead of stdout"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        help="Append storage load, retrieval and generation timings to this JSONL file"
+    )
+    parser.add_argument(
+        "--metrics-summary",
+        action="store_true",
+        help="Print a table of stage timings and counters"
+    )
 
     args = parser.parse_args()
     storage_dir = Path(args.storage_dir).resolve()
 
-    if args.query:
-        query = " ".join(args.query)
-        asyncio.run(single_query(query, storage_dir, args.mode))
-    else:
-        asyncio.run(interactive_search(storage_dir))
+    import asyncio
+
+    metrics = start_metrics(Path(args.metrics_file) if args.metrics_file else None)
+    try:
+        if args.batch:
+            failed = asyncio.run(batch_search(
+                args.batch, storage_dir, args.mode,
+                concurrency=args.concurrency,
+                output=args.output,
+                use_cache=not args.no_cache,
+                metrics_summary=args.metrics_summary,
+                context_only=args.context_only,
+                top_k=max(1, args.top_k),
+            ))
+            sys.exit(1 if failed else 0)
+        elif args.query:
+            query = " ".join(args.query)
+            asyncio.run(single_query(
+                query, storage_dir, args.mode,
+                use_server=not args.no_server,
+                use_cache=not args.no_cache,
+                metrics_summary=args.metrics_summary,
+                context_only=args.context_only,
+                top_k=max(1, args.top_k),
+                as_json=args.json,
+            ))
+        else:
+            asyncio.run(interactive_search(
+                storage_dir, use_cache=not args.no_cache,
+                metrics_summary=args.metrics_summary,
+                context_only=args.context_only,
+                top_k=max(1, args.top_k),
+            ))
+    finally:
+        metrics.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+"""
+Sharded Storage
+Named collections under one root directory, each an independent LightRAG
+store, so a search loads only the collections it asks for.
+
+Shards are configured with `pdf_research.py config`:
+
+    config --shard-root ~/rag --shard papers=~/pdfs/papers --shard specs='*spec*.pdf'
+
+Each shard lives in <shard_root>/<name>. A rule is a folder (the PDF lies
+anywhere under it) or, if it contains a wildcard, a pattern matched against
+the PDF's file name and full path. `index` routes every PDF to the first
+shard with a matching rule, in configuration order, and the rest to the
+"default" shard.
+
+Searches fan out to the selected shards concurrently and merge their results
+(see search.py): ranked chunks are merged by score, and for answers the
+entities, relations and chunks each shard retrieves are interleaved by rank
+into one context, so one completion answers from all of them.
+"""
+
+import fnmatch
+import re
+from pathlib import Path
+
+DEFAULT_SHARD = "default"
+
+_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+_WILDCARDS = set("*?[")
+
+
+def shards_enabled(config: dict) -> bool:
+    return bool(config.get("shard_root"))
+
+
+def shard_dir(config: dict, name: str) -> Path:
+    return Path(config["shard_root"]).expanduser() / name
+
+
+def shard_names(config: dict) -> list:
+    """Configured shards in routing order, then the default shard."""
+    names = list(config.get("shards", {}))
+    if DEFAULT_SHARD not in names:
+        names.append(DEFAULT_SHARD)
+    return names
+
+
+def parse_shard(spec: str) -> tuple:
+    """
+    Parse "name=rule[,rule...]" into (name, rules).
+
+    Folder rules are made absolute; raises ValueError for a bad name.
+    """
+    name, _, rules = spec.partition("=")
+    name = name.strip()
+    if not _NAME.match(name):
+        raise ValueError(f"Invalid shard name: {name!r} (use letters, digits, '.', '_' and '-')")
+    parsed = []
+    for rule in rules.split(","):
+        rule = rule.strip()
+        if not rule:
+            continue
+        if not _WILDCARDS & set(rule):
+            rule = str(Path(rule).expanduser().resolve())
+        parsed.append(rule)
+    return name, parsed
+
+
+def matches(pdf_path: Path, rule: str) -> bool:
+    """Whether a folder or wildcard rule selects a PDF."""
+    if _WILDCARDS & set(rule):
+        return fnmatch.fnmatch(pdf_path.name, rule) or fnmatch.fnmatch(str(pdf_path), rule)
+    return Path(rule) in pdf_path.parents
+
+
+def route(pdf_path: Path, config: dict) -> str:
+    """Name of the shard a PDF is indexed into."""
+    for name, rules in config.get("shards", {}).items():
+        if any(matches(pdf_path, rule) for rule in rules):
+            return name
+    return DEFAULT_SHARD
+
+
+def route_files(pdf_files: list, config: dict) -> dict:
+    """Map every shard name (in routing order) to the PDFs routed to it."""
+    routes = {name: [] for name in shard_names(config)}
+    for pdf_path in pdf_files:
+        routes[route(pdf_path, config)].append(pdf_path)
+    return routes
+
+
+def select_shards(config: dict, names: list = None) -> dict:
+    """
+    Storage directories of the named shards, or of every indexed shard.
+
+    Raises ValueError for a name that is not configured.
+    """
+    known = shard_names(config)
+    if names:
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            raise ValueError(f"Unknown shard: {', '.join(unknown)} (configured: {', '.join(known)})")
+        return {name: shard_dir(config, name) for name in dict.fromkeys(names)}
+    return {name: shard_dir(config, name) for name in known if shard_dir(config, name).exists()}
+
+
+def merge_chunks(results: dict, top_k: int) -> list:
+    """
+    Merge per-shard ranked chunk lists by score into one top_k list.
+
+    Each chunk gains a "shard" field and is re-ranked.
+    """
+    merged = [
+        dict(chunk, shard=name) for name, chunks in results.items() for chunk in chunks
+    ]
+    merged.sort(key=lambda chunk: chunk["score"], reverse=True)
+    for rank, chunk in enumerate(merged[:top_k], 1):
+        chunk["rank"] = rank
+    return merged[:top_k]
+
+
+def interleave(lists: list, limit: int) -> list:
+    """Round-robin merge of ranked lists: every list's first items come first."""
+    merged = []
+    for depth in range(max((len(items) for items in lists), default=0)):
+        for items in lists:
+            if depth < len(items):
+                merged.append(items[depth])
+    return merged[:limit]
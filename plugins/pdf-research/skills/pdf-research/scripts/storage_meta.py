@@ -0,0 +1,247 @@
+"""
+Storage Metadata Sidecar
+Small summary of a RAG storage directory for status and listing commands.
+
+The indexer writes pdf_research_meta.json after every run with document,
+chunk and entity counts, the indexed document names, sizes and knowledge-graph
+coverage, the last index time and a generation counter that changes whenever
+the indexed content does. `status`, the interactive `/docs` and `/info`
+commands and the post-index summary read only this file instead of loading
+the LightRAG key-value stores. Stores without a sidecar fall back to
+streaming scans that never hold a whole JSON file in memory.
+
+The recorded size covers the index alone; the caches kept beside it grow with
+use rather than with the indexed content and are measured separately.
+
+lock_storage() keeps an indexing run and a background enrichment run from
+writing the same store at once.
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: runs are not serialized
+    fcntl = None
+
+META_FILE = "pdf_research_meta.json"
+META_VERSION = 1
+LOCK_FILE = ".index.lock"
+
+# Files in a storage directory that are caches, logs or run state, not index
+CACHE_FILES = ("kv_store_llm_response_cache.json", "enrich.log", "index_journal.jsonl", LOCK_FILE)
+CACHE_PREFIXES = ("query_cache.sqlite",)  # with its -journal/-wal/-shm files
+
+DOCS_FILE = "kv_store_full_docs.json"
+CHUNKS_FILE = "kv_store_text_chunks.json"
+ENTITIES_FILE = "kv_store_full_entities.json"
+
+_READ_SIZE = 1024 * 1024
+_STRUCTURAL = re.compile(rb'["{}\[\]:]')
+_DOCUMENT_HEADER = re.compile(rb'"\[Document: ((?:[^\]"\\]|\\.)*)\]')
+
+
+def count_json_keys(path: Path) -> int:
+    """
+    Count the top-level keys of a JSON object file without parsing it.
+
+    Reads the file in fixed-size blocks and tracks only string and nesting
+    state, counting the colons that sit directly inside the outer object.
+    """
+    if not path.exists():
+        return 0
+
+    depth = 0
+    count = 0
+    in_string = False
+    escaped = False
+
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(_READ_SIZE)
+            if not block:
+                break
+            pos = 0
+            end = len(block)
+            next_backslash = -1
+            while pos < end:
+                if in_string:
+                    if escaped:
+                        escaped = False
+                        pos += 1
+                        continue
+                    quote = block.find(b'"', pos)
+                    if next_backslash < pos:
+                        next_backslash = block.find(b"\\", pos)
+                        if next_backslash == -1:
+                            next_backslash = end
+                    if next_backslash < end and (quote == -1 or next_backslash < quote):
+                        # Skip the escaped character, which may be in the next block
+                        pos = next_backslash + 2
+                        if pos > end:
+                            escaped = True
+                        continue
+                    if quote == -1:
+                        break
+                    in_string = False
+                    pos = quote + 1
+                else:
+                    match = _STRUCTURAL.search(block, pos)
+                    if not match:
+                        break
+                    char = match.group()
+                    pos = match.end()
+                    if char == b'"':
+                        in_string = True
+                    elif char in b"{[":
+                        depth += 1
+                    elif char in b"}]":
+                        depth -= 1
+                    elif depth == 1:
+                        count += 1
+
+    return count
+
+
+def scan_document_names(path: Path) -> list:
+    """Stream the full-docs store and collect `[Document: name]` headers."""
+    if not path.exists():
+        return []
+
+    names = []
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(_READ_SIZE)
+            if not block:
+                break
+            data = tail + block
+            last_end = 0
+            for match in _DOCUMENT_HEADER.finditer(data):
+                try:
+                    names.append(json.loads(b'"' + match.group(1) + b'"'))
+                except ValueError:
+                    pass
+                last_end = match.end()
+            # Keep enough of the block to catch a header split across reads
+            tail = data[max(last_end, len(data) - 4096):]
+    return names
+
+
+def is_cache_file(name: str) -> bool:
+    return name in CACHE_FILES or name.startswith(CACHE_PREFIXES)
+
+
+def get_storage_size(storage_dir: Path) -> int:
+    """Size in bytes of the index files in the storage directory, caches excluded."""
+    return sum(f.stat().st_size for f in storage_dir.glob("*")
+               if f.is_file() and not is_cache_file(f.name))
+
+
+def get_cache_size(storage_dir: Path) -> int:
+    """Size in bytes of the caches and logs kept in the storage directory."""
+    return sum(f.stat().st_size for f in storage_dir.glob("*")
+               if f.is_file() and is_cache_file(f.name))
+
+
+def get_index_generation(storage_dir: Path) -> int:
+    """Index generation from the sidecar (0 if the store has none)."""
+    try:
+        with open(storage_dir / META_FILE) as f:
+            return json.load(f).get("generation", 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def lock_storage(storage_dir: Path) -> Optional[object]:
+    """
+    Take the storage directory's writer lock without waiting.
+
+    Returns the open lock file, which holds the lock until it is closed (or
+    the process exits), or None if another run holds it.
+    """
+    lock_file = open(storage_dir / LOCK_FILE, "a")
+    if fcntl:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+    return lock_file
+
+
+def write_storage_meta(storage_dir: Path, manifest, changed: bool = True) -> dict:
+    """
+    Recompute the sidecar after an indexing run and write it atomically.
+
+    The generation is bumped when `changed` is set, i.e. when documents were
+    added or removed during the run.
+    """
+    generation = get_index_generation(storage_dir)
+    if changed:
+        generation += 1
+
+    documents = [
+        {"name": entry["name"], "size": entry["size"], "doc_ids": entry["doc_ids"],
+         "enriched": not entry.get("vector_only")}
+        for entry in manifest.files.values()
+    ]
+    documents.sort(key=lambda doc: doc["name"])
+
+    meta = {
+        "version": META_VERSION,
+        "last_indexed": datetime.now().isoformat(timespec="seconds"),
+        "generation": generation,
+        "documents": len(documents),
+        # Large PDFs are indexed as several LightRAG documents (segments)
+        "segments": count_json_keys(storage_dir / DOCS_FILE),
+        "chunks": count_json_keys(storage_dir / CHUNKS_FILE),
+        "entities": count_json_keys(storage_dir / ENTITIES_FILE),
+        "storage_size_bytes": get_storage_size(storage_dir),
+        "document_list": documents,
+    }
+
+    meta_path = storage_dir / META_FILE
+    tmp_path = meta_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+    return meta
+
+
+def read_storage_meta(storage_dir: Path) -> dict:
+    """
+    Read the sidecar for a storage directory.
+
+    Falls back to streaming counts (and the document names found in the
+    full-docs store) when the store was indexed before the sidecar existed.
+    """
+    meta_path = storage_dir / META_FILE
+    if meta_path.exists():
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("version") == META_VERSION:
+                return meta
+        except (OSError, ValueError):
+            pass
+
+    # Every segment of a PDF carries its name, so list each name once
+    names = list(dict.fromkeys(scan_document_names(storage_dir / DOCS_FILE)))
+    segments = count_json_keys(storage_dir / DOCS_FILE)
+    return {
+        "version": META_VERSION,
+        "last_indexed": None,
+        "generation": 0,
+        "documents": len(names) or segments,
+        "segments": segments,
+        "chunks": count_json_keys(storage_dir / CHUNKS_FILE),
+        "entities": count_json_keys(storage_dir / ENTITIES_FILE),
+        "storage_size_bytes": get_storage_size(storage_dir) if storage_dir.exists() else 0,
+        "document_list": [{"name": name, "size": None, "doc_ids": []} for name in names],
+    }
@@ -0,0 +1,115 @@
+"""
+Page Text Cleaning
+Removes running headers, footers, page and line numbers and layout noise from
+extracted PDF pages before they are chunked.
+
+PyMuPDF returns every text block on a page, so a report's title line, its
+"Confidential" footer and the page number are repeated in every chunk and paid
+for in every embedding and extraction prompt. clean_pages() looks at the
+blocks of a window of pages together:
+
+- blocks in the top or bottom MARGIN of the page whose text (with digits
+  ignored) recurs on at least REPEAT_RATIO of the window's pages are running
+  headers or footers
+- margin blocks that are only a page number ("12", "Page 3 of 40", "iv")
+- blocks in the left or right margin that are only numbers (line numbering)
+
+The remaining text has words hyphenated across line breaks joined and runs of
+spaces and blank lines collapsed. Removed block text is returned alongside, so
+the indexer can report what cleaning saved.
+"""
+
+import math
+import re
+
+# Share of the page height treated as the header and footer bands, and of the
+# width treated as the side margins that hold line numbers
+MARGIN = 0.08
+SIDE_MARGIN = 0.12
+REPEAT_RATIO = 0.5
+MIN_REPEAT_PAGES = 2
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_PAGE_NUMBER = re.compile(
+    r"^(?:page\s*)?(?:\d+|[ivxlcdm]+)(?:\s*(?:of|/)\s*\d+)?$|^[-–—]\s*\d+\s*[-–—]$",
+    re.IGNORECASE,
+)
+_NUMBERS_ONLY = re.compile(r"^[\d\s]+$")
+_HYPHENATED = re.compile(r"([a-z])-\n([a-z])")
+
+
+def page_blocks(page) -> dict:
+    """
+    Text blocks of a PyMuPDF page with their position, in reading order.
+
+    Joining the block texts gives exactly page.get_text().
+    """
+    rect = page.rect
+    blocks = [
+        (x0, y0, x1, y1, text)
+        for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks")
+        if block_type == 0
+    ]
+    return {"width": rect.width, "height": rect.height, "blocks": blocks}
+
+
+def raw_text(page: dict) -> str:
+    """Uncleaned page text from page_blocks() output."""
+    return "".join(block[4] for block in page["blocks"])
+
+
+def margin_key(text: str) -> str:
+    """Block text with digits and spacing ignored, so "Page 3" matches "Page 4"."""
+    return _SPACES.sub(" ", _DIGITS.sub("#", text.lower())).strip()
+
+
+def normalize_text(text: str) -> str:
+    """Join hyphenated line breaks and collapse runs of spaces and blank lines."""
+    text = _HYPHENATED.sub(r"\1\2", text)
+    lines = [_SPACES.sub(" ", line).strip() for line in text.split("\n")]
+    text = "\n".join(lines)
+    while "\n\n\n" in text:
+        text = text.replace("\n\n\n", "\n\n")
+    return text.strip() + "\n"
+
+
+def _in_margin(block, page) -> bool:
+    _, y0, _, y1, _ = block
+    band = page["height"] * MARGIN
+    return y1 <= band or y0 >= page["height"] - band
+
+
+def _is_line_numbers(block, page) -> bool:
+    x0, _, x1, _, text = block
+    side = page["width"] * SIDE_MARGIN
+    return (x1 <= side or x0 >= page["width"] - side) and bool(_NUMBERS_ONLY.match(text))
+
+
+def clean_pages(pages: list) -> list:
+    """
+    Clean a window of pages given as (page_num, page_blocks(page)).
+
+    Returns (page_num, text, removed) per page, where removed is the text of
+    the dropped blocks.
+    """
+    counts = {}
+    for _, page in pages:
+        for key in {margin_key(b[4]) for b in page["blocks"] if b[4].strip() and _in_margin(b, page)}:
+            counts[key] = counts.get(key, 0) + 1
+    min_pages = max(MIN_REPEAT_PAGES, math.ceil(len(pages) * REPEAT_RATIO))
+    repeated = {key for key, count in counts.items() if count >= min_pages}
+
+    cleaned = []
+    for page_num, page in pages:
+        kept, removed = [], []
+        for block in page["blocks"]:
+            text = block[4]
+            if not text.strip():
+                continue
+            noise = _is_line_numbers(block, page) or _in_margin(block, page) and (
+                margin_key(text) in repeated or _PAGE_NUMBER.match(text.strip())
+            )
+            (removed if noise else kept).append(text)
+        cleaned.append((page_num, normalize_text("".join(kept)) if kept else "", "".join(removed)))
+    return cleaned
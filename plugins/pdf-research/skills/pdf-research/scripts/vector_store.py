@@ -0,0 +1,522 @@
+"""
+Memory-Mapped Vector Storage for LightRAG
+Float32 vector matrices on disk, opened as memory maps and scored with NumPy.
+
+LightRAG's default NanoVectorDBStorage keeps each namespace (chunks, entities,
+relationships) in one JSON file with a base64 matrix. initialize_storages()
+decodes and normalizes every vector before the first query, and each commit
+re-encodes the whole matrix. MmapVectorStorage instead keeps, per namespace:
+
+- vdb_<namespace>.<generation>.f32: L2-normalized float32 rows, memory-mapped
+  read-only, so opening a store reads no vectors and the OS pages in only
+  what queries touch
+- vdb_<namespace>.<generation>.centroids.f32: IVF centroids, when the store
+  has an ANN index
+- vdb_<namespace>.mmap.json: row ids and metadata fields, the matrix file
+  name, the embedding dimension and the IVF list boundaries
+
+Queries take one matrix-vector product per block of rows and keep each
+block's best rows with argpartition. With the `vector_index: "ivf"` storage
+option the rows are grouped into the lists of an IVF index (ann_index.py)
+and a query scores only the lists nearest to it. Upserts and deletes are
+held in memory until index_done_callback(), which writes the live rows to a
+new generation file and then swaps the metadata file, so a crash leaves the
+last commit intact.
+
+get_vector_storage() registers the class with LightRAG and picks it for new
+stores; stores that still hold NanoVectorDB JSON keep using it until they are
+converted with `pdf_research.py migrate` (migrate_vector_storage()).
+"""
+
+import asyncio
+import base64
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+from lightrag.base import BaseVectorStorage
+from lightrag.utils import compute_mdhash_id
+
+from ann_index import DEFAULT_NPROBE, IVF_MIN_ROWS, IVFIndex, partition
+
+VECTOR_STORAGE = "MmapVectorStorage"
+NANO_STORAGE = "NanoVectorDBStorage"
+META_VERSION = 1
+NAMESPACES = ("chunks", "entities", "relationships")
+
+# Rows scored per matrix product, bounding the temporary score array
+SCORE_BLOCK = 65536
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _meta_path(directory: str, namespace: str) -> str:
+    return os.path.join(directory, f"vdb_{namespace}.mmap.json")
+
+
+def _read_meta(directory: str, namespace: str) -> Optional[dict]:
+    meta_path = _meta_path(directory, namespace)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_meta(directory: str, namespace: str, meta: dict) -> None:
+    meta_path = _meta_path(directory, namespace)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def _data_files(meta: Optional[dict]) -> set:
+    """Matrix and centroid files a metadata file refers to."""
+    if not meta:
+        return set()
+    files = {meta.get("matrix")}
+    if meta.get("ivf"):
+        files.add(meta["ivf"]["centroids"])
+    return files - {None}
+
+
+def _open_ivf(directory: str, meta: dict, dim: int) -> Optional[IVFIndex]:
+    ivf = meta.get("ivf")
+    if not ivf:
+        return None
+    centroids = np.fromfile(os.path.join(directory, ivf["centroids"]), dtype=np.float32)
+    return IVFIndex(centroids.reshape(-1, dim), ivf["offsets"], ivf["nprobe"],
+                    trained_rows=ivf["trained_rows"])
+
+
+def write_vector_files(directory: str, namespace: str, generation: int, dim: int,
+                       records: list, blocks, ivf: Optional[dict] = None) -> None:
+    """
+    Commit one namespace: write the rows, then atomically swap the metadata.
+
+    `blocks` yields float32 arrays of normalized rows in record order. `ivf`
+    is the IVF index from ann_index.partition() when the rows are grouped by
+    list, else the store is searched exactly.
+    """
+    matrix_name = f"vdb_{namespace}.{generation}.f32"
+    matrix_path = os.path.join(directory, matrix_name)
+    rows = 0
+    with open(matrix_path + ".tmp", "wb") as f:
+        for block in blocks:
+            np.ascontiguousarray(block, dtype=np.float32).tofile(f)
+            rows += len(block)
+        f.flush()
+        os.fsync(f.fileno())
+    if rows != len(records):
+        os.unlink(matrix_path + ".tmp")
+        raise ValueError(f"{namespace}: {rows} vectors for {len(records)} records")
+    os.replace(matrix_path + ".tmp", matrix_path)
+
+    ivf_meta = None
+    if ivf is not None:
+        centroids_name = f"vdb_{namespace}.{generation}.centroids.f32"
+        np.ascontiguousarray(ivf["centroids"], dtype=np.float32).tofile(
+            os.path.join(directory, centroids_name))
+        ivf_meta = {
+            "centroids": centroids_name,
+            "nprobe": ivf["nprobe"],
+            "trained_rows": ivf["trained_rows"],
+            "offsets": ivf["offsets"],
+        }
+
+    previous = _data_files(_read_meta(directory, namespace))
+    meta = {
+        "version": META_VERSION,
+        "generation": generation,
+        "embedding_dim": dim,
+        "matrix": matrix_name,
+        "ivf": ivf_meta,
+        "data": records,
+    }
+    _write_meta(directory, namespace, meta)
+
+    for name in previous - _data_files(meta):
+        try:
+            os.unlink(os.path.join(directory, name))
+        except OSError:
+            pass  # already gone, or still mapped on Windows
+
+
+@dataclass
+class MmapVectorStorage(BaseVectorStorage):
+    """LightRAG vector storage backed by a memory-mapped float32 matrix."""
+
+    def __post_init__(self):
+        self._validate_embedding_func()
+        kwargs = self.global_config.get("vector_db_storage_cls_kwargs", {})
+        threshold = kwargs.get("cosine_better_than_threshold")
+        if threshold is not None:
+            self.cosine_better_than_threshold = threshold
+        # "exact" or "ivf" from the config; None keeps what the store has
+        self._vector_index = kwargs.get("vector_index")
+        self._nprobe = kwargs.get("ann_nprobe")
+
+        directory = self.global_config["working_dir"]
+        if self.workspace:
+            directory = os.path.join(directory, self.workspace)
+        os.makedirs(directory, exist_ok=True)
+        self._dir = directory
+        self._dim = self.embedding_func.embedding_dim
+        self._batch_size = self.global_config.get("embedding_batch_num", 32)
+        self._lock = asyncio.Lock()
+        self._load()
+
+    def _load(self):
+        """Open the committed matrix and metadata; nothing pending."""
+        self._generation = 0
+        self._records = []
+        self._matrix = np.empty((0, self._dim), dtype=np.float32)
+        self._ivf = None
+        meta = _read_meta(self._dir, self.namespace)
+        if meta:
+            meta_path = _meta_path(self._dir, self.namespace)
+            if meta["embedding_dim"] != self._dim:
+                raise ValueError(
+                    f"{meta_path}: stored vectors have {meta['embedding_dim']} dimensions, "
+                    f"the embedding model has {self._dim}"
+                )
+            self._generation = meta["generation"]
+            self._records = meta["data"]
+            if self._records:
+                matrix_path = os.path.join(self._dir, meta["matrix"])
+                self._matrix = np.memmap(matrix_path, dtype=np.float32, mode="r")
+                self._matrix = self._matrix.reshape(-1, self._dim)
+                if len(self._matrix) != len(self._records):
+                    raise ValueError(
+                        f"{matrix_path}: {len(self._matrix)} rows for {len(self._records)} records"
+                    )
+            self._ivf = _open_ivf(self._dir, meta, self._dim)
+        self._committed = len(self._records)
+        self._row_of = {record["__id__"]: row for row, record in enumerate(self._records)}
+        self._dead = set()
+        self._pending = []
+        self._pending_matrix = None
+        self._dirty = False
+
+    def _live_rows(self):
+        return (row for row in range(len(self._records)) if row not in self._dead)
+
+    def _pending_rows(self) -> np.ndarray:
+        """Rows upserted since the last commit, as one array."""
+        if self._pending_matrix is None:
+            self._pending_matrix = (
+                np.vstack(self._pending) if self._pending
+                else np.empty((0, self._dim), dtype=np.float32)
+            )
+            self._pending = [self._pending_matrix] if self._pending else []
+        return self._pending_matrix
+
+    def _vector(self, row: int) -> np.ndarray:
+        if row < self._committed:
+            return np.array(self._matrix[row])
+        return self._pending_rows()[row - self._committed]
+
+    def _remove(self, doc_id: str) -> bool:
+        row = self._row_of.pop(doc_id, None)
+        if row is None:
+            return False
+        self._dead.add(row)
+        self._dirty = True
+        return True
+
+    @staticmethod
+    def _format(record: dict) -> dict:
+        return {
+            **{k: v for k, v in record.items() if not k.startswith("__")},
+            "id": record["__id__"],
+            "created_at": record.get("__created_at__"),
+        }
+
+    async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
+        if not data:
+            return
+        now = int(time.time())
+        records = [
+            {
+                "__id__": doc_id,
+                "__created_at__": now,
+                **{k: v for k, v in fields.items() if k in self.meta_fields},
+            }
+            for doc_id, fields in data.items()
+        ]
+        contents = [fields["content"] for fields in data.values()]
+        batches = [contents[i:i + self._batch_size]
+                   for i in range(0, len(contents), self._batch_size)]
+        embeddings = await asyncio.gather(*[self.embedding_func(batch, context="document")
+                                            for batch in batches])
+        vectors = _normalize(np.concatenate(embeddings))
+
+        async with self._lock:
+            for record in records:
+                self._remove(record["__id__"])
+                self._row_of[record["__id__"]] = len(self._records)
+                self._records.append(record)
+            self._pending.append(vectors)
+            self._pending_matrix = None
+            self._dirty = True
+
+    async def query(self, query: str, top_k: int,
+                    query_embedding: list[float] = None) -> list[dict[str, Any]]:
+        if query_embedding is None:
+            query_embedding = (await self.embedding_func([query], context="query"))[0]
+        query_vector = _normalize(np.asarray(query_embedding, dtype=np.float32))
+
+        async with self._lock:
+            dead = np.fromiter(self._dead, dtype=np.int64, count=len(self._dead))
+            candidates_rows, candidates_scores = [], []
+
+            def keep_best(rows, scores):
+                scores[np.isin(rows, dead)] = -np.inf
+                if len(scores) > top_k:
+                    best = np.argpartition(-scores, top_k)[:top_k]
+                else:
+                    best = np.arange(len(scores))
+                candidates_rows.append(rows[best])
+                candidates_scores.append(scores[best])
+
+            if self._ivf is not None:
+                rows = self._ivf.candidates(query_vector)
+                keep_best(rows, self._matrix[rows] @ query_vector)
+                # Rows upserted since the last commit are not in the index yet
+                matrices = [(self._committed, self._pending_rows())]
+            else:
+                matrices = [(0, self._matrix), (self._committed, self._pending_rows())]
+            for offset, matrix in matrices:
+                for start in range(0, len(matrix), SCORE_BLOCK):
+                    scores = matrix[start:start + SCORE_BLOCK] @ query_vector
+                    keep_best(np.arange(offset + start, offset + start + len(scores)), scores)
+            if not candidates_rows:
+                return []
+            rows = np.concatenate(candidates_rows)
+            scores = np.concatenate(candidates_scores)
+            order = np.argsort(-scores)[:top_k]
+            results = []
+            for row, score in zip(rows[order], scores[order]):
+                if score < self.cosine_better_than_threshold:
+                    break
+                results.append({**self._format(self._records[row]), "distance": float(score)})
+            return results
+
+    async def delete(self, ids: list[str]):
+        async with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    async def delete_entity(self, entity_name: str) -> None:
+        await self.delete([compute_mdhash_id(entity_name, prefix="ent-")])
+
+    async def delete_entity_relation(self, entity_name: str) -> None:
+        async with self._lock:
+            related = [
+                doc_id for doc_id, row in self._row_of.items()
+                if entity_name in (self._records[row].get("src_id"),
+                                   self._records[row].get("tgt_id"))
+            ]
+            for doc_id in related:
+                self._remove(doc_id)
+
+    async def get_by_id(self, id: str) -> Optional[dict[str, Any]]:
+        row = self._row_of.get(id)
+        return None if row is None else self._format(self._records[row])
+
+    async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
+        return [await self.get_by_id(doc_id) for doc_id in ids]
+
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, list[float]]:
+        async with self._lock:
+            return {
+                doc_id: self._vector(self._row_of[doc_id]).tolist()
+                for doc_id in ids if doc_id in self._row_of
+            }
+
+    @property
+    async def client_storage(self):
+        """Live records in NanoVectorDB's storage shape (without vectors)."""
+        return {
+            "embedding_dim": self._dim,
+            "data": [self._records[row] for row in self._live_rows()],
+        }
+
+    async def index_done_callback(self) -> bool:
+        async with self._lock:
+            if not self._dirty:
+                return True
+            live = np.fromiter(self._live_rows(), dtype=np.int64)
+            pending = self._pending_rows()
+            committed = self._matrix
+            first_pending = self._committed
+
+            def read_rows(rows):
+                old = rows < first_pending
+                vectors = np.empty((len(rows), self._dim), dtype=np.float32)
+                vectors[old] = committed[rows[old]]
+                vectors[~old] = pending[rows[~old] - first_pending]
+                return vectors
+
+            vector_index = self._vector_index or ("ivf" if self._ivf is not None else "exact")
+            ivf = None
+            if vector_index == "ivf" and len(live) >= IVF_MIN_ROWS:
+                previous = known = None
+                if self._ivf is not None:
+                    previous = {"centroids": self._ivf.centroids,
+                                "trained_rows": self._ivf.trained_rows}
+                    known = np.full(len(live), -1, dtype=np.int32)
+                    old = live < first_pending
+                    known[old] = self._ivf.list_of(live[old])
+                nprobe = self._nprobe or (self._ivf.nprobe if self._ivf else DEFAULT_NPROBE)
+                order, ivf = partition(lambda positions: read_rows(live[positions]),
+                                       len(live), nprobe, previous, known)
+                live = live[order]
+            records = [self._records[row] for row in live]
+
+            def blocks():
+                for start in range(0, len(live), SCORE_BLOCK):
+                    yield read_rows(live[start:start + SCORE_BLOCK])
+
+            write_vector_files(self._dir, self.namespace, self._generation + 1, self._dim,
+                               records, blocks(), ivf)
+            self._load()
+            return True
+
+    async def finalize(self):
+        await self.index_done_callback()
+
+    async def drop(self) -> dict[str, str]:
+        async with self._lock:
+            try:
+                meta = _read_meta(self._dir, self.namespace)
+                if meta:
+                    os.unlink(_meta_path(self._dir, self.namespace))
+                    for name in _data_files(meta):
+                        if os.path.exists(os.path.join(self._dir, name)):
+                            os.unlink(os.path.join(self._dir, name))
+                self._load()
+                return {"status": "success", "message": "data dropped"}
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+
+
+def register_vector_storage():
+    """Make MmapVectorStorage selectable by name in LightRAG(vector_storage=...)."""
+    from lightrag import kg
+
+    implementations = kg.STORAGE_IMPLEMENTATIONS["VECTOR_STORAGE"]["implementations"]
+    if VECTOR_STORAGE not in implementations:
+        implementations.append(VECTOR_STORAGE)
+    kg.STORAGE_ENV_REQUIREMENTS.setdefault(VECTOR_STORAGE, [])
+    kg.STORAGES[VECTOR_STORAGE] = __name__
+
+
+def get_vector_storage(storage_dir: Path) -> str:
+    """Vector storage for a store: NanoVectorDB JSON until migrated, else mmap."""
+    register_vector_storage()
+    has_json = any((storage_dir / f"vdb_{ns}.json").exists() for ns in NAMESPACES)
+    has_mmap = any((storage_dir / f"vdb_{ns}.mmap.json").exists() for ns in NAMESPACES)
+    return NANO_STORAGE if has_json and not has_mmap else VECTOR_STORAGE
+
+
+def migrate_vector_storage(storage_dir: Path, keep_json: bool = False) -> dict:
+    """
+    Convert a store's NanoVectorDB JSON files to the memory-mapped format.
+
+    Returns {namespace: rows converted}. The JSON files are removed once
+    every namespace is written, unless keep_json is set.
+    """
+    migrated = {}
+    converted = []
+    for namespace in NAMESPACES:
+        json_path = storage_dir / f"vdb_{namespace}.json"
+        if not json_path.exists():
+            continue
+        with open(json_path, encoding="utf-8") as f:
+            storage = json.load(f)
+        dim = storage["embedding_dim"]
+        matrix = np.frombuffer(base64.b64decode(storage["matrix"]), dtype=np.float32)
+        matrix = matrix.reshape(-1, dim)
+        # Keep the id, timestamp and metadata fields, not NanoVectorDB internals
+        records = [
+            {k: v for k, v in record.items()
+             if k in ("__id__", "__created_at__") or not k.startswith("__") and k != "vector"}
+            for record in storage["data"]
+        ]
+        del storage
+
+        def blocks():
+            for start in range(0, len(matrix), SCORE_BLOCK):
+                yield _normalize(matrix[start:start + SCORE_BLOCK])
+
+        write_vector_files(str(storage_dir), namespace, 1, dim, records, blocks())
+        migrated[namespace] = len(records)
+        converted.append(json_path)
+
+    if not keep_json:
+        for json_path in converted:
+            json_path.unlink()
+    return migrated
+
+
+def load_vector_matrix(storage_dir: Path, namespace: str) -> tuple:
+    """(metadata, memory-mapped matrix, IVF index or None) of one namespace."""
+    directory = str(storage_dir)
+    meta = _read_meta(directory, namespace)
+    if not meta or not meta["data"]:
+        return meta or {}, np.empty((0, 1), dtype=np.float32), None
+    matrix = np.memmap(os.path.join(directory, meta["matrix"]), dtype=np.float32, mode="r")
+    matrix = matrix.reshape(-1, meta["embedding_dim"])
+    return meta, matrix, _open_ivf(directory, meta, meta["embedding_dim"])
+
+
+def configure_vector_index(storage_dir: Path, vector_index: Optional[str] = None,
+                           nprobe: Optional[int] = None) -> dict:
+    """
+    Apply ANN settings to a store that is already indexed.
+
+    Builds the IVF index for namespaces that lack one, or drops it for
+    "exact", and updates nprobe in place. Returns {namespace: description}.
+    """
+    directory = str(storage_dir)
+    changes = {}
+    for namespace in NAMESPACES:
+        meta, matrix, index = load_vector_matrix(storage_dir, namespace)
+        if not meta:
+            continue
+        rows = len(meta["data"])
+        if vector_index == "ivf" and index is None:
+            if rows < IVF_MIN_ROWS:
+                changes[namespace] = f"{rows} vectors, searched exactly below {IVF_MIN_ROWS}"
+                continue
+            order, ivf = partition(lambda positions: np.asarray(matrix[positions]), rows,
+                                   nprobe or DEFAULT_NPROBE)
+            records = [meta["data"][row] for row in order]
+
+            def blocks():
+                for start in range(0, rows, SCORE_BLOCK):
+                    yield np.asarray(matrix[order[start:start + SCORE_BLOCK]])
+
+            write_vector_files(directory, namespace, meta["generation"] + 1,
+                               meta["embedding_dim"], records, blocks(), ivf)
+            changes[namespace] = f"IVF index built, {len(ivf['centroids'])} lists"
+        elif vector_index == "exact" and index is not None:
+            # The rows stay grouped by list; only the index is dropped
+            centroids = meta["ivf"]["centroids"]
+            meta["ivf"] = None
+            _write_meta(directory, namespace, meta)
+            os.unlink(os.path.join(directory, centroids))
+            changes[namespace] = "IVF index removed"
+        elif nprobe and index is not None and meta["ivf"]["nprobe"] != nprobe:
+            meta["ivf"]["nprobe"] = nprobe
+            _write_meta(directory, namespace, meta)
+            changes[namespace] = f"nprobe {nprobe}"
+    return changes
@@ -0,0 +1,298 @@
+"""
+Watch Mode
+Index PDFs as they land in the PDF directory, on long-lived LightRAG
+instances.
+
+`pdf_research.py watch` takes each store's writer lock and loads its storages
+once, catches up with the directory, then waits for file events: inotify on
+Linux, or a scan every POLL_INTERVAL seconds elsewhere (or with --poll).
+
+A new or changed PDF is indexed once it has settled: its size and
+modification time have not changed for SETTLE_SECONDS and it ends with a PDF
+trailer, so a file that is still being copied or downloaded is never parsed
+half written. Every round goes through index_files(), which skips unchanged
+PDFs, re-indexes changed ones and drops deleted ones, and bumps the index
+generation so query servers reload and the paper is searchable right away.
+The manifest, page signatures and lexical index stay loaded between rounds,
+and a round adds only its own chunks to the lexical index.
+
+With a shard root configured, PDFs are routed to shards as by `index` (see
+shards.py), and a shard's storages are loaded the first time a PDF goes there.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import signal
+import struct
+import time
+from pathlib import Path
+from typing import Optional
+
+from index_pdfs import index_files, open_rag
+from lightrag_compat import fast_index_unsupported
+from storage_meta import lock_storage
+
+SETTLE_SECONDS = 2.0
+POLL_INTERVAL = 1.0
+# A file that never shows a trailer is indexed anyway once it has been still this long
+TRAILER_TIMEOUT = 30.0
+
+# inotify(7) events: written, created, moved in or out, deleted
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+class StoreBusy(Exception):
+    """Another indexing or enrichment run holds a store's writer lock."""
+
+
+def is_pdf_name(name: str) -> bool:
+    # The same files `index` picks up with glob("*.pdf")
+    return name.endswith(".pdf")
+
+
+def has_trailer(pdf_path: Path) -> bool:
+    """Whether a file ends with the %%EOF marker of a completely written PDF."""
+    try:
+        with open(pdf_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1024))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+class InotifyWatcher:
+    """Names of PDFs written, moved or deleted in a directory, from Linux inotify."""
+
+    kind = "inotify"
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, str(directory).encode(), _WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Cannot watch {directory}")
+        self.loop = asyncio.get_running_loop()
+        self.readable = asyncio.Event()
+        self.loop.add_reader(self.fd, self.readable.set)
+
+    async def changes(self, timeout: Optional[float]) -> set:
+        """Names with events since the last call; empty after `timeout` seconds without any."""
+        try:
+            await asyncio.wait_for(self.readable.wait(), timeout)
+        except asyncio.TimeoutError:
+            return set()
+        self.readable.clear()
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT.unpack_from(data, offset)
+                start = offset + _EVENT.size
+                names.add(os.fsdecode(data[start:start + length].rstrip(b"\0")))
+                offset = start + length
+        return {name for name in names if is_pdf_name(name)}
+
+    def close(self):
+        self.loop.remove_reader(self.fd)
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Names of PDFs added, changed or removed between directory scans."""
+
+    kind = "polling"
+
+    def __init__(self, directory: Path, interval: float = POLL_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> dict:
+        files = {}
+        for pdf_path in self.directory.glob("*.pdf"):
+            try:
+                stat = pdf_path.stat()
+            except OSError:
+                continue
+            files[pdf_path.name] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    async def changes(self, timeout: Optional[float]) -> set:
+        """Names that differ from the previous scan, checked every interval."""
+        await asyncio.sleep(self.interval if timeout is None else min(self.interval, timeout))
+        snapshot = self._scan()
+        changed = {
+            name for name in snapshot.keys() | self.snapshot.keys()
+            if snapshot.get(name) != self.snapshot.get(name)
+        }
+        self.snapshot = snapshot
+        return {name for name in changed if is_pdf_name(name)}
+
+    def close(self):
+        pass
+
+
+def open_watcher(directory: Path, poll: bool = False):
+    """An inotify watcher where the platform has one, else a polling watcher."""
+    if not poll:
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError, TypeError):
+            # No inotify (macOS, Windows) or no watches left: scan instead
+            pass
+    return PollingWatcher(directory)
+
+
+def plan_stores(pdf_dir: Path, storage_dir: Path, shard_config: Optional[dict] = None) -> dict:
+    """Map each storage directory to the PDFs of `pdf_dir` that belong in it."""
+    pdf_files = sorted(pdf_dir.glob("*.pdf"))
+    if not shard_config:
+        return {storage_dir: pdf_files}
+
+    from shards import route_files, shard_dir
+
+    stores = {}
+    for name, files in route_files(pdf_files, shard_config).items():
+        path = shard_dir(shard_config, name)
+        if files or path.exists():
+            stores[path] = files
+    return stores
+
+
+async def watch(pdf_dir: Path, storage_dir: Path, workers: int, concurrency: int,
+                batch_size: int, segment_size: int, dedup_threshold: float,
+                clean: bool = True, fast: bool = False, replay_only: bool = False,
+                vector_index: Optional[str] = None, ann_nprobe: Optional[int] = None,
+                settle: float = SETTLE_SECONDS, poll: bool = False,
+                shard_config: Optional[dict] = None) -> int:
+    """
+    Keep the store (or the shards of `shard_config`) in sync with `pdf_dir`
+    until interrupted.
+
+    A PDF is indexed `settle` seconds after it last changed. Returns 1 if a
+    store is locked by another indexing run, else 0 once stopped.
+    """
+    unsupported = fast_index_unsupported() if fast else None
+    if unsupported:
+        print(f"Error: {unsupported}")
+        return 1
+
+    # storage_dir -> (rag, lock, manifest/signatures/lexical index kept by index_files)
+    opened = {}
+
+    async def index_round(changed: set, removed: bool, unsettled: set = frozenset()) -> dict:
+        results = {}
+        for path, files in plan_stores(pdf_dir, storage_dir, shard_config).items():
+            if not removed and not changed.intersection(f.name for f in files):
+                continue
+            # PDFs still being written keep their indexed version until they settle
+            keep = [f for f in files if f.name in unsettled]
+            files = [f for f in files if f.name not in unsettled]
+            if path not in opened:
+                path.mkdir(parents=True, exist_ok=True)
+                lock = lock_storage(path)
+                if lock is None:
+                    raise StoreBusy(f"another indexing or enrichment run is using {path}")
+                rag = await open_rag(path, concurrency, replay_only, vector_index, ann_nprobe)
+                opened[path] = (rag, lock, {})
+            if shard_config:
+                print(f"\nShard: {path.name} ({len(files)} PDFs)")
+            rag, _, loaded = opened[path]
+            results[path] = await index_files(
+                rag, pdf_dir, path, files, workers, batch_size,
+                segment_size, dedup_threshold, clean, fast, keep, loaded,
+            )
+        return results
+
+    try:
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, RuntimeError):
+        pass  # no signal handlers outside the main thread or on Windows
+
+    watcher = None
+    pending = {}  # name -> [(size, mtime_ns), still since, first seen]
+    try:
+        # Watch first so nothing that lands during the catch-up is missed
+        watcher = open_watcher(pdf_dir, poll)
+
+        # Catch up with what arrived while nobody was watching; files written
+        # in the last `settle` seconds may still be in progress and wait
+        now, wall = time.monotonic(), time.time()
+        for pdf_path in pdf_dir.glob("*.pdf"):
+            try:
+                recent = wall - pdf_path.stat().st_mtime < settle
+            except FileNotFoundError:
+                continue
+            if recent:
+                pending[pdf_path.name] = [None, now, now]
+        await index_round(set(), removed=True, unsettled=set(pending))
+
+        how = "inotify" if watcher.kind == "inotify" else f"polling every {watcher.interval:g}s"
+        print(f"\nWatching {pdf_dir} for new PDFs ({how}). Press Ctrl+C to stop.")
+
+        while True:
+            names = await watcher.changes(settle / 4 if pending else None)
+            now = time.monotonic()
+            for name in names:
+                pending.setdefault(name, [None, now, now])
+
+            settled, removed = {}, False
+            for name, state in list(pending.items()):
+                pdf_path = pdf_dir / name
+                try:
+                    stat = pdf_path.stat()
+                except FileNotFoundError:
+                    del pending[name]
+                    removed = True
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if signature != state[0]:
+                    state[0], state[1] = signature, now
+                    continue
+                still = now - state[1]
+                if still >= settle and (has_trailer(pdf_path) or still >= TRAILER_TIMEOUT):
+                    settled[name] = state[2]
+                    del pending[name]
+
+            if not settled and not removed:
+                continue
+            if settled:
+                print(f"\nLanded: {', '.join(sorted(settled))}")
+            results = await index_round(set(settled), removed, unsettled=set(pending))
+            if any(result["indexed"] for result in results.values()):
+                done = time.monotonic()
+                for name, landed in sorted(settled.items()):
+                    print(f"  {name}: searchable {done - landed:.1f}s after it landed")
+    except asyncio.CancelledError:
+        pass
+    except StoreBusy as e:
+        print(f"Error: {e}.")
+        return 1
+    finally:
+        if watcher:
+            watcher.close()
+        for rag, lock, _ in opened.values():
+            await rag.finalize_storages()
+            lock.close()
+        print("\nStopped watching.")
+    return 0
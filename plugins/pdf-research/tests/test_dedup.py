@@ -0,0 +1,88 @@
+"""
+Duplicate Page Tests
+A PDF that repeats another is only recorded if the original's insert succeeds.
+
+Indexes a temporary directory with the offline stub models of the
+benchmarks, so it needs no API key:
+
+    python -m unittest discover -s plugins/pdf-research/tests
+"""
+
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PLUGIN_DIR / "skills" / "pdf-research" / "scripts"))
+sys.path.insert(0, str(PLUGIN_DIR / "benchmarks"))
+
+import index_pdfs  # noqa: E402
+from dedup import PAGES_FILE  # noqa: E402
+from generate_corpus import generate_pdf  # noqa: E402
+from manifest import Manifest  # noqa: E402
+from stub_models import use_stub_models  # noqa: E402
+
+
+class DedupFailureTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        root = Path(tempfile.mkdtemp())
+        self.root = root
+        self.pdf_dir = root / "pdfs"
+        self.storage_dir = root / "storage"
+        self.pdf_dir.mkdir()
+        os.environ["PDF_RESEARCH_CACHE_DIR"] = str(root / "cache")
+        use_stub_models()
+        # b.pdf repeats every page of a.pdf
+        for name in ("a.pdf", "b.pdf"):
+            generate_pdf(self.pdf_dir / name, 1, pages=2, words=120, rng=random.Random(1))
+
+    def tearDown(self):
+        from lightrag.kg.shared_storage import finalize_share_data
+
+        finalize_share_data()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    async def index(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            await index_pdfs.index_pdfs(self.pdf_dir, self.storage_dir, workers=1,
+                                        batch_size=4, segment_size=0)
+        return Manifest.load(self.storage_dir).files
+
+    async def test_duplicate_of_failed_insert(self):
+        iter_extracted_batches = index_pdfs.iter_extracted_batches
+        insert_batch = index_pdfs.insert_batch
+
+        async def one_batch(*args, **kwargs):
+            # Both PDFs in one batch, as when extraction runs ahead of insertion
+            yield [item async for batch in iter_extracted_batches(*args, **kwargs)
+                   for item in batch]
+
+        async def failing_insert(rag, segments, graph=True):
+            results = await insert_batch(rag, segments, graph)
+            return [(doc_id, "Error: stub failure", False) for doc_id, _, _ in results]
+
+        with mock.patch.object(index_pdfs, "iter_extracted_batches", one_batch), \
+                mock.patch.object(index_pdfs, "insert_batch", failing_insert):
+            files = await self.index()
+        self.assertEqual(files, {})
+        with open(self.storage_dir / PAGES_FILE) as f:
+            self.assertEqual(json.load(f), [])
+
+        # The next run indexes a.pdf and links b.pdf to it
+        files = await self.index()
+        a, b = files[str(self.pdf_dir / "a.pdf")], files[str(self.pdf_dir / "b.pdf")]
+        self.assertTrue(a["doc_ids"])
+        self.assertEqual(b["doc_ids"], a["doc_ids"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Query Server Tests
+Context-only replies of any size reach the client, or it falls back.
+
+Serves canned chunks from a QueryServer without LightRAG storages:
+
+    python -m unittest discover -s plugins/pdf-research/tests
+"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PLUGIN_DIR / "skills" / "pdf-research" / "scripts"))
+
+import query_server  # noqa: E402
+from query_server import QueryServer  # noqa: E402
+
+# Ten chunks of about 1,200 tokens of Korean text, some 180 KB escaped as JSON
+CHUNKS = [{"rank": rank, "chunk_id": f"chunk-{rank}", "content": "검색 증강 생성 " * 400}
+          for rank in range(1, 11)]
+
+
+class CannedServer(QueryServer):
+
+    async def answer(self, request: dict) -> dict:
+        return {"result": CHUNKS}
+
+
+class DyingServer(QueryServer):
+    """Stops halfway through writing its reply."""
+
+    async def handle(self, reader, writer):
+        await reader.readline()
+        writer.write(b'{"result": [{"rank": 1, "content": "cut')
+        await writer.drain()
+        writer.close()
+
+
+class QueryServerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.storage_dir = Path(tempfile.mkdtemp())
+        self.server = await CannedServer(self.storage_dir).listen()
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        query_server.get_socket_path(self.storage_dir).unlink(missing_ok=True)
+        shutil.rmtree(self.storage_dir, ignore_errors=True)
+
+    async def test_large_context_reply(self):
+        chunks = await query_server.query_server(self.storage_dir, "query", "naive",
+                                                 context_only=True, top_k=10)
+        self.assertEqual(chunks, CHUNKS)
+
+    async def test_reply_over_limit_falls_back(self):
+        with mock.patch.object(query_server, "STREAM_LIMIT", 64 * 1024):
+            chunks = await query_server.query_server(self.storage_dir, "query", "naive",
+                                                     context_only=True, top_k=10)
+        self.assertIsNone(chunks)
+
+    async def test_truncated_reply_falls_back(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.server = await DyingServer(self.storage_dir).listen()
+        chunks = await query_server.query_server(self.storage_dir, "query", "naive",
+                                                 context_only=True, top_k=10)
+        self.assertIsNone(chunks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Watch Mode Tests
+A PDF that is being rewritten keeps its indexed documents until it settles.
+
+Runs watch.watch() on a temporary directory with the offline stub models of
+the benchmarks, so it needs no API key:
+
+    python -m unittest discover -s plugins/pdf-research/tests
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PLUGIN_DIR / "skills" / "pdf-research" / "scripts"))
+sys.path.insert(0, str(PLUGIN_DIR / "benchmarks"))
+
+from generate_corpus import generate_pdf  # noqa: E402
+from manifest import Manifest  # noqa: E402
+from stub_models import use_stub_models  # noqa: E402
+
+SETTLE = 0.3
+TIMEOUT = 60.0
+
+
+def write_pdf(path: Path, doc_num: int, complete: bool = True):
+    """Write a synthetic PDF, or only its first half as if a copy were still running."""
+    scratch = path.with_name(f".{path.name}.tmp")
+    generate_pdf(scratch, doc_num, pages=2, words=120, rng=random.Random(doc_num))
+    data = scratch.read_bytes()
+    scratch.unlink()
+    path.write_bytes(data if complete else data[:len(data) // 2])
+
+
+class WatchTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        root = Path(tempfile.mkdtemp())
+        self.root = root
+        self.pdf_dir = root / "pdfs"
+        self.storage_dir = root / "storage"
+        self.pdf_dir.mkdir()
+        os.environ["PDF_RESEARCH_CACHE_DIR"] = str(root / "cache")
+        use_stub_models()
+
+    def tearDown(self):
+        from lightrag.kg.shared_storage import finalize_share_data
+
+        # LightRAG keeps storage data per process; start the next test afresh
+        finalize_share_data()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    async def start_watch(self, settle: float = SETTLE):
+        from watch import watch
+
+        async def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                return await watch(self.pdf_dir, self.storage_dir, workers=1, concurrency=2,
+                                   batch_size=4, segment_size=0, dedup_threshold=0.85,
+                                   settle=settle, poll=True)
+
+        return asyncio.create_task(run())
+
+    async def stop_watch(self, task):
+        task.cancel()
+        self.assertEqual(await task, 0)
+
+    def entry(self, name: str):
+        return Manifest.load(self.storage_dir).files.get(str(self.pdf_dir / name))
+
+    async def wait_for(self, condition):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + TIMEOUT
+        while not condition():
+            self.assertLess(loop.time(), deadline, "watch did not index in time")
+            await asyncio.sleep(0.1)
+
+    def stored_doc_ids(self) -> set:
+        with open(self.storage_dir / "kv_store_doc_status.json") as f:
+            return set(json.load(f))
+
+    async def index_two(self) -> asyncio.Task:
+        write_pdf(self.pdf_dir / "a.pdf", 1)
+        write_pdf(self.pdf_dir / "b.pdf", 2)
+        task = await self.start_watch()
+        await self.wait_for(lambda: self.entry("a.pdf") and self.entry("b.pdf"))
+        return task
+
+    async def test_rewrite_while_another_lands(self):
+        task = await self.index_two()
+        original = self.entry("a.pdf")
+
+        # a.pdf is overwritten (and stays half written) while c.pdf lands
+        write_pdf(self.pdf_dir / "a.pdf", 3, complete=False)
+        write_pdf(self.pdf_dir / "c.pdf", 4)
+        await self.wait_for(lambda: self.entry("c.pdf"))
+        self.assertEqual(self.entry("a.pdf"), original)
+        self.assertTrue(set(original["doc_ids"]) <= self.stored_doc_ids())
+
+        # Once the copy completes, the new version replaces the old one
+        write_pdf(self.pdf_dir / "a.pdf", 3)
+        await self.wait_for(lambda: (self.entry("a.pdf") or original)["sha256"] != original["sha256"])
+        await self.stop_watch(task)
+        self.assertFalse(set(original["doc_ids"]) & self.stored_doc_ids())
+
+    async def test_rewrite_during_catch_up(self):
+        await self.stop_watch(await self.index_two())
+        original = self.entry("a.pdf")
+
+        # Restarted while a.pdf is being overwritten: the catch-up keeps it
+        write_pdf(self.pdf_dir / "a.pdf", 3, complete=False)
+        write_pdf(self.pdf_dir / "c.pdf", 4)
+        task = await self.start_watch(settle=5.0)
+        await self.wait_for(lambda: self.entry("c.pdf"))
+        await self.stop_watch(task)
+        self.assertEqual(self.entry("a.pdf"), original)
+        self.assertTrue(set(original["doc_ids"]) <= self.stored_doc_ids())
+
+
+if __name__ == "__main__":
+    unittest.main()